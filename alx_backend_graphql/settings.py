@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,44 @@ INSTALLED_APPS = [
 
 GRAPHENE = {
     "SCHEMA": "alx_backend_graphql.schema.schema",  # path to your main schema object
+    "MIDDLEWARE": ["crm.tracing.TracingMiddleware"],
+}
+
+# Opt-in cache for read-only GraphQL responses (see crm/cache.py).
+# Entries expire after TIMEOUT seconds and are dropped on any CRM write.
+GRAPHQL_RESPONSE_CACHE = {
+    "ENABLED": False,
+    "CACHE": "graphql",
+    "TIMEOUT": 60,
+}
+
+# Parsed + validated GraphQL documents kept in memory per process, keyed by
+# sha256 of the query text (also used for persisted queries).
+GRAPHQL_DOCUMENT_CACHE_SIZE = 500
+
+# Static cost/depth budget checked before executing an operation (see
+# crm/complexity.py). `first`/`last` multiply the cost of a connection and
+# unpaged lists count as DEFAULT_LIST_SIZE rows.
+GRAPHQL_QUERY_COST = {
+    "ENABLED": True,
+    "MAX_COST": 25000,
+    "MAX_DEPTH": 10,
+    "DEFAULT_LIST_SIZE": 100,
+    "WEIGHTS": {
+        # Aggregates scan the orders table.
+        "Query.crmStats": 50,
+    },
+}
+
+# Per-resolver timing / SQL counts for a sample of requests (see
+# crm/tracing.py); metrics are served at /graphql/metrics. Sending the
+# GRAPHQL_TRACE_TOKEN secret in X-GraphQL-Trace forces a trace.
+GRAPHQL_TRACING = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 0.01,
+    "EXTENSIONS": True,
+    "FORCE_HEADER": "X-GraphQL-Trace",
+    "FORCE_TOKEN": os.environ.get("GRAPHQL_TRACE_TOKEN"),
 }
 
 MIDDLEWARE = [
@@ -88,6 +127,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # GraphQL responses. Shared by the web and Celery workers, so a write
+    # in any process invalidates every cached response (see crm/cache.py);
+    # the Celery broker's Redis, another database. Give it an LRU
+    # maxmemory-policy to bound it.
+    'graphql': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('GRAPHQL_CACHE_URL', 'redis://localhost:6379/1'),
+        'TIMEOUT': 60,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
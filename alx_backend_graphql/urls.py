@@ -17,10 +17,21 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 
+from crm.views import (
+    AsyncCRMGraphQLView,
+    CRMGraphQLView,
+    export,
+    graphql_metrics,
+    response_cache_stats,
+)
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("graphql", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql", csrf_exempt(CRMGraphQLView.as_view(graphiql=True))),
+    path("graphql/async", csrf_exempt(AsyncCRMGraphQLView.as_view())),
+    path("graphql/cache-stats", response_cache_stats),
+    path("graphql/metrics", graphql_metrics),
+    path("export/<str:resource>", export),
 ]
@@ -0,0 +1,36 @@
+"""
+Helpers for resolvers that serve both the sync GraphQLView and the async
+view (crm.views.AsyncCRMGraphQLView).
+
+A resolver running inside an event loop must not touch the sync ORM, so
+the shared resolvers check ``running_async()`` and hand back awaitables
+built on Django's async ORM instead.
+"""
+import asyncio
+
+
+def running_async():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def alist(queryset):
+    """Evaluates ``queryset`` (including prefetches) with the async ORM."""
+    return [row async for row in queryset]
+
+
+def evaluate(queryset, then=None):
+    """
+    ``then(list(queryset))``, or an awaitable of it (using the async ORM)
+    when called from inside an event loop.
+    """
+    then = then or (lambda rows: rows)
+    if running_async():
+        async def evaluate_async():
+            return then(await alist(queryset))
+
+        return evaluate_async()
+    return then(list(queryset))
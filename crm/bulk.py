@@ -0,0 +1,195 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, rollups
+from .inventory import OutOfStock, reserve_stock
+from .models import Customer, Order, OrderItem, Product
+from .validators import validate_phone
+
+# Rows per INSERT and emails per IN (...) lookup. Keeps statements well
+# under SQLite's bound-parameter limit while staying a handful of
+# round-trips for large imports.
+BATCH_SIZE = 1000
+LOOKUP_SIZE = 5000
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def existing_emails(emails):
+    found = set()
+    for chunk in _chunks(list(emails), LOOKUP_SIZE):
+        found.update(
+            Customer.objects.filter(email__in=chunk).values_list("email", flat=True)
+        )
+    return found
+
+
+def in_bulk(model, ids):
+    """``model.objects.in_bulk(ids)`` split into LOOKUP_SIZE chunks."""
+    found = {}
+    for chunk in _chunks(list(ids), LOOKUP_SIZE):
+        found.update(model.objects.in_bulk(chunk))
+    return found
+
+
+def _to_pk(model, value):
+    try:
+        return model._meta.pk.to_python(value)
+    except ValidationError:
+        return None
+
+
+def order_lines(row):
+    """
+    ``{product pk: quantity}`` requested by an ``OrderInput``-like ``row``.
+
+    ``items`` carry a quantity each (repeated products add up); every id in
+    ``product_ids`` is one unit, and repeating an id there doesn't add
+    more, as before items existed. Unparseable ids map to None.
+    """
+    lines = {}
+    for item in getattr(row, "items", None) or []:
+        quantity = 1 if item.quantity is None else item.quantity
+        pk = _to_pk(Product, item.product_id)
+        lines[pk] = lines.get(pk, 0) + quantity
+    for pk in dict.fromkeys(_to_pk(Product, pk) for pk in (row.product_ids or [])):
+        lines[pk] = lines.get(pk, 0) + 1
+    return lines
+
+
+def order_items(order, lines, products):
+    """Unsaved OrderItems of ``order``, priced at the current product price."""
+    return [
+        OrderItem(order=order, product=products[pk], quantity=quantity,
+                  unit_price=products[pk].price)
+        for pk, quantity in lines.items()
+    ]
+
+
+def order_total(items):
+    return sum((item.line_total for item in items), Decimal("0.00"))
+
+
+@transaction.atomic
+def bulk_create_customers(rows, batch_size=BATCH_SIZE):
+    """
+    Validates and inserts customer rows set-wise.
+
+    ``rows`` are objects with ``name``/``email``/``phone`` attributes (e.g.
+    ``CustomerInput``). Every row is validated in Python, existing emails
+    are resolved with ``email__in`` lookups, repeated emails within the
+    batch are rejected after their first occurrence, and the valid rows are
+    written with chunked ``bulk_create``.
+
+    Returns ``(created_customers, errors)`` where errors use the same
+    ``"Row N: ..."`` format as the old per-row loop.
+    """
+    cleaned = []
+    for index, row in enumerate(rows):
+        name = (row.name or "").strip()
+        email = (row.email or "").strip().lower()
+        phone = row.phone.strip() if row.phone else None
+        cleaned.append((index, name, email, phone))
+
+    taken = existing_emails({email for _, _, email, _ in cleaned if email})
+
+    to_create = []
+    errors = []
+    first_seen = {}
+    for index, name, email, phone in cleaned:
+        row_errors = []
+        if not name:
+            row_errors.append("Name is required.")
+        if not email:
+            row_errors.append("Email is required.")
+        elif email in taken:
+            row_errors.append("Email already exists.")
+        elif email in first_seen:
+            row_errors.append(f"Duplicate email in batch (row {first_seen[email] + 1}).")
+        if phone and not validate_phone(phone):
+            row_errors.append("Invalid phone format.")
+
+        if row_errors:
+            errors.append(f"Row {index + 1}: " + "; ".join(row_errors))
+            continue
+
+        first_seen[email] = index
+        to_create.append(Customer(name=name, email=email, phone=phone))
+
+    created = Customer.objects.bulk_create(to_create, batch_size=batch_size)
+    # bulk_create sends no post_save, so invalidate cached responses here.
+    cache.invalidate()
+    return created, errors
+
+
+@transaction.atomic
+def bulk_create_orders(rows, batch_size=BATCH_SIZE):
+    """
+    Validates and inserts order rows set-wise.
+
+    ``rows`` are objects with ``customer_id``/``product_ids``/``items``/
+    ``order_date`` attributes (e.g. ``OrderInput``). All referenced
+    customers and products are fetched with two ``IN`` lookups, each
+    row's stock is reserved (see ``inventory.reserve_stock``), items are
+    priced in memory from the current product prices, and orders plus
+    their OrderItems are written with ``bulk_create``.
+
+    Returns ``(created, errors)`` where ``created`` is a list of
+    ``(order, products)`` pairs, so callers can answer payload fields from
+    memory. Errors use the ``"Row N: ..."`` format and match
+    ``CreateOrder``'s messages.
+    """
+    cleaned = []
+    for index, row in enumerate(rows):
+        customer_pk = _to_pk(Customer, row.customer_id)
+        cleaned.append((index, customer_pk, order_lines(row), row.order_date))
+
+    customers = in_bulk(Customer, {pk for _, pk, _, _ in cleaned if pk is not None})
+    products = in_bulk(
+        Product, {pk for _, _, lines, _ in cleaned for pk in lines if pk is not None}
+    )
+
+    to_create = []
+    errors = []
+    now = timezone.now()
+    for index, customer_pk, lines, order_date in cleaned:
+        customer = customers.get(customer_pk)
+        if customer is None:
+            errors.append(f"Row {index + 1}: Invalid customer ID.")
+            continue
+        if not lines:
+            errors.append(f"Row {index + 1}: At least one product must be selected.")
+            continue
+        if any(pk not in products for pk in lines):
+            errors.append(f"Row {index + 1}: One or more product IDs are invalid.")
+            continue
+        if min(lines.values()) < 1:
+            errors.append(f"Row {index + 1}: Quantity must be a positive value.")
+            continue
+        try:
+            with transaction.atomic():
+                reserve_stock(lines)
+        except OutOfStock as e:
+            names = ", ".join(products[pk].name for pk in e.products)
+            errors.append(f"Row {index + 1}: Insufficient stock for: {names}.")
+            continue
+
+        order = Order(customer=customer, order_date=order_date or now)
+        items = order_items(order, lines, products)
+        order.total_amount = order_total(items)
+        to_create.append((order, items))
+
+    Order.objects.bulk_create([order for order, _ in to_create], batch_size=batch_size)
+    # bulk_create copies the now-assigned order pks onto the items.
+    OrderItem.objects.bulk_create(
+        [item for _, items in to_create for item in items], batch_size=batch_size
+    )
+    rollups.record_orders(to_create)
+    cache.invalidate()
+    return [(order, [item.product for item in items]) for order, items in to_create], errors
@@ -0,0 +1,165 @@
+"""
+Opt-in response cache for read-only GraphQL operations.
+
+Entries are keyed on the normalized query text, variables and operation
+name, plus a generation number. Any write to the CRM models bumps the
+generation (see crm.signals), which makes every older entry unreachable;
+the cache backend's LRU/TTL eviction then reclaims them. Only successful
+``query`` operations are ever stored.
+
+The generation must be shared by every process that writes or serves:
+web workers, Celery workers, management commands. The cache alias must
+therefore be a shared backend (Redis, Memcached, database). With a
+local-memory backend a write in one process would never reach the
+others, which would keep serving stale entries; the cache stays off
+(with a system check warning) unless ``SINGLE_PROCESS`` says that one
+process does everything, as in tests.
+
+Configured with ``GRAPHQL_RESPONSE_CACHE`` in settings:
+
+    GRAPHQL_RESPONSE_CACHE = {
+        "ENABLED": True,
+        "CACHE": "graphql",   # alias in CACHES, a shared backend
+        "TIMEOUT": 60,        # seconds an entry may be served
+        "SINGLE_PROCESS": False,
+    }
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from graphql import OperationType, get_operation_ast, parse, print_ast
+
+DEFAULTS = {
+    "ENABLED": False,
+    "CACHE": "default",
+    "TIMEOUT": 60,
+    "KEY_PREFIX": "graphql-response",
+    "SINGLE_PROCESS": False,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GRAPHQL_RESPONSE_CACHE", {})}
+
+
+def _unshared(config):
+    """True if the configured cache is private to this process."""
+    return isinstance(caches[config["CACHE"]], LocMemCache) and not config["SINGLE_PROCESS"]
+
+
+def is_enabled():
+    config = get_config()
+    return bool(config["ENABLED"]) and not _unshared(config)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    config = get_config()
+    if config["ENABLED"] and _unshared(config):
+        return [checks.Warning(
+            f"GRAPHQL_RESPONSE_CACHE uses the local-memory cache {config['CACHE']!r}; "
+            "writes in other processes couldn't invalidate it, so it stays disabled.",
+            hint="Point it at a shared backend such as Redis, or set SINGLE_PROCESS "
+                 "if one process serves and writes everything.",
+            id="crm.W001",
+        )]
+    return []
+
+
+def _cache():
+    return caches[get_config()["CACHE"]]
+
+
+def _key(name):
+    return f"{get_config()['KEY_PREFIX']}:{name}"
+
+
+def current_generation():
+    cache = _cache()
+    generation = cache.get(_key("generation"))
+    if generation is None:
+        # Never restart from a number older entries might still carry.
+        cache.add(_key("generation"), time.time_ns(), None)
+        generation = cache.get(_key("generation"))
+    return generation
+
+
+def cache_key(query, variables=None, operation_name=None, document=None):
+    """
+    Returns the cache key for a request, or None when it must not be
+    cached (unparsable, or the selected operation isn't a query).
+    """
+    try:
+        document = document or parse(query)
+    except Exception:
+        return None
+    operation = get_operation_ast(document, operation_name)
+    if operation is None or operation.operation != OperationType.QUERY:
+        return None
+
+    digest = hashlib.sha256()
+    digest.update(print_ast(document).encode("utf-8"))
+    digest.update(json.dumps(variables or {}, sort_keys=True, default=str).encode("utf-8"))
+    digest.update((operation_name or "").encode("utf-8"))
+    return _key(f"{current_generation()}:{digest.hexdigest()}")
+
+
+def _count(name):
+    cache = _cache()
+    cache.add(_key(name), 0, None)
+    try:
+        cache.incr(_key(name))
+    except ValueError:
+        pass
+
+
+def get(key):
+    data = _cache().get(key)
+    _count("hits" if data is not None else "misses")
+    return data
+
+
+def set(key, data):
+    _cache().set(key, data, get_config()["TIMEOUT"])
+
+
+def _bump_generation():
+    cache = _cache()
+    try:
+        cache.incr(_key("generation"))
+    except ValueError:
+        cache.add(_key("generation"), time.time_ns(), None)
+
+
+def invalidate():
+    """
+    Makes every cached response stale. Bumps now, and again when the
+    current transaction commits so responses computed from the pre-commit
+    state of the database can't be cached under the new generation.
+    """
+    if not is_enabled():
+        return
+    _bump_generation()
+    transaction.on_commit(_bump_generation)
+
+
+def stats():
+    if not is_enabled():
+        # Don't connect to a cache that isn't in use.
+        hits = misses = 0
+    else:
+        cache = _cache()
+        hits = cache.get(_key("hits"), 0)
+        misses = cache.get(_key("misses"), 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
@@ -0,0 +1,170 @@
+"""
+Deleting inactive customers: no order in the last ``INACTIVE_DAYS`` days
+(and signed up before that).
+
+Customers are found with an anti-join (NOT EXISTS on the ``(customer,
+order_date)`` index) and deleted ``BATCH_SIZE`` at a time in pk order,
+each batch in its own short transaction: order items, orders, rollup
+rows, customers. A batch re-checks its customers inside the transaction,
+so one who ordered in the meantime is kept. ``SLEEP`` seconds between
+batches leave room for the API's writers.
+
+Configured with ``CRM_CUSTOMER_CLEANUP`` in settings:
+
+    CRM_CUSTOMER_CLEANUP = {
+        "INACTIVE_DAYS": 365,
+        "BATCH_SIZE": 500,    # customers per transaction
+        "SLEEP": 0,           # seconds between batches
+        "LOG_FILE": "/tmp/customer_cleanup_log.txt",
+    }
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import cache, rollups
+from .models import Customer, DailySales, Order, OrderItem
+
+DEFAULTS = {
+    "INACTIVE_DAYS": 365,
+    "BATCH_SIZE": 500,
+    "SLEEP": 0,
+    "LOG_FILE": "/tmp/customer_cleanup_log.txt",
+}
+
+
+# Ids per DELETE statement.
+DELETE_CHUNK_SIZE = 500
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_CUSTOMER_CLEANUP", {})}
+
+
+def inactive_customers(cutoff):
+    recent = Order.objects.filter(customer=OuterRef("pk"), order_date__gte=cutoff)
+    return Customer.objects.filter(created_at__lt=cutoff).filter(~Exists(recent))
+
+
+def _batches(cutoff, batch_size):
+    last_pk = 0
+    while True:
+        ids = list(
+            inactive_customers(cutoff).filter(pk__gt=last_pk).order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+def _count(ids):
+    return {
+        "customers": len(ids),
+        "orders": Order.objects.filter(customer__in=ids).count(),
+        "order_items": OrderItem.objects.filter(order__customer__in=ids).count(),
+    }
+
+
+def _orders_with_items(ids):
+    """The ``(order, items)`` pairs of customers ``ids``, as bare instances."""
+    orders = {
+        pk: Order(pk=pk, customer_id=customer_id, order_date=order_date, total_amount=total)
+        for pk, customer_id, order_date, total in Order.objects.filter(customer__in=ids)
+        .values_list("pk", "customer_id", "order_date", "total_amount")
+    }
+    items = {pk: [] for pk in orders}
+    rows = OrderItem.objects.filter(order__customer__in=ids).values_list(
+        "order_id", "product_id", "quantity", "unit_price",
+    )
+    for order_id, product_id, quantity, unit_price in rows:
+        items[order_id].append(
+            OrderItem(order_id=order_id, product_id=product_id, quantity=quantity, unit_price=unit_price)
+        )
+    return [(order, items[pk]) for pk, order in orders.items()]
+
+
+def _delete_in(cursor, model, field, values):
+    """``DELETE FROM <model> WHERE <field> IN (values)``; returns the rows deleted."""
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    column = qn(model._meta.get_field(field).column)
+    deleted = 0
+    # Bounded IN lists: a batch's orders can outnumber its customers many times.
+    for start in range(0, len(values), DELETE_CHUNK_SIZE):
+        chunk = values[start:start + DELETE_CHUNK_SIZE]
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(chunk))})", chunk
+        )
+        deleted += cursor.rowcount
+    return deleted
+
+
+def _delete(ids, cutoff):
+    """Deletes the still-inactive customers of ``ids``; returns the counts deleted."""
+    with transaction.atomic():
+        still_inactive = inactive_customers(cutoff).filter(pk__in=ids)
+        if connection.features.has_select_for_update:
+            still_inactive = still_inactive.select_for_update(of=("self",))
+        ids = list(still_inactive.values_list("pk", flat=True))
+        if not ids:
+            return {"customers": 0, "orders": 0, "order_items": 0}
+        orders = _orders_with_items(ids)
+        rollups.remove_orders(orders)
+        order_ids = [order.pk for order, _ in orders]
+        # Children first, with plain DELETEs: QuerySet.delete() would load
+        # every row to send the post_delete signals (see crm.signals).
+        with connection.cursor() as cursor:
+            counts = {
+                "order_items": _delete_in(cursor, OrderItem, "order", order_ids),
+                "orders": _delete_in(cursor, Order, "id", order_ids),
+            }
+            _delete_in(cursor, DailySales, "customer", ids)
+            counts["customers"] = _delete_in(cursor, Customer, "id", ids)
+    return counts
+
+
+def clean_inactive_customers(dry_run=False, now=None, progress=None, **options):
+    """
+    Deletes (or with ``dry_run`` only counts) inactive customers with their
+    orders. ``options`` override CRM_CUSTOMER_CLEANUP settings;
+    ``progress(summary)`` is called after each batch. Appends one line to
+    ``LOG_FILE`` (unless None) and returns the summary, including rows
+    (customers + orders + order items) per second.
+    """
+    config = {**get_config(), **options}
+    cutoff = (now or timezone.now()) - timedelta(days=config["INACTIVE_DAYS"])
+    summary = {"dry_run": dry_run, "cutoff": cutoff.isoformat(), "batches": 0,
+               "customers": 0, "orders": 0, "order_items": 0}
+    started = time.perf_counter()
+    for ids in _batches(cutoff, config["BATCH_SIZE"]):
+        counts = _count(ids) if dry_run else _delete(ids, cutoff)
+        summary["batches"] += 1
+        for name, count in counts.items():
+            summary[name] += count
+        if progress is not None:
+            progress(summary)
+        if config["SLEEP"]:
+            time.sleep(config["SLEEP"])
+
+    if summary["customers"] and not dry_run:
+        cache.invalidate()
+    elapsed = time.perf_counter() - started
+    rows = summary["customers"] + summary["orders"] + summary["order_items"]
+    summary["elapsed_s"] = round(elapsed, 3)
+    summary["rows_per_second"] = round(rows / elapsed, 1) if elapsed else None
+
+    if config["LOG_FILE"]:
+        verb = "Would delete" if dry_run else "Deleted"
+        with open(config["LOG_FILE"], "a", encoding="utf-8") as f:
+            f.write(
+                f"{timezone.now().strftime('%Y-%m-%d %H:%M:%S')} - {verb} customers: "
+                f"{summary['customers']} (orders: {summary['orders']}, items: "
+                f"{summary['order_items']}, {summary['rows_per_second']} rows/s)\n"
+            )
+    return summary
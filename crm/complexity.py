@@ -0,0 +1,207 @@
+"""
+Static cost and depth analysis of GraphQL operations.
+
+The cost of an operation is estimated from its AST before anything is
+executed:
+
+- every selected field has a weight: 1 for object fields, 0 for scalars,
+  overridable per field with ``WEIGHTS`` (``"Type.field": weight``);
+- a field's cost is ``multiplier * (weight + cost of its sub-selection)``,
+  where the multiplier is ``first``/``last`` for connections and
+  ``DEFAULT_LIST_SIZE`` for plain lists and connections paged without
+  either argument;
+- the relay wrappers (``edges``, ``node``, ``pageInfo``) are free and
+  don't add to the depth, and introspection fields are ignored.
+
+So ``orders(first: 100) { edges { node { customer { name } } } }`` costs
+100 * (1 + 1) = 200 and has depth 3. Operations over ``MAX_COST`` or
+``MAX_DEPTH`` are rejected. Configured with ``GRAPHQL_QUERY_COST``:
+
+    GRAPHQL_QUERY_COST = {
+        "ENABLED": True,
+        "MAX_COST": 25000,
+        "MAX_DEPTH": 10,
+        "DEFAULT_LIST_SIZE": 100,
+        "WEIGHTS": {"Query.crmStats": 50},
+    }
+"""
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    ValidationRule,
+    get_named_type,
+    get_nullable_type,
+    is_leaf_type,
+    is_list_type,
+    validate,
+)
+from graphql.execution.values import get_argument_values, get_variable_values
+
+DEFAULTS = {
+    "ENABLED": True,
+    "MAX_COST": 25000,
+    "MAX_DEPTH": 10,
+    "DEFAULT_LIST_SIZE": 100,
+    "WEIGHTS": {},
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GRAPHQL_QUERY_COST", {})}
+
+
+def is_enabled():
+    return bool(get_config()["ENABLED"])
+
+
+def _is_wrapper(parent_type, field_name):
+    return (
+        field_name == "pageInfo"
+        or (field_name == "edges" and parent_type.name.endswith("Connection"))
+        or (field_name == "node" and parent_type.name.endswith("Edge"))
+    )
+
+
+class CostAnalysis:
+    """Computes ``(cost, depth)`` of one operation."""
+
+    def __init__(self, schema, fragments, variables, config):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+        self.default_list_size = config["DEFAULT_LIST_SIZE"]
+        self.weights = config["WEIGHTS"]
+
+    def multiplier(self, field_def, node):
+        if "first" in field_def.args or "last" in field_def.args:
+            try:
+                args = get_argument_values(field_def, node, self.variables)
+            except GraphQLError:
+                # Bad arguments are reported by execution; assume a full page.
+                args = {}
+            sizes = [args[name] for name in ("first", "last") if args.get(name) is not None]
+            return max(min(sizes), 0) if sizes else self.default_list_size
+        if is_list_type(get_nullable_type(field_def.type)):
+            return self.default_list_size
+        return 1
+
+    def selection_set(self, parent_type, selection_set):
+        cost = depth = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_cost, field_depth = self.field(parent_type, selection)
+            else:
+                if isinstance(selection, FragmentSpreadNode):
+                    fragment = self.fragments[selection.name.value]
+                else:
+                    fragment = selection
+                fragment_type = parent_type
+                if fragment.type_condition is not None:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                field_cost, field_depth = self.selection_set(fragment_type, fragment.selection_set)
+            cost += field_cost
+            depth = max(depth, field_depth)
+        return cost, depth
+
+    def field(self, parent_type, node):
+        name = node.name.value
+        fields = getattr(parent_type, "fields", {})
+        if name.startswith("__") or name not in fields:
+            return 0, 0
+
+        field_def = fields[name]
+        field_type = get_named_type(field_def.type)
+        cost, depth = 0, 0
+        if node.selection_set is not None:
+            cost, depth = self.selection_set(field_type, node.selection_set)
+
+        if _is_wrapper(parent_type, name):
+            return cost, depth
+
+        default_weight = 0 if is_leaf_type(field_type) else 1
+        weight = self.weights.get(f"{parent_type.name}.{name}", default_weight)
+        return self.multiplier(field_def, node) * (weight + cost), depth + 1
+
+    def operation(self, operation):
+        root_type = self.schema.get_root_type(operation.operation)
+        return self.selection_set(root_type, operation.selection_set)
+
+
+class QueryCostRule(ValidationRule):
+    """
+    Validation rule rejecting operations over the cost or depth budget.
+
+    It needs the request's variables, so it is used through ``bind()``,
+    which also takes a dict that receives the ``(cost, depth)`` of each
+    analyzed operation, keyed by operation name.
+    """
+
+    variables = None
+    operation_name = None
+    results = None
+
+    @classmethod
+    def bind(cls, variables=None, operation_name=None, results=None):
+        return type(cls.__name__, (cls,), {
+            "variables": variables or {},
+            "operation_name": operation_name,
+            "results": {} if results is None else results,
+        })
+
+    def enter_operation_definition(self, node, *_):
+        name = node.name.value if node.name else None
+        if self.operation_name is not None and name != self.operation_name:
+            return self.SKIP
+
+        context = self.context
+        config = get_config()
+        variables = get_variable_values(
+            context.schema, node.variable_definitions or (), self.variables or {}
+        )
+        if isinstance(variables, list):
+            # Invalid variables are reported by execution.
+            variables = {}
+        fragments = {
+            definition.name.value: definition
+            for definition in context.document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        cost, depth = CostAnalysis(context.schema, fragments, variables, config).operation(node)
+        self.results[name] = (cost, depth)
+
+        if cost > config["MAX_COST"]:
+            self.report_error(GraphQLError(
+                f"Query cost {cost} exceeds the maximum of {config['MAX_COST']}.",
+                node,
+                extensions={"code": "QUERY_TOO_COMPLEX", "cost": cost, "maxCost": config["MAX_COST"]},
+            ))
+        if depth > config["MAX_DEPTH"]:
+            self.report_error(GraphQLError(
+                f"Query depth {depth} exceeds the maximum of {config['MAX_DEPTH']}.",
+                node,
+                extensions={"code": "QUERY_TOO_DEEP", "depth": depth, "maxDepth": config["MAX_DEPTH"]},
+            ))
+        return self.SKIP
+
+
+def analyze(schema, document, variables=None, operation_name=None):
+    """
+    Runs QueryCostRule over ``document``. Returns ``(cost, errors)``, where
+    ``cost`` is the dict reported in the response ``extensions`` (None if
+    no operation matched ``operation_name``).
+    """
+    results = {}
+    errors = validate(schema, document, [QueryCostRule.bind(variables, operation_name, results)])
+    if not results:
+        return None, errors
+    config = get_config()
+    cost, depth = next(iter(results.values()))
+    return {
+        "requested": cost,
+        "maximum": config["MAX_COST"],
+        "depth": depth,
+        "maxDepth": config["MAX_DEPTH"],
+    }, errors
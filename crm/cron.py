@@ -4,6 +4,8 @@ from datetime import datetime
 from gql import gql, Client
 from gql.transport.requests import RequestsHTTPTransport
 
+from .inventory import restock_by_velocity
+
 
 def log_crm_heartbeat():
     """
@@ -31,41 +33,8 @@ def log_crm_heartbeat():
 
 
 def update_low_stock():
-    log_file = "/tmp/low_stock_updates_log.txt"
-    timestamp = datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
-
-    transport = RequestsHTTPTransport(
-        url="http://localhost:8000/graphql",
-        verify=True,
-        retries=2,
-    )
-    client = Client(transport=transport, fetch_schema_from_transport=False)
-
-    mutation = gql(
-        """
-        mutation {
-          updateLowStockProducts {
-            success
-            message
-            updatedProducts {
-              name
-              stock
-            }
-          }
-        }
-        """
-    )
-
-    try:
-        result = client.execute(mutation)
-        payload = result.get("updateLowStockProducts", {}) or {}
-        updated_products = payload.get("updatedProducts", []) or []
-
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(f"{timestamp} - {payload.get('message', '')}\n")
-            for p in updated_products:
-                f.write(f"  - {p.get('name')} => stock: {p.get('stock')}\n")
-
-    except Exception as e:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(f"{timestamp} - ERROR: {e}\n")
+    """
+    Restocks low-stock products in-process; the same job the
+    crm.tasks.restock_products beat task runs, for setups without Celery.
+    """
+    restock_by_velocity()
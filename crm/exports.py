@@ -0,0 +1,110 @@
+"""
+Streaming exports of the CRM tables.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` as plain values
+(no model instances) and serialized one at a time, so memory stays flat
+no matter how many rows are exported. Order items (product, quantity and
+the unit price paid) are attached one chunk of orders at a time with a
+single query per chunk.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .filters import CustomerFilter, OrderFilter, ProductFilter
+from .models import Customer, Order, OrderItem, Product
+
+CHUNK_SIZE = 2000
+
+
+class Export:
+    def __init__(self, model, filterset_class, columns, distinct_on=()):
+        self.model = model
+        self.filterset_class = filterset_class
+        self.columns = columns
+        # Filters that join a many-valued relation and can repeat rows.
+        self.distinct_on = distinct_on
+
+    def filter(self, params):
+        """Returns the filtered queryset, or raises ValueError with the form errors."""
+        queryset = self.model.objects.order_by("pk")
+        filterset = self.filterset_class(data=params, queryset=queryset)
+        if not filterset.is_valid():
+            raise ValueError(filterset.form.errors.get_json_data())
+        queryset = filterset.qs
+        if any(params.get(name) for name in self.distinct_on):
+            queryset = queryset.distinct()
+        return queryset
+
+    def rows(self, queryset, chunk_size=CHUNK_SIZE):
+        return queryset.values(*self.columns).iterator(chunk_size=chunk_size)
+
+
+class OrderExport(Export):
+    def rows(self, queryset, chunk_size=CHUNK_SIZE):
+        rows = super().rows(queryset, chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            products = {row["id"]: [] for row in chunk}
+            lines = (
+                OrderItem.objects
+                .filter(order_id__in=products)
+                .order_by("pk")
+                .values_list("order_id", "product_id", "product__name", "quantity", "unit_price")
+            )
+            for order_id, product_id, name, quantity, price in lines:
+                products[order_id].append(
+                    {"id": product_id, "name": name, "quantity": quantity, "price": price}
+                )
+            for row in chunk:
+                row["products"] = products[row["id"]]
+                yield row
+
+
+EXPORTS = {
+    "customers": Export(
+        Customer, CustomerFilter, ["id", "name", "email", "phone", "created_at"]
+    ),
+    "products": Export(
+        Product, ProductFilter, ["id", "name", "price", "stock", "created_at"]
+    ),
+    "orders": OrderExport(
+        Order, OrderFilter, ["id", "customer_id", "total_amount", "order_date"],
+        distinct_on=("product_name", "product_id"),
+    ),
+}
+
+
+def to_ndjson(rows):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def to_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    yield writer.writerow(columns)
+    for row in rows:
+        values = []
+        for column in columns:
+            value = row[column]
+            if column == "products":
+                # The NDJSON item list as a JSON cell keeps one order per
+                # CSV line and survives any character in a product name.
+                value = encoder.encode(value)
+            elif hasattr(value, "isoformat"):
+                value = value.isoformat()
+            values.append(value)
+        yield writer.writerow(values)
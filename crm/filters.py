@@ -1,8 +1,26 @@
 import django_filters
+from django.db import connection
+from django_filters.constants import EMPTY_VALUES
+
+from . import search
 from .models import Customer, Product, Order
 
 
+class SearchFilter(django_filters.CharFilter):
+    """Case-insensitive substring filter served by the search backend."""
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        if self.distinct:
+            qs = qs.distinct()
+        return search.contains(qs, self.field_name, value)
+
+
 class CustomerFilter(django_filters.FilterSet):
+    # Same names as the Meta-generated icontains filters, which they replace.
+    name__icontains = SearchFilter(field_name="name")
+    email__icontains = SearchFilter(field_name="email")
     # Custom phone pattern filter – e.g. value = "+1"
     phone_pattern = django_filters.CharFilter(method="filter_phone_pattern")
 
@@ -28,10 +46,19 @@ class CustomerFilter(django_filters.FilterSet):
     def filter_phone_pattern(self, queryset, name, value):
         if not value:
             return queryset
-        return queryset.filter(phone__startswith=value)
+        # Served by crm_customer_phone_idx. On PostgreSQL that index uses
+        # varchar_pattern_ops, which serves LIKE 'x%' but not < / >= (and
+        # under a linguistic collation a range isn't a prefix match). On
+        # SQLite it is a plain btree in binary order: LIKE can't use it
+        # (it is case-insensitive there) but the equivalent range can.
+        if connection.vendor == "postgresql":
+            return queryset.filter(phone__startswith=value)
+        upper = value[:-1] + chr(ord(value[-1]) + 1)
+        return queryset.filter(phone__gte=value, phone__lt=upper)
 
 
 class ProductFilter(django_filters.FilterSet):
+    name__icontains = SearchFilter(field_name="name")
     # For sorting by name, price, or stock
     order_by = django_filters.OrderingFilter(
         fields=(
@@ -53,13 +80,9 @@ class ProductFilter(django_filters.FilterSet):
 
 class OrderFilter(django_filters.FilterSet):
     # Filter by customer’s name
-    customer_name = django_filters.CharFilter(
-        field_name="customer__name", lookup_expr="icontains"
-    )
+    customer_name = SearchFilter(field_name="customer__name")
     # Filter by product name
-    product_name = django_filters.CharFilter(
-        field_name="products__name", lookup_expr="icontains"
-    )
+    product_name = SearchFilter(field_name="products__name")
     # Challenge: Order includes a specific product ID
     product_id = django_filters.NumberFilter(field_name="products__id")
 
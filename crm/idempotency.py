@@ -0,0 +1,206 @@
+"""
+Idempotency keys for write mutations.
+
+A mutation called with ``idempotencyKey`` claims the key by inserting an
+IdempotencyKey row in the same transaction as its writes, then stores its
+payload there. A retry with the same key and arguments gets the stored
+payload back; the mutation doesn't run again. Model objects in a payload
+are stored by primary key and re-read on replay.
+
+Concurrent duplicates are serialized by the unique index on ``key``: the
+second INSERT waits for the first transaction and then fails, so the
+retry sees the committed payload (or runs normally if the first one
+rolled back). A key reused with different arguments is an error. Keys
+expire after ``TTL`` seconds; ``purge_expired`` deletes them in batches
+(scheduled as crm.tasks.purge_idempotency_keys).
+
+Configured with ``GRAPHQL_IDEMPOTENCY`` in settings:
+
+    GRAPHQL_IDEMPOTENCY = {
+        "TTL": 24 * 60 * 60,  # seconds a key is remembered
+        "PURGE_BATCH_SIZE": 10000,
+    }
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from graphql import GraphQLError
+
+from .models import IdempotencyKey
+
+DEFAULTS = {
+    "TTL": 24 * 60 * 60,
+    "PURGE_BATCH_SIZE": 10000,
+}
+
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field("key").max_length
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GRAPHQL_IDEMPOTENCY", {})}
+
+
+def _plain(value):
+    # Input objects are dicts whose fields shadow dict methods (an input
+    # field named ``items``), which trips up json.
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in dict.items(value)}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def request_hash(operation, arguments):
+    payload = json.dumps([operation, _plain(arguments)], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _dump(value):
+    if isinstance(value, models.Model):
+        return {"model": value._meta.label, "pk": value.pk}
+    if isinstance(value, (list, tuple)):
+        return [_dump(item) for item in value]
+    return value
+
+
+def dump_payload(payload):
+    """The fields of a mutation payload as JSON; models become references."""
+    fields = type(payload)._meta.fields
+    return json.loads(json.dumps(
+        {name: _dump(getattr(payload, name, None)) for name in fields},
+        cls=DjangoJSONEncoder,
+    ))
+
+
+def _references(value):
+    if isinstance(value, dict) and value.keys() == {"model", "pk"}:
+        yield value["model"], value["pk"]
+    elif isinstance(value, list):
+        for item in value:
+            yield from _references(item)
+
+
+def load_payload(payload_class, data):
+    """
+    Rebuilds a payload stored by ``dump_payload``, with one query per model.
+    Objects deleted since are returned as None.
+    """
+    pks = {}
+    for value in data.values():
+        for label, pk in _references(value):
+            pks.setdefault(label, set()).add(pk)
+    instances = {
+        label: apps.get_model(label).objects.in_bulk(sorted(ids))
+        for label, ids in pks.items()
+    }
+
+    def load(value):
+        if isinstance(value, dict) and value.keys() == {"model", "pk"}:
+            return instances[value["model"]].get(value["pk"])
+        if isinstance(value, list):
+            return [load(item) for item in value]
+        return value
+
+    return payload_class(**{name: load(value) for name, value in data.items()})
+
+
+def _live(key, now):
+    return IdempotencyKey.objects.filter(key=key, expires_at__gt=now).first()
+
+
+def _claim(key, digest, now):
+    """
+    Inserts the key row and returns ``(row, True)``, or ``(row, False)``
+    with the live row that already holds the key. Expired rows are replaced.
+    """
+    expires_at = now + timedelta(seconds=get_config()["TTL"])
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    key=key, request_hash=digest, expires_at=expires_at
+                ), True
+        except IntegrityError:
+            pass
+        existing = _live(key, now)
+        if existing is not None:
+            return existing, False
+        # Expired but not purged yet.
+        IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+    raise GraphQLError(
+        "Idempotency key is being used concurrently; retry the request.",
+        extensions={"code": "IDEMPOTENCY_KEY_IN_USE"},
+    )
+
+
+def _replay(row, digest, payload_class):
+    if row.request_hash != digest:
+        raise GraphQLError(
+            "Idempotency key was already used with different arguments.",
+            extensions={"code": "IDEMPOTENCY_KEY_REUSED"},
+        )
+    if row.response is None:
+        # Only seen where the unique index doesn't make us wait.
+        raise GraphQLError(
+            "A request with this idempotency key is still in progress.",
+            extensions={"code": "IDEMPOTENCY_KEY_IN_USE"},
+        )
+    return load_payload(payload_class, row.response)
+
+
+def idempotent(mutate):
+    """
+    Adds the optional ``idempotency_key`` argument to a mutation's
+    ``mutate``. Without a key the mutation runs as before.
+    """
+
+    @functools.wraps(mutate)
+    def wrapper(root, info, idempotency_key=None, **arguments):
+        if idempotency_key is None:
+            return mutate(root, info, **arguments)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise GraphQLError(
+                f"Idempotency key must be 1 to {MAX_KEY_LENGTH} characters.",
+                extensions={"code": "IDEMPOTENCY_KEY_INVALID"},
+            )
+
+        payload_class = info.return_type.graphene_type
+        digest = request_hash(info.field_name, arguments)
+        now = timezone.now()
+        # Retries of finished requests are answered without a transaction.
+        row = _live(idempotency_key, now)
+        if row is not None and row.response is not None:
+            return _replay(row, digest, payload_class)
+
+        with transaction.atomic():
+            row, created = _claim(idempotency_key, digest, now)
+            if not created:
+                return _replay(row, digest, payload_class)
+            payload = mutate(root, info, **arguments)
+            IdempotencyKey.objects.filter(pk=row.pk).update(response=dump_payload(payload))
+            return payload
+
+    return wrapper
+
+
+def purge_expired(batch_size=None, now=None):
+    """
+    Deletes expired keys, ``batch_size`` rows per statement so no single
+    transaction holds many locks. Returns the number deleted.
+    """
+    batch_size = batch_size or get_config()["PURGE_BATCH_SIZE"]
+    now = now or timezone.now()
+    expired = IdempotencyKey.objects.filter(expires_at__lte=now)
+    deleted = 0
+    while True:
+        ids = list(expired.order_by("expires_at").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
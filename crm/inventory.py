@@ -0,0 +1,294 @@
+import json
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import cache
+from .models import LOW_STOCK_THRESHOLD, DailySales, Product
+
+PRODUCT_COLUMNS = [f.attname for f in Product._meta.concrete_fields]
+
+
+class OutOfStock(Exception):
+    """Raised by reserve_stock; ``products`` are the pks that fell short."""
+
+    def __init__(self, products):
+        super().__init__(f"Insufficient stock for products {products}.")
+        self.products = products
+
+
+def supports_update_returning():
+    """UPDATE ... RETURNING: PostgreSQL and SQLite >= 3.35 (not MySQL/MariaDB)."""
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def _update_returning(threshold, increment):
+    qn = connection.ops.quote_name
+    table = qn(Product._meta.db_table)
+    stock = qn(Product._meta.get_field("stock").column)
+    columns = ", ".join(qn(Product._meta.get_field(name).column) for name in PRODUCT_COLUMNS)
+    sql = (
+        f"UPDATE {table} SET {stock} = {stock} + %s "
+        f"WHERE {stock} < %s RETURNING {columns}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [increment, threshold])
+        rows = cursor.fetchall()
+    # Raw rows skip the ORM's converters (SQLite returns prices as floats
+    # and naive datetimes); apply them as a queryset would.
+    converters = []
+    for name in PRODUCT_COLUMNS:
+        col = Product._meta.get_field(name).get_col(Product._meta.db_table)
+        converters.append(
+            (col, connection.ops.get_db_converters(col) + col.get_db_converters(connection))
+        )
+    products = []
+    for row in rows:
+        values = []
+        for value, (col, functions) in zip(row, converters):
+            for convert in functions:
+                value = convert(value, col, connection)
+            values.append(value)
+        products.append(Product.from_db(connection.alias, PRODUCT_COLUMNS, values))
+    return products
+
+
+@transaction.atomic
+def restock_low_stock(threshold=LOW_STOCK_THRESHOLD, increment=10, sample_size=None):
+    """
+    Adds ``increment`` to the stock of every product with
+    ``stock < threshold`` in one set-based UPDATE (``stock = stock + n``).
+
+    Returns ``(updated_count, products)``. ``products`` holds at most
+    ``sample_size`` of the updated rows (all of them when None, none when
+    0). Where the database supports it the rows come back through
+    ``UPDATE ... RETURNING``; otherwise the ids are read first and the
+    sample is fetched after the update.
+    """
+    low_stock = Product.objects.filter(stock__lt=threshold)
+    if sample_size == 0:
+        updated, products = low_stock.update(stock=F("stock") + increment), []
+    elif supports_update_returning():
+        products = _update_returning(threshold, increment)
+        products.sort(key=lambda p: p.pk)
+        updated, products = len(products), products[:sample_size]
+    else:
+        ids = list(low_stock.select_for_update().order_by("pk").values_list("pk", flat=True))
+        Product.objects.filter(pk__in=ids).update(stock=F("stock") + increment)
+        updated = len(ids)
+        products = list(Product.objects.filter(pk__in=ids[:sample_size]).order_by("pk"))
+    # QuerySet.update() sends no signals, so invalidate cached responses
+    # here, once the new stock is written.
+    if updated:
+        cache.invalidate()
+    return updated, products
+
+
+def reserve_stock(lines):
+    """
+    Takes ``quantity`` units of every product in ``lines`` (``{pk:
+    quantity}``) with one conditional UPDATE each:
+    ``stock = stock - n WHERE pk = x AND stock >= n``.
+
+    The database checks and decrements in one statement, so concurrent
+    orders can't both sell the last units, and no row is locked before the
+    UPDATE itself (no SELECT ... FOR UPDATE). Products are updated in pk
+    order, so two orders never wait on each other's rows crosswise.
+
+    Returns ``{pk: remaining stock}`` where the database supports UPDATE
+    ... RETURNING, else None. Raises OutOfStock naming every product that
+    fell short; call it inside ``transaction.atomic()`` so the decrements
+    that did succeed are rolled back.
+    """
+    remaining = {} if supports_update_returning() else None
+    qn = connection.ops.quote_name
+    table = qn(Product._meta.db_table)
+    stock = qn(Product._meta.get_field("stock").column)
+    pk = qn(Product._meta.pk.column)
+    short = []
+    for product_pk, quantity in sorted(lines.items()):
+        if remaining is None:
+            updated = Product.objects.filter(pk=product_pk, stock__gte=quantity).update(
+                stock=F("stock") - quantity
+            )
+            if not updated:
+                short.append(product_pk)
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET {stock} = {stock} - %s "
+                f"WHERE {pk} = %s AND {stock} >= %s RETURNING {stock}",
+                [quantity, product_pk, quantity],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            short.append(product_pk)
+        else:
+            remaining[product_pk] = row[0]
+    if short:
+        raise OutOfStock(short)
+    return remaining
+
+
+# =====================
+# Velocity-based restocking
+# =====================
+
+RESTOCK_DEFAULTS = {
+    # Days of sales the velocity is averaged over.
+    "WINDOW_DAYS": 28,
+    # Reorder when stock would last fewer than this many days...
+    "REORDER_DAYS": 7,
+    # ...and add enough for this many more.
+    "COVER_DAYS": 14,
+    # Floors for slow and unsold products (the old fixed policy).
+    "MIN_THRESHOLD": LOW_STOCK_THRESHOLD,
+    "MIN_QUANTITY": 10,
+    "CHUNK_SIZE": 1000,
+    # Restocked products listed in the batch record.
+    "SAMPLE_SIZE": 20,
+    "LOG_FILE": "/tmp/low_stock_updates_log.txt",
+}
+
+
+def get_restock_config():
+    return {**RESTOCK_DEFAULTS, **getattr(settings, "CRM_RESTOCK", {})}
+
+
+def reorder_policy(units_sold, config):
+    """
+    ``(threshold, quantity)`` of a product that sold ``units_sold`` units
+    in the last ``WINDOW_DAYS`` days: restock below ``threshold`` units, by
+    ``quantity`` units.
+    """
+    per_day = units_sold / config["WINDOW_DAYS"]
+    return (
+        max(config["MIN_THRESHOLD"], math.ceil(per_day * config["REORDER_DAYS"])),
+        max(config["MIN_QUANTITY"], math.ceil(per_day * config["COVER_DAYS"])),
+    )
+
+
+def units_sold(first_pk, last_pk, since):
+    """
+    ``{product_pk: units}`` sold since ``since`` (a date) for products
+    ``first_pk..last_pk``, summed over the product rows of the DailySales
+    rollup (one row per product-day, read through its unique index).
+    """
+    rows = (
+        DailySales.objects.filter(product__gte=first_pk, product__lte=last_pk, day__gte=since)
+        .values("product")
+        .annotate(units=Sum("units"))
+        .values_list("product", "units")
+    )
+    return dict(rows)
+
+
+def _restock_chunk(products, since, config, sample):
+    """
+    Restocks one chunk of ``(pk, stock)``; returns ``(products, units)``
+    added. Only rows the UPDATE changed count: one restocked (or sold out
+    of) since the chunk was read no longer matches ``stock < threshold``.
+    """
+    sold = units_sold(products[0][0], products[-1][0], since)
+    updates = []
+    for pk, stock in products:
+        threshold, quantity = reorder_policy(sold.get(pk, 0), config)
+        if stock < threshold:
+            updates.append((quantity, pk, threshold))
+    if not updates:
+        return 0, 0
+    qn = connection.ops.quote_name
+    table = qn(Product._meta.db_table)
+    stock = qn(Product._meta.get_field("stock").column)
+    pk = qn(Product._meta.pk.column)
+    sql = f"UPDATE {table} SET {stock} = {stock} + %s WHERE {pk} = %s AND {stock} < %s"
+    returning = supports_update_returning()
+    if returning:
+        sql += f" RETURNING {stock}"
+    changed = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        # One statement per row: executemany() reports neither the rows
+        # each UPDATE matched nor what it returned.
+        for quantity, product_id, threshold in updates:
+            cursor.execute(sql, [quantity, product_id, threshold])
+            if returning:
+                row = cursor.fetchone()
+                if row is not None:
+                    changed[product_id] = row[0]
+            elif cursor.rowcount:
+                changed[product_id] = None
+        if changed and not returning:
+            changed.update(Product.objects.filter(pk__in=changed).values_list("pk", "stock"))
+    units = 0
+    for quantity, product_id, threshold in updates:
+        if product_id not in changed:
+            continue
+        units += quantity
+        if len(sample) < config["SAMPLE_SIZE"]:
+            sample.append({"id": product_id, "stock": changed[product_id], "threshold": threshold,
+                           "quantity": quantity, "units_sold": sold.get(product_id, 0)})
+    return len(changed), units
+
+
+def restock_by_velocity(today=None, **options):
+    """
+    Restocks every product whose stock is below its reorder threshold,
+    with thresholds and quantities learned from its sales over the last
+    ``WINDOW_DAYS`` days (see ``reorder_policy``). The catalogue is read
+    ``CHUNK_SIZE`` products at a time in pk order, one transaction per
+    chunk. ``options`` override CRM_RESTOCK settings.
+
+    Appends one JSON record for the run to ``LOG_FILE`` (unless it is
+    None) and returns it.
+    """
+    config = {**get_restock_config(), **options}
+    today = today or timezone.localdate()
+    since = today - timedelta(days=config["WINDOW_DAYS"] - 1)
+    started = time.perf_counter()
+    record = {
+        "timestamp": timezone.now().isoformat(timespec="seconds"),
+        "window": [since.isoformat(), today.isoformat()],
+        "chunks": 0,
+        "products_scanned": 0,
+        "products_restocked": 0,
+        "units_added": 0,
+        "restocked": [],
+    }
+    try:
+        last_pk = 0
+        while True:
+            products = list(
+                Product.objects.filter(pk__gt=last_pk).order_by("pk")
+                .values_list("pk", "stock")[:config["CHUNK_SIZE"]]
+            )
+            if not products:
+                break
+            restocked, units = _restock_chunk(products, since, config, record["restocked"])
+            record["chunks"] += 1
+            record["products_scanned"] += len(products)
+            record["products_restocked"] += restocked
+            record["units_added"] += units
+            last_pk = products[-1][0]
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+        raise
+    finally:
+        if record["products_restocked"]:
+            # Raw UPDATEs send no signals.
+            cache.invalidate()
+        record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if config["LOG_FILE"]:
+            with open(config["LOG_FILE"], "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, sort_keys=True) + "\n")
+    return record
@@ -0,0 +1,213 @@
+import asyncio
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+
+from .aio import running_async
+from .models import Customer, Order, OrderItem
+
+
+class DataLoader:
+    """
+    Minimal synchronous DataLoader.
+
+    Keys are collected with ``queue()`` (usually by the resolver that
+    returned the parent list) and the first ``load()`` of a missing key
+    fetches every queued key with one call to ``batch_load_fn``. Results are
+    cached for the rest of the request, so repeated loads are free.
+
+    ``batch_load_fn(keys)`` must return one value per key, in key order.
+    """
+
+    def __init__(self, batch_load_fn):
+        self.batch_load_fn = batch_load_fn
+        self._cache = {}
+        self._queue = {}
+
+    def queue(self, keys):
+        for key in keys:
+            if key not in self._cache:
+                self._queue[key] = None
+
+    def prime(self, key, value):
+        self._cache.setdefault(key, value)
+        self._queue.pop(key, None)
+
+    def load(self, key):
+        if key not in self._cache:
+            self._queue[key] = None
+            self.dispatch()
+        return self._cache[key]
+
+    def load_many(self, keys):
+        keys = list(keys)
+        self.queue(keys)
+        if self._queue:
+            self.dispatch()
+        return [self._cache[key] for key in keys]
+
+    def dispatch(self):
+        keys = list(self._queue)
+        self._queue.clear()
+        self._cache.update(zip(keys, self.batch_load_fn(keys)))
+
+
+class AsyncDataLoader(DataLoader):
+    """
+    Awaitable DataLoader for the async view.
+
+    ``load()`` returns a future. Every key requested (or queued) during the
+    same event-loop tick is fetched by one ``batch_load_fn`` call, which
+    runs the sync ORM in a worker thread.
+    """
+
+    def __init__(self, batch_load_fn):
+        super().__init__(batch_load_fn)
+        self._futures = {}
+        self._scheduled = False
+
+    def load(self, key):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if key in self._cache:
+            future.set_result(self._cache[key])
+            return future
+
+        self._futures.setdefault(key, []).append(future)
+        self._queue[key] = None
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(lambda: asyncio.ensure_future(self.dispatch()))
+        return future
+
+    async def load_many(self, keys):
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    async def dispatch(self):
+        self._scheduled = False
+        # Keys primed (e.g. by track_orders) since they were requested.
+        for key in [key for key in self._futures if key in self._cache]:
+            for future in self._futures.pop(key):
+                future.set_result(self._cache[key])
+
+        keys = list(self._queue)
+        self._queue.clear()
+        if not keys:
+            return
+        futures = {key: self._futures.pop(key, []) for key in keys}
+        try:
+            values = await sync_to_async(self.batch_load_fn)(keys)
+        except Exception as e:
+            for waiting in futures.values():
+                for future in waiting:
+                    future.set_exception(e)
+            return
+        self._cache.update(zip(keys, values))
+        for key, value in zip(keys, values):
+            for future in futures[key]:
+                future.set_result(value)
+
+
+class Loaders:
+    """
+    The per-request set of loaders used by the CRM types.
+
+    ``track_orders``/``track_customers`` must be called with every list of
+    orders/customers handed to GraphQL, so that the related-object loads
+    of all siblings are answered by a single query.
+
+    With ``use_async`` the loaders return awaitables (see AsyncDataLoader).
+    """
+
+    def __init__(self, use_async=False):
+        loader_class = AsyncDataLoader if use_async else DataLoader
+        self.customer = loader_class(self._load_customers)
+        self.order_products = loader_class(self._load_order_products)
+        self.order_items = loader_class(self._load_order_items)
+        self.customer_orders = loader_class(self._load_customer_orders)
+
+    def track_orders(self, orders):
+        for order in orders:
+            # Rows the queryset already joined or prefetched are resolved from
+            # the instance; never touch a deferred column (a query per row).
+            if Order.customer.is_cached(order):
+                if not order.customer.get_deferred_fields():
+                    self.customer.prime(order.customer_id, order.customer)
+            elif "customer_id" not in order.get_deferred_fields():
+                self.customer.queue([order.customer_id])
+
+            if prefetched(order, "products") is None:
+                self.order_products.queue([order.pk])
+            if prefetched(order, "items") is None:
+                self.order_items.queue([order.pk])
+        return orders
+
+    def track_customers(self, customers):
+        for customer in customers:
+            if not customer.get_deferred_fields():
+                self.customer.prime(customer.pk, customer)
+
+            orders = prefetched(customer, "orders")
+            if orders is None:
+                self.customer_orders.queue([customer.pk])
+            else:
+                self.track_orders(orders)
+        return customers
+
+    @staticmethod
+    def _load_customers(keys):
+        customers = Customer.objects.in_bulk(keys)
+        return [customers.get(key) for key in keys]
+
+    @staticmethod
+    def _load_order_products(keys):
+        return [
+            [item.product for item in items]
+            for items in Loaders._load_order_items(keys)
+        ]
+
+    @staticmethod
+    def _load_order_items(keys):
+        rows = (
+            OrderItem.objects
+            .filter(order_id__in=keys)
+            .select_related("product")
+            .order_by("pk")
+        )
+        items = defaultdict(list)
+        for row in rows:
+            items[row.order_id].append(row)
+        return [items[key] for key in keys]
+
+    def _load_customer_orders(self, keys):
+        orders = defaultdict(list)
+        for order in Order.objects.filter(customer_id__in=keys).order_by("order_date", "id"):
+            orders[order.customer_id].append(order)
+        # The parent customers are already cached; queue the products of
+        # every fetched order so nested `orders { products }` stays batched.
+        self.track_orders([o for key in keys for o in orders[key]])
+        return [orders[key] for key in keys]
+
+
+def prefetched(instance, name):
+    """Returns the prefetch_related() rows of ``instance.<name>``, or None."""
+    cache = getattr(instance, "_prefetched_objects_cache", {})
+    if name not in cache:
+        return None
+    return list(cache[name])
+
+
+def get_loaders(info):
+    """
+    Returns the Loaders hung off ``info.context`` (the Django request under
+    GraphQLView), creating them on first use; inside an event loop they are
+    awaitable. Without a context object to attach to, a throwaway instance
+    is returned and nothing is batched.
+    """
+    context = info.context
+    loaders = getattr(context, "loaders", None)
+    if loaders is None:
+        loaders = Loaders(use_async=running_async())
+        if context is not None:
+            setattr(context, "loaders", loaders)
+    return loaders
@@ -0,0 +1,8 @@
+"""Helpers shared by the bench_* commands (not a command itself)."""
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,84 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from crm.bulk import bulk_create_customers
+from crm.models import Customer
+from crm.validators import validate_phone
+
+
+def legacy_bulk_create(rows):
+    """The per-row loop BulkCreateCustomers used before crm.bulk existed."""
+    created, errors = [], []
+    for index, row in enumerate(rows):
+        name = (row.name or "").strip()
+        email = (row.email or "").strip().lower()
+        phone = row.phone.strip() if row.phone else None
+
+        row_errors = []
+        if not name:
+            row_errors.append("Name is required.")
+        if not email:
+            row_errors.append("Email is required.")
+        elif Customer.objects.filter(email=email).exists():
+            row_errors.append("Email already exists.")
+        if phone and not validate_phone(phone):
+            row_errors.append("Invalid phone format.")
+
+        if row_errors:
+            errors.append(f"Row {index + 1}: " + "; ".join(row_errors))
+            continue
+        created.append(Customer.objects.create(name=name, email=email, phone=phone))
+    return created, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the set-based customer import against the legacy per-row loop. "
+        "Both runs are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50_000)
+        parser.add_argument("--skip-legacy", action="store_true",
+                            help="Only time the bulk engine (the loop is slow at 50k rows).")
+
+    def handle(self, *args, **options):
+        rows = [
+            SimpleNamespace(
+                name=f"Customer {i}",
+                # every 50th row repeats an earlier email
+                email=f"bench{i - 1 if i % 50 == 0 else i}@example.com",
+                phone=f"+1555{i:07d}",
+            )
+            for i in range(options["rows"])
+        ]
+
+        engines = [("bulk", bulk_create_customers)]
+        if not options["skip_legacy"]:
+            engines.append(("legacy", legacy_bulk_create))
+
+        for label, engine in engines:
+            elapsed, queries, created, errors = self._run(engine, rows)
+            self.stdout.write(
+                f"{label:>6}: {elapsed:8.2f}s {queries:>7} queries "
+                f"{created} created, {errors} errors"
+            )
+
+    @staticmethod
+    def _run(engine, rows):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with transaction.atomic(), connection.execute_wrapper(count_queries):
+            start = time.perf_counter()
+            created, errors = engine(rows)
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return elapsed, queries, len(created), len(errors)
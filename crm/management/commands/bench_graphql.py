@@ -0,0 +1,269 @@
+import json
+import platform
+import random
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from crm.models import Customer, Order, Product
+from crm.seeding import seed_crm
+
+from ._bench import percentile
+
+ORDERS_PAGE = """
+query ($after: String) {
+  orders(first: 50, after: $after) {
+    edges { node { id totalAmount orderDate customer { name }
+                   products(first: 5) { edges { node { name price } } } } }
+    pageInfo { endCursor hasNextPage }
+  }
+}
+"""
+
+ORDERS_FILTERED = """
+query ($min: Decimal) {
+  orders(first: 20, totalAmount_Gte: $min) { edges { node { id totalAmount } } }
+}
+"""
+
+CUSTOMERS_SEARCH = """
+query ($name: String) {
+  customers(first: 20, name_Icontains: $name) { edges { node { id name email } } }
+}
+"""
+
+CUSTOMER_ORDERS = """
+{
+  customers(first: 10) {
+    edges { node { name orders(first: 5) { edges { node { totalAmount
+      products(first: 3) { edges { node { name } } } } } } } }
+  }
+}
+"""
+
+PRODUCTS_PAGE = """
+query ($stock: Int) {
+  products(first: 50, stock_Lte: $stock) { edges { node { id name price stock } } }
+}
+"""
+
+CRM_STATS = "{ crmStats(groupBy: WEEK) { totalOrders totalRevenue groups { period revenue } } }"
+
+CREATE_ORDER = """
+mutation ($input: OrderInput!) {
+  createOrder(input: $input) { order { id totalAmount } errors }
+}
+"""
+
+CREATE_CUSTOMER = """
+mutation ($input: CustomerInput!) {
+  createCustomer(input: $input) { customer { id } errors }
+}
+"""
+
+RESTOCK = """
+mutation { updateLowStockProducts(threshold: 5, sampleSize: 0) { updatedCount success } }
+"""
+
+
+# name: (weight, build(rng, data, i) -> (query, variables))
+OPERATIONS = {
+    "orders_page": (25, lambda rng, data, i: (ORDERS_PAGE, {})),
+    "orders_filtered": (10, lambda rng, data, i: (
+        ORDERS_FILTERED, {"min": str(rng.randint(10, 1000))})),
+    "customers_search": (10, lambda rng, data, i: (
+        CUSTOMERS_SEARCH, {"name": str(rng.randint(1, 99))})),
+    "customer_orders": (15, lambda rng, data, i: (CUSTOMER_ORDERS, {})),
+    "products_page": (10, lambda rng, data, i: (
+        PRODUCTS_PAGE, {"stock": rng.randint(0, 200)})),
+    "crm_stats": (5, lambda rng, data, i: (CRM_STATS, {})),
+    "create_order": (15, lambda rng, data, i: (CREATE_ORDER, {"input": {
+        "customerId": str(rng.choice(data["customers"])),
+        "productIds": [str(pk) for pk in rng.sample(data["products"], 3)],
+    }})),
+    "create_customer": (8, lambda rng, data, i: (CREATE_CUSTOMER, {"input": {
+        "name": f"Bench {i}", "email": f"bench-run-{i}@example.com",
+    }})),
+    "restock": (2, lambda rng, data, i: (RESTOCK, {})),
+}
+
+
+def _summary(latencies, queries):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "sql_queries_per_request": round(statistics.mean(queries), 2),
+    }
+
+
+def _delta(current, baseline):
+    """Percent change of each latency figure and the SQL difference."""
+    delta = {}
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        if baseline.get(key):
+            delta[f"{key}_pct"] = round((current[key] - baseline[key]) / baseline[key] * 100, 1)
+    delta["sql_queries_per_request"] = round(
+        current["sql_queries_per_request"] - baseline.get("sql_queries_per_request", 0), 2
+    )
+    return delta
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a reproducible data set, replays a fixed mix of CRM queries and "
+        "mutations through the test client against /graphql and prints "
+        "latency percentiles, throughput and SQL counts as JSON. Seeded data "
+        "and mutations are rolled back unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=10_000)
+        parser.add_argument("--customers", type=int,
+                            help="Defaults to one customer per 10 orders.")
+        parser.add_argument("--products", type=int, default=500)
+        parser.add_argument("--no-seed", action="store_true",
+                            help="Benchmark the rows already in the database.")
+        parser.add_argument("--seed", type=int, default=42,
+                            help="Random seed for the data set and the request mix.")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--operation", action="append", choices=sorted(OPERATIONS),
+                            help="Only replay these operations (repeatable).")
+        parser.add_argument("--label", default="", help="Free text stored in the report.")
+        parser.add_argument("--baseline", help="Earlier report to compute deltas against.")
+        parser.add_argument("--output", help="Also write the report to this file.")
+        parser.add_argument("--keep", action="store_true",
+                            help="Commit the seeded rows and mutations.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        # Lets the test client through ALLOWED_HOSTS, as under the test runner.
+        try:
+            setup_test_environment()
+            teardown = True
+        except RuntimeError:
+            teardown = False  # already set up (e.g. called from a test)
+        try:
+            with transaction.atomic():
+                report = self._bench(options)
+                if not options["keep"]:
+                    transaction.set_rollback(True)
+        finally:
+            if teardown:
+                teardown_test_environment()
+
+        if baseline is not None:
+            report["delta"] = {
+                name: _delta(summary, baseline["operations"][name])
+                for name, summary in report["operations"].items()
+                if name in baseline.get("operations", {})
+            }
+            report["delta"]["overall"] = _delta(report["overall"], baseline["overall"])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def _bench(self, options):
+        rng = random.Random(options["seed"])
+        seed_seconds = None
+        if options["no_seed"]:
+            data = {
+                "customers": list(Customer.objects.values_list("pk", flat=True)),
+                "products": list(Product.objects.values_list("pk", flat=True)),
+            }
+        else:
+            customers = options["customers"] or max(options["orders"] // 10, 10)
+            start = time.perf_counter()
+            data = seed_crm(customers, options["products"], options["orders"],
+                            seed=options["seed"], tag="bench")
+            seed_seconds = round(time.perf_counter() - start, 3)
+        if not data["customers"] or len(data["products"]) < 3:
+            raise CommandError("Need at least one customer and three products.")
+
+        orders = Order.objects.count()
+        names = options["operation"] or list(OPERATIONS)
+        weights = [OPERATIONS[name][0] for name in names]
+        plan = rng.choices(names, weights, k=options["warmup"] + options["requests"])
+
+        client = Client()
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        samples = {name: ([], []) for name in names}
+        failures = {}
+        started = None
+        for i, name in enumerate(plan):
+            if i == options["warmup"]:
+                started = time.perf_counter()
+            query, variables = OPERATIONS[name][1](rng, data, i)
+            queries = 0
+            # A savepoint per request, so a failed write can't abort the
+            # surrounding transaction; its own SQL isn't counted.
+            with transaction.atomic(), connection.execute_wrapper(count_queries):
+                start = time.perf_counter()
+                response = client.post(
+                    "/graphql", {"query": query, "variables": variables},
+                    content_type="application/json",
+                )
+                elapsed = time.perf_counter() - start
+            if i < options["warmup"]:
+                continue
+
+            body = response.json()
+            payload = next(iter((body.get("data") or {}).values()), None)
+            if (response.status_code != 200 or body.get("errors")
+                    or (isinstance(payload, dict) and payload.get("errors"))):
+                failures[name] = failures.get(name, 0) + 1
+            samples[name][0].append(elapsed)
+            samples[name][1].append(queries)
+        wall = time.perf_counter() - started if started else 0
+
+        all_latencies = [t for latencies, _ in samples.values() for t in latencies]
+        all_queries = [q for _, counts in samples.values() for q in counts]
+        overall = _summary(all_latencies, all_queries) if all_latencies else {}
+        if all_latencies:
+            overall["throughput_rps"] = round(len(all_latencies) / wall, 2)
+            overall["failures"] = sum(failures.values())
+
+        return {
+            "label": options["label"],
+            "environment": {
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "python": platform.python_version(),
+            },
+            "data": {
+                "customers": len(data["customers"]),
+                "products": len(data["products"]),
+                "orders": orders,
+                "seed": options["seed"],
+                "seed_seconds": seed_seconds,
+            },
+            "requests": options["requests"],
+            "warmup": options["warmup"],
+            "overall": overall,
+            "operations": {
+                name: {**_summary(latencies, counts), "failures": failures.get(name, 0)}
+                for name, (latencies, counts) in samples.items()
+                if latencies
+            },
+        }
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ._bench import percentile
+
+DEFAULT_QUERY = "{ orders(first: 20) { edges { node { id totalAmount customer { name } } } } }"
+
+
+async def _request(url, body, slow_ms):
+    """
+    One HTTP/1.1 request over a raw connection. With ``slow_ms`` the body is
+    sent in two halves with a pause in between, like a client on a slow
+    link, so the server has to keep the request open meanwhile.
+    """
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    head = (
+        f"POST {parts.path or '/'} HTTP/1.1\r\n"
+        f"Host: {parts.netloc}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode("ascii")
+
+    start = time.perf_counter()
+    writer.write(head + body[: len(body) // 2])
+    await writer.drain()
+    if slow_ms:
+        await asyncio.sleep(slow_ms / 1000)
+    writer.write(body[len(body) // 2:])
+    await writer.drain()
+
+    response = await reader.read()
+    elapsed = time.perf_counter() - start
+    writer.close()
+    status = int(response.split(b" ", 2)[1]) if response else 0
+    return elapsed, status
+
+
+async def _run(url, body, requests, concurrency, slow_ms):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            try:
+                elapsed, status = await _request(url, body, slow_ms)
+            except OSError:
+                failures += 1
+                return
+            if status != 200:
+                failures += 1
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    return latencies, failures, wall
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests running GraphQL endpoints with many concurrent (optionally "
+        "slow) clients, e.g. the WSGI /graphql under gunicorn against the "
+        "ASGI /graphql/async under uvicorn, and prints JSON results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target", action="append", required=True, metavar="NAME=URL",
+            help="Endpoint to test, e.g. wsgi=http://127.0.0.1:8000/graphql "
+                 "(repeat for each endpoint).",
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--slow-ms", type=int, default=200,
+                            help="Pause between the two halves of each request body.")
+        parser.add_argument("--query", default=DEFAULT_QUERY)
+
+    def handle(self, *args, **options):
+        body = json.dumps({"query": options["query"]}).encode("utf-8")
+        results = {}
+        for target in options["target"]:
+            name, sep, url = target.partition("=")
+            if not sep:
+                raise CommandError(f"--target must be NAME=URL, got {target!r}")
+
+            latencies, failures, wall = asyncio.run(
+                _run(url, body, options["requests"], options["concurrency"], options["slow_ms"])
+            )
+            results[name] = {
+                "url": url,
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "slow_ms": options["slow_ms"],
+                "failures": failures,
+                "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+                "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+            }
+
+        self.stdout.write(json.dumps(results, indent=2))
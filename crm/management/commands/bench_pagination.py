@@ -0,0 +1,107 @@
+import time
+from decimal import Decimal
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from alx_backend_graphql.schema import schema
+from crm.models import Customer, Order
+from crm.pagination import encode_cursor, seek_filter
+
+
+ORDERS_PAGE_QUERY = """
+query OrdersPage($first: Int!, $after: String) {
+  orders(first: $first, after: $after) {
+    edges { node { id totalAmount orderDate } }
+    pageInfo { endCursor hasNextPage }
+  }
+}
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares page latency of the keyset-paginated `orders` connection "
+        "with OFFSET pagination at increasing page depths."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Bulk-insert this many orders before measuring.")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--depths", type=int, nargs="+",
+                            default=[0, 1_000, 10_000, 100_000],
+                            help="Row offsets at which a page is measured.")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self._seed(options["seed"])
+
+        total = Order.objects.count()
+        page_size = options["page_size"]
+        ordered = Order.objects.order_by("order_date", "id")
+
+        self.stdout.write(f"{total} orders, page size {page_size}")
+        self.stdout.write(
+            f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10} {'graphql ms':>11}"
+        )
+
+        for depth in options["depths"]:
+            if depth >= total:
+                continue
+
+            # The cursor a client would hold after paging to `depth`.
+            anchor = ordered.values_list("order_date", "id")[depth]
+            after = encode_cursor(anchor)
+            key = ("order_date", "id")
+
+            offset_ms = self._measure(
+                lambda: list(ordered[depth + 1: depth + 1 + page_size]),
+                options["repeat"],
+            )
+            keyset_ms = self._measure(
+                lambda: list(ordered.filter(seek_filter(key, anchor, True))[:page_size]),
+                options["repeat"],
+            )
+            graphql_ms = self._measure(
+                lambda: schema.execute(
+                    ORDERS_PAGE_QUERY,
+                    variables={"first": page_size, "after": after},
+                ),
+                options["repeat"],
+            )
+            self.stdout.write(
+                f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f} {graphql_ms:>11.2f}"
+            )
+
+    @staticmethod
+    def _measure(fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
+
+    @transaction.atomic
+    def _seed(self, count):
+        customer, _ = Customer.objects.get_or_create(
+            email="bench@example.com", defaults={"name": "Bench"}
+        )
+        start = timezone.now() - timedelta(seconds=count)
+        batch = []
+        for i in range(count):
+            batch.append(Order(
+                customer=customer,
+                total_amount=Decimal("10.00"),
+                order_date=start + timedelta(seconds=i),
+            ))
+            if len(batch) == 5_000:
+                Order.objects.bulk_create(batch)
+                batch = []
+        Order.objects.bulk_create(batch)
+        self.stdout.write(f"Seeded {count} orders.")
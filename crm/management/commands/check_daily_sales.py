@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.rollups import CHUNK_DAYS, check, rebuild
+
+from .rebuild_daily_sales import parse_day
+
+
+def describe(key):
+    day, customer_id, product_id = key
+    if customer_id is not None:
+        return f"{day} customer {customer_id}"
+    if product_id is not None:
+        return f"{day} product {product_id}"
+    return f"{day}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the DailySales rollup with the orders and order items and "
+        "lists differing rows as (orders, units, revenue). Exits with an "
+        "error if any differ, unless --repair rebuilds the affected days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="First day to check.")
+        parser.add_argument("--to", dest="date_to", help="Last day to check.")
+        parser.add_argument("--chunk-days", type=int, default=CHUNK_DAYS)
+        parser.add_argument("--repair", action="store_true",
+                            help="Rebuild the days with differences.")
+
+    def handle(self, *args, **options):
+        date_from = parse_day(options["date_from"], "--from")
+        date_to = parse_day(options["date_to"], "--to")
+        if options["chunk_days"] < 1:
+            raise CommandError("--chunk-days must be positive.")
+
+        mismatches = check(date_from, date_to, options["chunk_days"])
+        for key, expected, stored in mismatches:
+            self.stdout.write(f"{describe(key)}: expected {expected}, stored {stored}")
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("The rollup matches the orders."))
+            return
+
+        days = sorted({key[0] for key, _, _ in mismatches})
+        if not options["repair"]:
+            raise CommandError(f"{len(mismatches)} rollup rows differ on {len(days)} days.")
+        for day in days:
+            rebuild(day, day)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(days)} days with {len(mismatches)} differing rows."
+        ))
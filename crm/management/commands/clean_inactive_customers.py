@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.cleanup import clean_inactive_customers, get_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes customers without an order in the last --days days, with "
+        "their orders, in short batched transactions. --dry-run only counts. "
+        "Prints a JSON summary including rows per second."
+    )
+
+    def add_arguments(self, parser):
+        config = get_config()
+        parser.add_argument("--days", type=int, default=config["INACTIVE_DAYS"],
+                            help="Customers inactive for this many days are deleted.")
+        parser.add_argument("--batch-size", type=int, default=config["BATCH_SIZE"],
+                            help="Customers deleted per transaction.")
+        parser.add_argument("--sleep", type=float, default=config["SLEEP"],
+                            help="Seconds to pause between batches.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count what would be deleted without deleting it.")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1 or options["batch_size"] < 1 or options["sleep"] < 0:
+            raise CommandError("--days and --batch-size must be positive, --sleep not negative.")
+
+        def progress(summary):
+            if options["verbosity"] > 1:
+                self.stderr.write(
+                    f"batch {summary['batches']}: {summary['customers']} customers, "
+                    f"{summary['orders']} orders"
+                )
+
+        summary = clean_inactive_customers(
+            dry_run=options["dry_run"], progress=progress,
+            INACTIVE_DAYS=options["days"], BATCH_SIZE=options["batch_size"],
+            SLEEP=options["sleep"],
+        )
+        self.stdout.write(json.dumps(summary, indent=2, sort_keys=True))
@@ -0,0 +1,166 @@
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from alx_backend_graphql.schema import schema
+from crm import rollups
+from crm.models import Customer, OrderItem, Product
+
+from ._bench import percentile
+
+CREATE_ORDER = """
+mutation ($input: OrderInput!) {
+  createOrder(input: $input) { order { id } errors }
+}
+"""
+
+# Tries per order when SQLite reports the database as locked.
+LOCKED_RETRIES = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress-tests stock reservation: several threads place createOrder "
+        "mutations against a few hot products until their stock runs out, "
+        "then checks that nothing was oversold and prints throughput and "
+        "latency as JSON. The stress rows are deleted afterwards unless "
+        "--keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--orders", type=int, default=100,
+                            help="Orders attempted per thread.")
+        parser.add_argument("--products", type=int, default=3,
+                            help="Number of hot products.")
+        parser.add_argument("--stock", type=int, default=200,
+                            help="Initial stock of each hot product.")
+        parser.add_argument("--max-quantity", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--keep", action="store_true",
+                            help="Keep the stress customer, products and orders.")
+
+    def handle(self, *args, **options):
+        if min(options["threads"], options["orders"], options["products"],
+               options["max_quantity"]) < 1:
+            raise CommandError("--threads, --orders, --products and --max-quantity must be positive.")
+
+        tag = f"stress-{options['seed']}-{time.time_ns()}"
+        customer = Customer.objects.create(name="Stress", email=f"{tag}@example.com")
+        products = [
+            Product.objects.create(name=f"Hot {i} ({tag})", price="9.99", stock=options["stock"])
+            for i in range(options["products"])
+        ]
+        try:
+            report = self._stress(customer, products, options)
+        finally:
+            if not options["keep"]:
+                customer.delete()  # cascades to the orders and their items
+                Product.objects.filter(pk__in=[p.pk for p in products]).delete()
+                today = timezone.localdate()
+                rollups.rebuild(today, today)
+
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+        if report["oversold"]:
+            raise CommandError(f"Oversold products: {report['oversold']}")
+
+    def _stress(self, customer, products, options):
+        start_gate = threading.Barrier(options["threads"])
+        lock = threading.Lock()
+        counts = {"ok": 0, "out_of_stock": 0, "failed": 0, "locked_retries": 0}
+        latencies = []
+
+        def worker(index):
+            rng = random.Random(f"{options['seed']}:{index}")
+            mine = []
+            try:
+                start_gate.wait()
+                for _ in range(options["orders"]):
+                    picked = rng.sample(products, rng.randint(1, min(2, len(products))))
+                    items = [
+                        {"productId": p.pk, "quantity": rng.randint(1, options["max_quantity"])}
+                        for p in picked
+                    ]
+                    outcome, elapsed, retries = self._order(customer, items)
+                    mine.append(elapsed)
+                    with lock:
+                        counts[outcome] += 1
+                        counts["locked_retries"] += retries
+            finally:
+                with lock:
+                    latencies.extend(mine)
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        sold = dict(
+            OrderItem.objects.filter(product__in=products)
+            .values("product").annotate(units=Sum("quantity")).values_list("product", "units")
+        )
+        stock = dict(Product.objects.filter(pk__in=[p.pk for p in products]).values_list("pk", "stock"))
+        per_product = {
+            str(p.pk): {
+                "initial_stock": options["stock"],
+                "sold": sold.get(p.pk, 0),
+                "final_stock": stock[p.pk],
+            }
+            for p in products
+        }
+        oversold = [
+            pk for pk, row in per_product.items()
+            if row["sold"] > row["initial_stock"]
+            or row["final_stock"] != row["initial_stock"] - row["sold"]
+        ]
+        attempts = sum(counts[key] for key in ("ok", "out_of_stock", "failed"))
+        return {
+            "database": connection.vendor,
+            "threads": options["threads"],
+            "attempts": attempts,
+            **counts,
+            "orders_per_second": round(counts["ok"] / wall, 2) if wall else None,
+            "attempts_per_second": round(attempts / wall, 2) if wall else None,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+            "products": per_product,
+            "oversold": oversold,
+        }
+
+    def _order(self, customer, items):
+        """Returns ``(outcome, seconds, locked retries)`` of one createOrder."""
+        variables = {"input": {"customerId": customer.pk, "items": items}}
+        start = time.perf_counter()
+        for retries in range(LOCKED_RETRIES):
+            close_old_connections()
+            result = schema.execute(
+                CREATE_ORDER, variable_values=variables, context_value=SimpleNamespace()
+            )
+            if result.errors and any(
+                isinstance(e.original_error, OperationalError) and "locked" in str(e)
+                for e in result.errors
+            ):
+                # SQLite allows one writer at a time; back off and try again.
+                time.sleep(0.001 * (retries + 1))
+                continue
+            break
+        elapsed = time.perf_counter() - start
+        if result.errors:
+            return "failed", elapsed, retries
+        errors = result.data["createOrder"]["errors"]
+        if not errors:
+            return "ok", elapsed, retries
+        if any(error.startswith("Insufficient stock") for error in errors):
+            return "out_of_stock", elapsed, retries
+        return "failed", elapsed, retries
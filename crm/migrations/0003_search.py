@@ -0,0 +1,89 @@
+from django.db import migrations
+
+# Search indexes used by crm.search.
+#
+# PostgreSQL: tsvector GIN indexes for ranked search (substring matches
+# use the trigram indexes from 0002). The expressions must match the ones
+# in crm.search.PostgresBackend.
+#
+# SQLite: FTS5 tables with the trigram tokenizer, using the base tables
+# as external content and kept in sync by triggers. Skipped if this
+# SQLite build has no FTS5; crm.search then falls back to LIKE. Note that
+# a later migration rebuilding crm_customer/crm_product on SQLite drops the
+# triggers with the old table and must recreate them.
+TSVECTOR_INDEXES = [
+    ("crm_customer_search_idx", "crm_customer", ("name", "email")),
+    ("crm_product_search_idx", "crm_product", ("name",)),
+]
+
+FTS_TABLES = [
+    ("crm_customer_fts", "crm_customer", ("name", "email")),
+    ("crm_product_fts", "crm_product", ("name",)),
+]
+
+
+def _postgres_forwards(schema_editor):
+    for name, table, columns in TSVECTOR_INDEXES:
+        document = " || ' ' || ".join(f'"{column}"' for column in columns)
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+            f"USING gin (to_tsvector('simple', {document}))"
+        )
+
+
+def _sqlite_forwards(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.crm_fts_probe USING fts5(a, tokenize='trigram')")
+        except Exception:
+            return
+        cursor.execute("DROP TABLE temp.crm_fts_probe")
+
+    for fts, table, columns in FTS_TABLES:
+        names = ", ".join(columns)
+        new = ", ".join(f"new.{column}" for column in columns)
+        old = ", ".join(f"old.{column}" for column in columns)
+        delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+        insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+        for sql in (
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', "
+            f"content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+            # Only text changes touch the index; stock updates don't.
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON {table} "
+            f"BEGIN {delete} {insert} END",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ):
+            schema_editor.execute(sql)
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _postgres_forwards(schema_editor)
+    elif vendor == "sqlite":
+        _sqlite_forwards(schema_editor)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for name, _, _ in TSVECTOR_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+    elif vendor == "sqlite":
+        for fts, _, _ in FTS_TABLES:
+            for suffix in ("ai", "ad", "au"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
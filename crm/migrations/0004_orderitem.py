@@ -0,0 +1,55 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Existing M2M rows become OrderItems with quantity 1. Their price at order
+# time was never stored, so the current product price is the best snapshot
+# available. Copied with one INSERT ... SELECT, not row by row.
+def copy_order_products(apps, schema_editor):
+    schema_editor.execute(
+        "INSERT INTO crm_orderitem (order_id, product_id, quantity, unit_price) "
+        "SELECT l.order_id, l.product_id, 1, p.price "
+        "FROM crm_order_products l JOIN crm_product p ON p.id = l.product_id "
+        "ORDER BY l.id"
+    )
+
+
+def copy_order_items(apps, schema_editor):
+    schema_editor.execute(
+        "INSERT INTO crm_order_products (order_id, product_id) "
+        "SELECT order_id, product_id FROM crm_orderitem ORDER BY id"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='crm.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='crm.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'quantity', 'unit_price'], name='crm_orderitem_sales_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'product'), name='crm_orderitem_order_product_uniq')],
+            },
+        ),
+        migrations.RunPython(copy_order_products, copy_order_items),
+        migrations.RemoveField(
+            model_name='order',
+            name='products',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='products',
+            field=models.ManyToManyField(related_name='orders', through='crm.OrderItem', to='crm.product'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-18 04:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_orderitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customer', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='crm.customer')),
+                ('product', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='crm.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('customer__isnull', True), ('product__isnull', True)), fields=('day',), name='crm_dailysales_day_uniq'), models.UniqueConstraint(condition=models.Q(('customer__isnull', False)), fields=('customer', 'day'), name='crm_dailysales_customer_uniq'), models.UniqueConstraint(condition=models.Q(('product__isnull', False)), fields=('product', 'day'), name='crm_dailysales_product_uniq'), models.CheckConstraint(condition=models.Q(('customer__isnull', True), ('product__isnull', True), _connector='OR'), name='crm_dailysales_one_dimension')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.10 on 2026-10-18 04:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0007_jobcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrmReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(default='running', max_length=10)),
+                ('range_size', models.PositiveIntegerField()),
+                ('min_order_id', models.PositiveBigIntegerField(default=1)),
+                ('max_order_id', models.PositiveBigIntegerField(default=0)),
+                ('customers', models.PositiveIntegerField(null=True)),
+                ('orders', models.PositiveIntegerField(null=True)),
+                ('units', models.PositiveBigIntegerField(null=True)),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=20, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CrmReportRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_order_id', models.PositiveBigIntegerField()),
+                ('last_order_id', models.PositiveBigIntegerField()),
+                ('orders', models.PositiveIntegerField()),
+                ('units', models.PositiveBigIntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranges', to='crm.crmreport')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('report', 'first_order_id'), name='crm_reportrange_uniq')],
+            },
+        ),
+    ]
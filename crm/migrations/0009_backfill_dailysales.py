@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+# 0005 created the rollup empty; without this step dailySales, crmStats and
+# the velocity restock read zeros until someone runs rebuild_daily_sales.
+# The rebuild is the same one that command runs (CHUNK_DAYS per
+# transaction, hence atomic=False) and only happens when there are orders
+# but no rollup rows yet, so databases rebuilt by hand are left alone.
+# crm.rollups works on the current models, which match the schema here.
+def backfill_daily_sales(apps, schema_editor):
+    from crm import rollups
+    from crm.models import DailySales, Order
+
+    if Order.objects.exists() and not DailySales.objects.exists():
+        rollups.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('crm', '0008_crmreport'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop, atomic=False),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.10 on 2026-10-18 04:55
+
+from django.db import migrations, models
+
+
+# Only the newest running report was ever resumed; the older ones can't
+# finish, so they are failed before the index allows a single one.
+def fail_older_running_reports(apps, schema_editor):
+    CrmReport = apps.get_model('crm', 'CrmReport')
+    running = CrmReport.objects.filter(status='running').order_by('-pk')
+    newest = running.first()
+    if newest is not None:
+        running.exclude(pk=newest.pk).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0009_backfill_dailysales'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_older_running_reports, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='crmreport',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('status',), name='crm_report_one_running'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils import timezone
 
+# Products below this stock count are restocked (see crm.inventory).
+LOW_STOCK_THRESHOLD = 10
+
 
 class Customer(models.Model):
     name = models.CharField(max_length=100)
@@ -8,6 +11,15 @@ class Customer(models.Model):
     phone = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the `customers` connection
+            models.Index(fields=["created_at", "id"], name="crm_customer_created_id_idx"),
+            # phone prefix filter; pattern ops let PostgreSQL use it for LIKE 'x%'
+            models.Index(fields=["phone"], name="crm_customer_phone_idx",
+                         opclasses=["varchar_pattern_ops"]),
+        ]
+
     def __str__(self):
         return f"{self.name} <{self.email}>"
 
@@ -18,6 +30,15 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="crm_product_created_id_idx"),
+            models.Index(fields=["price"], name="crm_product_price_idx"),
+            # Only the few low-stock rows the restock job looks for.
+            models.Index(fields=["stock"], name="crm_product_low_stock_idx",
+                         condition=models.Q(stock__lt=LOW_STOCK_THRESHOLD)),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.price})"
 
@@ -30,10 +51,174 @@ class Order(models.Model):
     )
     products = models.ManyToManyField(
         Product,
+        through="OrderItem",
         related_name="orders",
     )
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     order_date = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # keyset pagination / date filters of the `orders` connection
+            models.Index(fields=["order_date", "id"], name="crm_order_date_id_idx"),
+            # a customer's orders by date (nested `orders`, reminders, cleanup)
+            models.Index(fields=["customer", "order_date"], name="crm_order_customer_date_idx"),
+            models.Index(fields=["total_amount", "id"], name="crm_order_total_id_idx"),
+        ]
+
     def __str__(self):
         return f"Order #{self.pk} for {self.customer}"
+
+
+class OrderItem(models.Model):
+    """One product line of an order, priced as it was when the order was placed."""
+
+    order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name="order_items", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    # Snapshot of Product.price; later price changes don't rewrite history.
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["order", "product"], name="crm_orderitem_order_product_uniq"),
+        ]
+        indexes = [
+            # per-product units / revenue are answered from the index alone
+            models.Index(fields=["product", "quantity", "unit_price"],
+                         name="crm_orderitem_sales_idx"),
+        ]
+
+    @property
+    def line_total(self):
+        return self.quantity * self.unit_price
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} @ {self.unit_price} (order #{self.order_id})"
+
+
+class DailySales(models.Model):
+    """
+    Per-day order totals, maintained by crm.rollups. Each row is one of
+    three grains: the whole day (no customer, no product), one customer's
+    day or one product's day.
+    """
+
+    day = models.DateField()
+    # Indexed by the partial unique constraints below instead.
+    customer = models.ForeignKey(Customer, null=True, blank=True, related_name="+",
+                                 on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey(Product, null=True, blank=True, related_name="+",
+                                on_delete=models.CASCADE, db_index=False)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        # The unique constraints double as the indexes of the three series
+        # and of the foreign keys: `customer_id = x` implies the
+        # `customer_id IS NOT NULL` condition, so deletes cascading from a
+        # customer or product can use them.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day"], name="crm_dailysales_day_uniq",
+                condition=models.Q(customer__isnull=True, product__isnull=True),
+            ),
+            models.UniqueConstraint(
+                fields=["customer", "day"], name="crm_dailysales_customer_uniq",
+                condition=models.Q(customer__isnull=False),
+            ),
+            models.UniqueConstraint(
+                fields=["product", "day"], name="crm_dailysales_product_uniq",
+                condition=models.Q(product__isnull=False),
+            ),
+            models.CheckConstraint(
+                condition=models.Q(customer__isnull=True) | models.Q(product__isnull=True),
+                name="crm_dailysales_one_dimension",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.orders} orders, {self.revenue} revenue"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A write mutation's ``idempotencyKey`` and the payload it returned,
+    kept until ``expires_at`` so retries replay it (see crm.idempotency).
+    """
+
+    key = models.CharField(max_length=255, unique=True)
+    # sha256 of the mutation name and its arguments
+    request_hash = models.CharField(max_length=64)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # the purge task deletes expired keys by range
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class JobCheckpoint(models.Model):
+    """Where a batch job left off, so its next run resumes from there."""
+
+    name = models.CharField(max_length=100, unique=True)
+    state = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.state}"
+
+
+class CrmReport(models.Model):
+    """
+    One run of the CRM report. Orders ``min_order_id..max_order_id`` are
+    totalled per pk range (CrmReportRange) and merged when every range is
+    done; see crm.report_pipeline.
+    """
+
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    status = models.CharField(max_length=10, default=RUNNING)
+    range_size = models.PositiveIntegerField()
+    min_order_id = models.PositiveBigIntegerField(default=1)
+    max_order_id = models.PositiveBigIntegerField(default=0)
+    customers = models.PositiveIntegerField(null=True)
+    orders = models.PositiveIntegerField(null=True)
+    units = models.PositiveBigIntegerField(null=True)
+    revenue = models.DecimalField(max_digits=20, decimal_places=2, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            # Two concurrent runs can't both start a report.
+            models.UniqueConstraint(fields=["status"], condition=models.Q(status="running"),
+                                    name="crm_report_one_running"),
+        ]
+
+    def __str__(self):
+        return f"Report #{self.pk} ({self.status})"
+
+
+class CrmReportRange(models.Model):
+    """Totals of one order pk range of a report; its row marks the range done."""
+
+    report = models.ForeignKey(CrmReport, related_name="ranges", on_delete=models.CASCADE)
+    first_order_id = models.PositiveBigIntegerField()
+    last_order_id = models.PositiveBigIntegerField()
+    orders = models.PositiveIntegerField()
+    units = models.PositiveBigIntegerField()
+    revenue = models.DecimalField(max_digits=20, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["report", "first_order_id"],
+                                    name="crm_reportrange_uniq"),
+        ]
+
+    def __str__(self):
+        return f"Report #{self.report_id} orders {self.first_order_id}..{self.last_order_id}"
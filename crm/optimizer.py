@@ -0,0 +1,132 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode, get_named_type
+
+from .pagination import PAGINATION_ARGS
+
+
+def collect_fields(field_nodes, info):
+    """
+    Merges the sub-selections of ``field_nodes`` (following fragments) into
+    a ``{response field name: [FieldNode, ...]}`` dict.
+    """
+    fields = {}
+
+    def visit(selection_set):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields.setdefault(selection.name.value, []).append(selection)
+            elif isinstance(selection, InlineFragmentNode):
+                visit(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                visit(info.fragments[selection.name.value].selection_set)
+
+    for node in field_nodes:
+        if node.selection_set:
+            visit(node.selection_set)
+    return fields
+
+
+def unwrap_connection(gql_type, field_nodes, info):
+    """
+    For a relay connection type, returns the node type and the field nodes
+    selected under ``edges { node }``; other types are returned unchanged.
+    """
+    fields = getattr(gql_type, "fields", {})
+    if "edges" not in fields or "pageInfo" not in fields:
+        return gql_type, field_nodes
+
+    edge_type = get_named_type(fields["edges"].type)
+    edges = collect_fields(field_nodes, info).get("edges", [])
+    nodes = collect_fields(edges, info).get("node", [])
+    return get_named_type(edge_type.fields["node"].type), nodes
+
+
+class QuerysetPlan:
+    def __init__(self):
+        self.only = []
+        self.select_related = []
+        self.prefetch_related = []
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset.only(*dict.fromkeys(self.only))
+
+
+def build_plan(model, gql_type, field_nodes, info, plan, prefix=""):
+    """
+    Adds the columns / joins / prefetches needed by the selection to
+    ``plan``. Returns False when a selected field does not map onto the
+    model, in which case the caller must not restrict columns.
+    """
+    plan.only.append(prefix + model._meta.pk.name)
+
+    for name, nodes in collect_fields(field_nodes, info).items():
+        if name.startswith("__"):
+            continue
+        attr = to_snake_case(name)
+        if attr == "id":
+            continue
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return False
+
+        if not field.is_relation:
+            plan.only.append(prefix + field.name)
+            continue
+
+        sub_type = get_named_type(gql_type.fields[name].type)
+
+        if field.many_to_one or (field.one_to_one and field.concrete):
+            plan.only.append(prefix + field.name)
+            plan.select_related.append(prefix + field.name)
+            if not build_plan(
+                field.related_model, sub_type, nodes, info, plan, prefix + field.name + "__"
+            ):
+                return False
+            continue
+
+        # A filtered nested connection re-queries its rows; don't prefetch.
+        if any(arg.name.value not in PAGINATION_ARGS for node in nodes for arg in node.arguments):
+            continue
+
+        node_type, node_nodes = unwrap_connection(sub_type, nodes, info)
+        # Reverse foreign keys need the FK column to attach rows to parents.
+        extra = () if field.many_to_many else (field.field.name,)
+        related = optimize_queryset(
+            field.related_model._default_manager.all(), node_type, node_nodes, info, extra
+        )
+        lookup = field.name if field.concrete else field.get_accessor_name()
+        plan.prefetch_related.append(Prefetch(prefix + lookup, queryset=related))
+
+    return True
+
+
+def optimize_queryset(queryset, gql_type, field_nodes, info, extra_fields=()):
+    plan = QuerysetPlan()
+    if not build_plan(queryset.model, gql_type, field_nodes, info, plan):
+        return queryset
+    plan.only.extend(extra_fields)
+    return plan.apply(queryset)
+
+
+def optimize(queryset, info, extra_fields=()):
+    """
+    Restricts ``queryset`` to what the current field's selection set needs:
+    ``.only()`` the selected columns, ``select_related`` selected foreign
+    keys and ``prefetch_related`` selected many-valued relations with
+    querysets optimized the same way. Works for list fields and relay
+    connections. ``extra_fields`` are always loaded (e.g. keyset columns).
+
+    If any selected field can't be mapped to a model field the queryset is
+    returned unchanged rather than risking per-row deferred loads.
+    """
+    gql_type, field_nodes = unwrap_connection(
+        get_named_type(info.return_type), info.field_nodes, info
+    )
+    return optimize_queryset(queryset, gql_type, field_nodes, info, extra_fields)
@@ -0,0 +1,297 @@
+import base64
+import inspect
+import json
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from graphene.relay.connection import connection_adapter, page_info_adapter
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+from graphql import GraphQLError
+
+from .aio import alist, running_async
+
+# Arguments that only page a connection (everything else is a filter).
+PAGINATION_ARGS = {"first", "last", "before", "after", "offset"}
+
+
+def encode_cursor(values):
+    """
+    Encodes the keyset values of a row into an opaque relay cursor.
+    Datetimes / decimals are serialized through str() and parsed back with
+    the model field's to_python() when the cursor is decoded.
+    """
+    payload = json.dumps([str(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, fields):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(raw) != len(fields):
+            raise ValueError("cursor does not match the keyset")
+        return [field.to_python(value) for field, value in zip(fields, raw)]
+    except Exception:
+        raise GraphQLError(f"Invalid cursor: {cursor!r}")
+
+
+def seek_filter(key, values, forward):
+    """
+    Builds the row-value comparison (k1, k2, ...) > (v1, v2, ...) as a chain
+    of ORs so the database can walk the matching index instead of OFFSET.
+    """
+    lookup = "gt" if forward else "lt"
+    condition = Q()
+    for i, name in enumerate(key):
+        step = Q(**dict(zip(key[:i], values[:i])))
+        step &= Q(**{f"{name}__{lookup}": values[i]})
+        condition |= step
+    return condition
+
+
+class KeysetConnectionField(DjangoFilterConnectionField):
+    """
+    DjangoFilterConnectionField paginated with keyset (seek) cursors.
+
+    Rows are always ordered by ``key`` (a tuple of model fields ending in a
+    unique column, e.g. ``("order_date", "id")``), and ``after``/``before``
+    are translated into WHERE clauses on that key instead of OFFSET, so the
+    cost of a page does not depend on how deep the client has paged.
+    The filterset's ``order_by`` argument and the ``offset`` argument are
+    not exposed because they can't be combined with a stable keyset.
+    """
+
+    def __init__(self, type_, key=("created_at", "id"), *args, **kwargs):
+        self.key = tuple(key)
+        super().__init__(type_, *args, **kwargs)
+        self._base_args.pop("offset", None)
+
+    @property
+    def filtering_args(self):
+        args = super().filtering_args
+        args.pop("order_by", None)
+        return args
+
+    @classmethod
+    def page_queryset(cls, args, iterable, key, max_limit=None):
+        """
+        Applies the seek conditions, ordering and LIMIT for the requested
+        page. Returns ``(queryset, page)``, where ``page`` is the state
+        ``build_connection`` needs once the rows have been fetched.
+        """
+        queryset = maybe_queryset(iterable)
+        fields = [queryset.model._meta.get_field(name) for name in key]
+
+        first = args.get("first")
+        last = args.get("last")
+        after = args.get("after")
+        before = args.get("before")
+
+        if first is not None and first < 0:
+            raise GraphQLError("Argument 'first' must be a non-negative integer.")
+        if last is not None and last < 0:
+            raise GraphQLError("Argument 'last' must be a non-negative integer.")
+        if first is None and last is None:
+            first = max_limit
+
+        if after:
+            queryset = queryset.filter(seek_filter(key, decode_cursor(after, fields), True))
+        if before:
+            queryset = queryset.filter(seek_filter(key, decode_cursor(before, fields), False))
+
+        backwards = last is not None and first is None
+        if backwards:
+            # Walk the index backwards from `before` and flip the page.
+            queryset = queryset.order_by(*[f"-{name}" for name in key])[: last + 1]
+        else:
+            queryset = queryset.order_by(*key)
+            if first is not None:
+                queryset = queryset[: first + 1]
+
+        page = {
+            "first": first,
+            "last": last,
+            "backwards": backwards,
+            "has_previous_page": bool(after),
+            "has_next_page": bool(before),
+        }
+        return queryset, page
+
+    @classmethod
+    def build_connection(cls, connection, key, page, rows):
+        first, last = page["first"], page["last"]
+        has_previous_page = page["has_previous_page"]
+        has_next_page = page["has_next_page"]
+
+        if page["backwards"]:
+            has_previous_page = len(rows) > last
+            rows = rows[:last][::-1]
+        else:
+            if first is not None:
+                has_next_page = len(rows) > first
+                rows = rows[:first]
+            if last is not None and len(rows) > last:
+                has_previous_page = True
+                rows = rows[-last:]
+
+        edges = [
+            connection.Edge(
+                node=row,
+                cursor=encode_cursor([getattr(row, name) for name in key]),
+            )
+            for row in rows
+        ]
+        result = connection_adapter(
+            connection,
+            edges=edges,
+            pageInfo=page_info_adapter(
+                startCursor=edges[0].cursor if edges else None,
+                endCursor=edges[-1].cursor if edges else None,
+                hasPreviousPage=has_previous_page,
+                hasNextPage=has_next_page,
+            ),
+        )
+        result.iterable = rows
+        return result
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, key, max_limit=None):
+        queryset, page = cls.page_queryset(args, iterable, key, max_limit)
+        return cls.build_connection(connection, key, page, list(queryset))
+
+    @classmethod
+    async def aresolve_connection(cls, connection, args, iterable, key, max_limit=None):
+        queryset, page = cls.page_queryset(args, iterable, key, max_limit)
+        return cls.build_connection(connection, key, page, await alist(queryset))
+
+    @classmethod
+    def connection_resolver(
+        cls,
+        resolver,
+        connection,
+        default_manager,
+        queryset_resolver,
+        max_limit,
+        enforce_first_or_last,
+        key,
+        root,
+        info,
+        **args,
+    ):
+        first = args.get("first")
+        last = args.get("last")
+
+        if enforce_first_or_last and not (first or last):
+            raise GraphQLError(
+                f"You must provide a `first` or `last` value to paginate the `{info.field_name}` connection."
+            )
+        if max_limit and max(first or 0, last or 0) > max_limit:
+            raise GraphQLError(
+                f"Requesting more than {max_limit} records on the `{info.field_name}` connection is not allowed."
+            )
+
+        iterable = resolver(root, info, **args)
+        if iterable is None:
+            iterable = default_manager
+        iterable = queryset_resolver(connection, iterable, info, args)
+
+        # Let the node type queue batched loads for the rows on this page.
+        prime_loaders = getattr(connection._meta.node, "prime_loaders", None)
+
+        if running_async():
+            async def resolve_async():
+                result = await cls.aresolve_connection(
+                    connection, args, iterable, key, max_limit=max_limit
+                )
+                if prime_loaders is not None:
+                    prime_loaders(info, result.iterable)
+                return result
+
+            return resolve_async()
+
+        result = cls.resolve_connection(connection, args, iterable, key, max_limit=max_limit)
+        if prime_loaders is not None:
+            prime_loaders(info, result.iterable)
+        return result
+
+    def wrap_resolve(self, parent_resolver):
+        return partial(
+            self.connection_resolver,
+            self.resolver or parent_resolver,
+            self.connection_type,
+            self.get_manager(),
+            self.get_queryset_resolver(),
+            self.max_limit,
+            self.enforce_first_or_last,
+            self.key,
+        )
+
+
+class ListFilterConnectionField(DjangoFilterConnectionField):
+    """
+    DjangoFilterConnectionField whose resolver may return an already-loaded
+    list (e.g. from a DataLoader) instead of a queryset, or an awaitable of
+    one under the async view.
+
+    Without filter arguments the list is paginated in memory, so no query
+    is issued. When filters are given, the listed rows are re-queried and
+    run through the filterset as usual (in a worker thread when async).
+    """
+
+    @classmethod
+    def connection_resolver(
+        cls,
+        resolver,
+        connection,
+        default_manager,
+        queryset_resolver,
+        max_limit,
+        enforce_first_or_last,
+        root,
+        info,
+        **args,
+    ):
+        rows = resolver(root, info, **args)
+
+        def resolve(loaded):
+            return super(ListFilterConnectionField, cls).connection_resolver(
+                lambda *_, **__: loaded,
+                connection,
+                default_manager,
+                queryset_resolver,
+                max_limit,
+                enforce_first_or_last,
+                root,
+                info,
+                **args,
+            )
+
+        if not running_async():
+            return resolve(rows)
+
+        async def resolve_async():
+            loaded = await rows if inspect.isawaitable(rows) else rows
+            filtered = any(
+                value is not None
+                for name, value in args.items()
+                if name not in PAGINATION_ARGS
+            )
+            if isinstance(loaded, list) and not filtered:
+                return resolve(loaded)
+            return await sync_to_async(resolve)(loaded)
+
+        return resolve_async()
+
+    @classmethod
+    def resolve_queryset(
+        cls, connection, iterable, info, args, filtering_args, filterset_class
+    ):
+        if isinstance(iterable, list):
+            if not any(args.get(name) is not None for name in filtering_args):
+                return iterable
+            model = connection._meta.node._meta.model
+            iterable = model.objects.filter(pk__in=[obj.pk for obj in iterable])
+        return super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
@@ -0,0 +1,117 @@
+"""
+Automatic Persisted Queries and the parsed-document cache.
+
+Every document that parses and validates is kept, keyed by the sha256 of
+its text, in a bounded LRU. A client can then send only
+``extensions.persistedQuery.sha256Hash``; if the hash is unknown the
+server answers ``PersistedQueryNotFound`` and the client retries once with
+the full text (Apollo's APQ protocol). Plain requests with a query string
+hit the same cache, so repeated queries skip parse/validate either way.
+
+The cache size is ``GRAPHQL_DOCUMENT_CACHE_SIZE`` (default 500).
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from graphql import GraphQLError, parse, validate
+
+
+class PersistedQueryError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+    def as_graphql_error(self):
+        return GraphQLError(str(self), extensions={"code": self.code})
+
+
+class DocumentCache:
+    """Thread-safe LRU of validated DocumentNodes keyed by query hash."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            document = self._documents.get(digest)
+            if document is not None:
+                self._documents.move_to_end(digest)
+            return document
+
+    def put(self, digest, document):
+        with self._lock:
+            self._documents[digest] = document
+            self._documents.move_to_end(digest)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def __len__(self):
+        return len(self._documents)
+
+
+documents = DocumentCache(getattr(settings, "GRAPHQL_DOCUMENT_CACHE_SIZE", 500))
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def get_persisted_query(request, data):
+    """Returns the ``persistedQuery`` extension of a GET or POST request."""
+    extensions = request.GET.get("extensions") or data.get("extensions") or {}
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            return None
+    return extensions.get("persistedQuery") if isinstance(extensions, dict) else None
+
+
+def resolve_document(schema, query, persisted=None, validation_rules=None, max_errors=None):
+    """
+    Returns ``(document, errors)`` for a request.
+
+    Known hashes are served from the cache. Otherwise ``query`` is parsed
+    and validated, and cached if it is valid. Raises PersistedQueryError
+    for unknown hashes without a query, or a hash that doesn't match it.
+    """
+    if persisted is not None:
+        if persisted.get("version") != 1:
+            raise PersistedQueryError(
+                "Unsupported persisted query version.", "PERSISTED_QUERY_NOT_SUPPORTED"
+            )
+        digest = persisted.get("sha256Hash")
+        if query and query_hash(query) != digest:
+            raise PersistedQueryError(
+                "provided sha does not match query", "PERSISTED_QUERY_HASH_MISMATCH"
+            )
+    else:
+        digest = query_hash(query)
+
+    document = documents.get(digest)
+    if document is not None:
+        return document, []
+
+    if not query:
+        raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+
+    try:
+        document = parse(query)
+    except GraphQLError as error:
+        return None, [error]
+
+    errors = validate(schema, document, validation_rules, max_errors)
+    if errors:
+        return None, errors
+
+    documents.put(digest, document)
+    return document, []
@@ -0,0 +1,126 @@
+"""
+Order reminders: one reminder per customer for their recent orders.
+
+``send_order_reminders`` (the crm.tasks beat task of the same name) runs
+one query for orders of the last ``WINDOW_DAYS`` days with a pk above the
+stored checkpoint, groups them by customer email, and sends the groups
+``CHUNK_SIZE`` at a time on a pool of at most ``MAX_WORKERS`` threads.
+The checkpoint moves to the highest order pk only once every chunk was
+sent, so a failed run is retried whole by the next one and each run
+otherwise only sees new orders.
+
+The checkpoint is the pk alone, not ``order_date``: clients may set the
+date of an order (and a slow transaction may commit one late), so a new
+order can be dated before orders already reminded, but its pk is always
+higher than theirs.
+
+Configured with ``CRM_ORDER_REMINDERS`` in settings:
+
+    CRM_ORDER_REMINDERS = {
+        "WINDOW_DAYS": 7,
+        "CHUNK_SIZE": 100,     # customers per send
+        "MAX_WORKERS": 4,
+        "LOG_FILE": "/tmp/order_reminders_log.txt",
+    }
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import JobCheckpoint, Order
+
+CHECKPOINT = "order-reminders"
+
+DEFAULTS = {
+    "WINDOW_DAYS": 7,
+    "CHUNK_SIZE": 100,
+    "MAX_WORKERS": 4,
+    "LOG_FILE": "/tmp/order_reminders_log.txt",
+}
+
+_log_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_ORDER_REMINDERS", {})}
+
+
+def load_checkpoint():
+    """The pk of the last reminded order, or None."""
+    checkpoint = JobCheckpoint.objects.filter(name=CHECKPOINT).first()
+    if checkpoint is None or not checkpoint.state:
+        return None
+    return checkpoint.state["id"]
+
+
+def save_checkpoint(order_id):
+    JobCheckpoint.objects.update_or_create(name=CHECKPOINT, defaults={"state": {"id": order_id}})
+
+
+def pending_orders(since, after=None):
+    """
+    ``(id, order_date, customer email)`` of the orders placed since
+    ``since`` with a pk above ``after``, in pk order.
+    """
+    orders = Order.objects.filter(order_date__gte=since)
+    if after is not None:
+        orders = orders.filter(id__gt=after)
+    return list(orders.order_by("id").values_list("id", "order_date", "customer__email"))
+
+
+def group_by_email(rows):
+    """``[(email, [order ids])]`` in order of each customer's first order."""
+    groups = {}
+    for order_id, _, email in rows:
+        groups.setdefault(email, []).append(order_id)
+    return list(groups.items())
+
+
+def log_reminders(reminders, log_file):
+    """
+    Sends a chunk of ``(email, order ids)`` reminders. For now a reminder
+    is a log line; the whole chunk is written at once.
+    """
+    stamp = timezone.now().strftime("%Y-%m-%d %H:%M:%S%z")
+    lines = "".join(
+        f"{stamp} - Reminder to {email}: {len(ids)} order(s), IDs: {', '.join(map(str, ids))}\n"
+        for email, ids in reminders
+    )
+    with _log_lock, open(log_file, "a", encoding="utf-8") as f:
+        f.write(lines)
+
+
+def dispatch(reminders, send, chunk_size, max_workers):
+    """Runs ``send(chunk)`` over ``reminders`` on a bounded pool; returns the chunk count."""
+    chunks = [reminders[i:i + chunk_size] for i in range(0, len(reminders), chunk_size)]
+    if len(chunks) <= 1 or max_workers <= 1:
+        for chunk in chunks:
+            send(chunk)
+        return len(chunks)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+        # list() re-raises the first failure once every chunk has finished.
+        list(pool.map(send, chunks))
+    return len(chunks)
+
+
+def send_order_reminders(now=None, send=None, **options):
+    """
+    Reminds every customer with orders placed since the last run (within
+    the window). ``options`` override CRM_ORDER_REMINDERS settings.
+    Returns a summary of the run.
+    """
+    config = {**get_config(), **options}
+    now = now or timezone.now()
+    if send is None:
+        def send(chunk):
+            log_reminders(chunk, config["LOG_FILE"])
+
+    rows = pending_orders(now - timedelta(days=config["WINDOW_DAYS"]), load_checkpoint())
+    reminders = group_by_email(rows)
+    chunks = dispatch(reminders, send, config["CHUNK_SIZE"], config["MAX_WORKERS"])
+    if rows:
+        save_checkpoint(rows[-1][0])
+    return {"orders": len(rows), "customers": len(reminders), "chunks": chunks}
@@ -0,0 +1,134 @@
+"""
+The CRM report, computed from the orders in parallel pk ranges.
+
+``start`` records a CrmReport with the current lowest and highest order
+pk, so the report covers a fixed set of orders however long it runs. That
+pk span is split into ranges of ``RANGE_SIZE``; each range is
+totalled on its own (one Celery task per range, fanned out with a chord
+in crm.tasks) and saved as a CrmReportRange row. ``finish`` merges the
+range rows into the report once they are all there.
+
+The range rows are the checkpoint: ``pending_ranges`` skips ranges that
+already have one, so a run that crashed is resumed by the next one and
+re-running a range is harmless. A report still running ``STALE_AFTER``
+seconds after it started lost a range for good (its chord never reaches
+``finish``); the next run marks it failed and starts over. At most one
+report runs at a time: a partial unique index on the running status
+makes a concurrent ``start`` wait for the first and then resume its
+report.
+
+Configured with ``CRM_REPORT`` in settings:
+
+    CRM_REPORT = {
+        "RANGE_SIZE": 100_000,        # order pks per task
+        "STALE_AFTER": 24 * 60 * 60,  # seconds before a running report is given up
+    }
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import CrmReport, CrmReportRange, Customer, Order, OrderItem
+from .rollups import CENTS, MONEY, ZERO
+
+DEFAULTS = {
+    "RANGE_SIZE": 100_000,
+    "STALE_AFTER": 24 * 60 * 60,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_REPORT", {})}
+
+
+def start(range_size=None):
+    """Returns the unfinished report to resume, or a new one."""
+    config = get_config()
+    now = timezone.now()
+    with transaction.atomic():
+        report = CrmReport.objects.select_for_update().filter(status=CrmReport.RUNNING).first()
+        if report is not None:
+            if report.created_at > now - timedelta(seconds=config["STALE_AFTER"]):
+                return report
+            report.status = CrmReport.FAILED
+            report.finished_at = now
+            report.save(update_fields=["status", "finished_at"])
+        bounds = Order.objects.aggregate(first=Min("pk"), last=Max("pk"))
+        try:
+            with transaction.atomic():
+                return CrmReport.objects.create(
+                    range_size=range_size or config["RANGE_SIZE"],
+                    min_order_id=bounds["first"] or 1,
+                    max_order_id=bounds["last"] or 0,
+                )
+        except IntegrityError:
+            pass  # a concurrent start created one first
+    return CrmReport.objects.get(status=CrmReport.RUNNING)
+
+
+def ranges(report):
+    """``(first, last)`` order pk ranges of ``report``, inclusive."""
+    return [
+        (first, min(first + report.range_size - 1, report.max_order_id))
+        for first in range(report.min_order_id, report.max_order_id + 1, report.range_size)
+    ]
+
+
+def pending_ranges(report):
+    done = set(report.ranges.values_list("first_order_id", flat=True))
+    return [bounds for bounds in ranges(report) if bounds[0] not in done]
+
+
+def aggregate_range(report_id, first, last):
+    """
+    Totals the orders with pks ``first..last`` and saves them as the
+    range's row (unless a previous attempt already did).
+    """
+    orders = Order.objects.filter(pk__gte=first, pk__lte=last).aggregate(
+        orders=Count("pk"), revenue=Sum("total_amount", output_field=MONEY),
+    )
+    units = OrderItem.objects.filter(order__gte=first, order__lte=last).aggregate(
+        units=Sum("quantity"),
+    )["units"]
+    try:
+        with transaction.atomic():
+            CrmReportRange.objects.create(
+                report_id=report_id, first_order_id=first, last_order_id=last,
+                orders=orders["orders"], units=units or 0,
+                revenue=(orders["revenue"] or ZERO).quantize(CENTS),
+            )
+    except IntegrityError:
+        pass  # done by an earlier attempt
+
+
+def finish(report_id):
+    """
+    Merges the range rows into the report, if every range is done.
+    Returns the report.
+    """
+    with transaction.atomic():
+        report = CrmReport.objects.select_for_update().get(pk=report_id)
+        if report.status != CrmReport.RUNNING or pending_ranges(report):
+            return report
+        totals = report.ranges.aggregate(
+            orders=Sum("orders"), units=Sum("units"), revenue=Sum("revenue", output_field=MONEY),
+        )
+        report.orders = totals["orders"] or 0
+        report.units = totals["units"] or 0
+        report.revenue = (totals["revenue"] or ZERO).quantize(CENTS)
+        report.customers = Customer.objects.count()
+        report.status = CrmReport.DONE
+        report.finished_at = timezone.now()
+        report.save()
+    return report
+
+
+def run(range_size=None):
+    """The whole pipeline in this process, one range after the other."""
+    report = start(range_size)
+    for first, last in pending_ranges(report):
+        aggregate_range(report.pk, first, last)
+    return finish(report.pk)
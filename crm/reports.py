@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncWeek
+
+from .models import Customer, Order, OrderItem
+
+CENTS = Decimal("0.01")
+ZERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+GROUPINGS = {
+    "day": TruncDay("order_date"),
+    "week": TruncWeek("order_date"),
+    "customer": F("customer_id"),
+}
+
+
+def _revenue():
+    return Coalesce(Sum("total_amount"), ZERO)
+
+
+def crm_stats(date_from=None, date_to=None, group_by=None):
+    """
+    Customer / order / revenue totals computed by the database.
+
+    ``date_from``/``date_to`` bound ``Order.order_date`` (inclusive).
+    ``group_by`` is one of ``GROUPINGS`` and adds a per-group breakdown,
+    ordered by group key. Revenue is always an exact Decimal.
+    """
+    orders = Order.objects.all()
+    if date_from is not None:
+        orders = orders.filter(order_date__gte=date_from)
+    if date_to is not None:
+        orders = orders.filter(order_date__lte=date_to)
+
+    stats = orders.aggregate(
+        total_orders=Count("id"),
+        active_customers=Count("customer", distinct=True),
+        total_revenue=_revenue(),
+    )
+    stats["total_revenue"] = stats["total_revenue"].quantize(CENTS)
+    stats["total_customers"] = Customer.objects.count()
+    stats["groups"] = []
+
+    if group_by is not None:
+        rows = (
+            orders.annotate(group=GROUPINGS[group_by])
+            .values("group")
+            .annotate(orders=Count("id"), revenue=_revenue())
+            .order_by("group")
+        )
+        for row in rows:
+            group = row.pop("group")
+            row["revenue"] = row["revenue"].quantize(CENTS)
+            if group_by == "customer":
+                row["customer_id"] = group
+            else:
+                row["period"] = group.date()
+            stats["groups"].append(row)
+
+    return stats
+
+
+def product_sales(date_from=None, date_to=None, limit=None):
+    """
+    Orders, units sold and revenue per product, best sellers by revenue
+    first (ties by product id).
+
+    Revenue is ``quantity * unit_price`` of each OrderItem, i.e. the price
+    the product sold for, not its current price. Without a date range the
+    aggregate reads only crm_orderitem_sales_idx; ``date_from``/``date_to``
+    bound ``Order.order_date`` (inclusive) and join the orders.
+    """
+    items = OrderItem.objects.all()
+    if date_from is not None:
+        items = items.filter(order__order_date__gte=date_from)
+    if date_to is not None:
+        items = items.filter(order__order_date__lte=date_to)
+
+    line_total = ExpressionWrapper(
+        F("quantity") * F("unit_price"),
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+    rows = (
+        items.values("product_id")
+        .annotate(
+            orders=Count("id"),
+            units_sold=Sum("quantity"),
+            revenue=Coalesce(Sum(line_total), ZERO),
+        )
+        .order_by("-revenue", "product_id")
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    return [{**row, "revenue": row["revenue"].quantize(CENTS)} for row in rows]
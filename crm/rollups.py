@@ -0,0 +1,334 @@
+"""
+The DailySales rollup: order count, units and revenue per day, per
+customer-day and per product-day.
+
+Orders written through the API update the rollup in the same transaction
+(``record_orders``), so reports and the ``dailySales`` query read one row
+per day instead of every order; the customer cleanup takes deleted orders
+back out (``remove_orders``). Rows loaded behind the API's back (the
+data generator, imports, manual fixes) need a ``rebuild`` of their days;
+``check`` compares the rollup with the raw tables.
+
+Days are local dates of ``Order.order_date`` in the current time zone.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Sum
+from django.utils import timezone
+
+from . import cache
+from .models import DailySales, Order, OrderItem
+
+CHUNK_DAYS = 7
+
+ZERO = Decimal("0.00")
+CENTS = Decimal("0.01")
+
+# Wide enough for a day's (or all-time) revenue; the model field's own
+# precision would overflow when summing many rows.
+MONEY = DecimalField(max_digits=20, decimal_places=2)
+
+
+def _day(value):
+    return timezone.localdate(value)
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _sort_key(key):
+    day, customer_id, product_id = key
+    return day, customer_id or 0, product_id or 0
+
+
+def order_deltas(pairs):
+    """
+    ``{(day, customer_id, product_id): [orders, units, revenue]}`` added by
+    ``pairs`` of ``(order, items)``; ``None`` marks the other grains.
+    """
+    deltas = {}
+
+    def add(key, orders, units, revenue):
+        row = deltas.setdefault(key, [0, 0, ZERO])
+        row[0] += orders
+        row[1] += units
+        row[2] += revenue
+
+    for order, items in pairs:
+        day = _day(order.order_date)
+        units = sum(item.quantity for item in items)
+        add((day, None, None), 1, units, order.total_amount)
+        add((day, order.customer_id, None), 1, units, order.total_amount)
+        for item in items:
+            add((day, None, item.product_id), 1, item.quantity, item.line_total)
+    return deltas
+
+
+# Upsert per grain: the conflict target names the partial unique index of
+# that grain (see DailySales.Meta). PostgreSQL and SQLite >= 3.24 only.
+GRAINS = {
+    "day": ("day", "customer_id IS NULL AND product_id IS NULL"),
+    "customer": ("customer_id, day", "customer_id IS NOT NULL"),
+    "product": ("product_id, day", "product_id IS NOT NULL"),
+}
+INSERT = (
+    "INSERT INTO crm_dailysales (day, customer_id, product_id, orders, units, revenue) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+UPSERT = INSERT + (
+    " ON CONFLICT ({target}) WHERE {predicate} DO UPDATE SET "
+    "orders = crm_dailysales.orders + excluded.orders, "
+    "units = crm_dailysales.units + excluded.units, "
+    "revenue = crm_dailysales.revenue + excluded.revenue"
+)
+
+
+def _grain(key):
+    _, customer_id, product_id = key
+    if customer_id is not None:
+        return "customer"
+    if product_id is not None:
+        return "product"
+    return "day"
+
+
+def _increment(key, orders, units, revenue):
+    day, customer_id, product_id = key
+    return DailySales.objects.filter(
+        day=day, customer_id=customer_id, product_id=product_id
+    ).update(
+        orders=F("orders") + orders,
+        units=F("units") + units,
+        revenue=F("revenue") + revenue,
+    )
+
+
+def apply(deltas):
+    """
+    Adds ``deltas`` to the rollup. Rows are touched in a fixed order, so
+    concurrent writers can't deadlock on each other's rows.
+
+    On PostgreSQL and SQLite that is one ``INSERT ... ON CONFLICT DO
+    UPDATE`` statement per grain; elsewhere a conditional UPDATE per row,
+    with an INSERT for a row's first order.
+    """
+    keys = sorted(deltas, key=_sort_key)
+    if connection.vendor in ("postgresql", "sqlite"):
+        with connection.cursor() as cursor:
+            for grain, (target, predicate) in GRAINS.items():
+                rows = [(*key, *deltas[key]) for key in keys if _grain(key) == grain]
+                if rows:
+                    cursor.executemany(UPSERT.format(target=target, predicate=predicate), rows)
+        return
+
+    for key in keys:
+        orders, units, revenue = deltas[key]
+        if _increment(key, orders, units, revenue):
+            continue
+        day, customer_id, product_id = key
+        try:
+            with transaction.atomic():
+                DailySales.objects.create(
+                    day=day, customer_id=customer_id, product_id=product_id,
+                    orders=orders, units=units, revenue=revenue,
+                )
+        except IntegrityError:
+            # Another transaction created the row first.
+            _increment(key, orders, units, revenue)
+
+
+def record_orders(pairs):
+    """Adds newly created ``(order, items)`` pairs to the rollup."""
+    apply(order_deltas(pairs))
+
+
+# One rollup row per grain, through the grain's unique index.
+ROW_WHERE = {
+    "day": ("day = %s AND customer_id IS NULL AND product_id IS NULL", lambda key: (key[0],)),
+    "customer": ("customer_id = %s AND day = %s", lambda key: (key[1], key[0])),
+    "product": ("product_id = %s AND day = %s", lambda key: (key[2], key[0])),
+}
+SUBTRACT = (
+    "UPDATE crm_dailysales SET orders = orders - %s, units = units - %s, "
+    "revenue = revenue - %s WHERE {where}"
+)
+DELETE_EMPTY = "DELETE FROM crm_dailysales WHERE {where} AND orders = 0"
+
+
+def remove_orders(pairs):
+    """
+    Takes ``(order, items)`` pairs that are about to be deleted back out of
+    the rollup, in the same fixed row order as ``apply``. Rows left without
+    orders are deleted, as ``rebuild`` wouldn't write them.
+    """
+    deltas = order_deltas(pairs)
+    keys = sorted(deltas, key=_sort_key)
+    with connection.cursor() as cursor:
+        for grain, (where, params) in ROW_WHERE.items():
+            grain_keys = [key for key in keys if _grain(key) == grain]
+            if not grain_keys:
+                continue
+            cursor.executemany(
+                SUBTRACT.format(where=where),
+                [(*deltas[key], *params(key)) for key in grain_keys],
+            )
+            cursor.executemany(DELETE_EMPTY.format(where=where), [params(key) for key in grain_keys])
+
+
+def compute_day(day):
+    """
+    The rollup rows of ``day`` computed from the orders and order items, as
+    returned by ``order_deltas``. Grouping one day at a time keeps the
+    queries on the order_date index and needs no per-row date truncation.
+    """
+    window = {"gte": _start_of(day), "lt": _start_of(day + timedelta(days=1))}
+    orders = Order.objects.filter(**{f"order_date__{op}": value for op, value in window.items()})
+    items = OrderItem.objects.filter(
+        **{f"order__order_date__{op}": value for op, value in window.items()}
+    )
+    line_total = ExpressionWrapper(F("quantity") * F("unit_price"), output_field=MONEY)
+
+    rows = {}
+    # One row per order (a few thousand a day), summed per customer here;
+    # grouping by customer in SQL makes SQLite scan the customer index.
+    per_order = orders.annotate(units=Sum("items__quantity")).values_list(
+        "customer_id", "total_amount", "units"
+    )
+    for customer_id, total_amount, units in per_order:
+        row = rows.setdefault((day, customer_id, None), [0, 0, ZERO])
+        row[0] += 1
+        row[1] += units or 0
+        row[2] += total_amount
+    if rows:
+        # The day's total is the sum of its customers.
+        rows[(day, None, None)] = [sum(column) for column in zip(*rows.values())]
+    products = items.values("product_id").annotate(
+        n=Count("id"), units=Sum("quantity"), revenue=Sum(line_total, output_field=MONEY),
+    )
+    for row in products:
+        # SQLite multiplies in floating point; round back to cents.
+        revenue = row["revenue"].quantize(CENTS)
+        rows[(day, None, row["product_id"])] = [row["n"], row["units"], revenue]
+    return rows
+
+
+def compute(date_from, date_to):
+    """``compute_day`` of every day in ``date_from``..``date_to`` (inclusive)."""
+    rows = {}
+    day = date_from
+    while day <= date_to:
+        rows.update(compute_day(day))
+        day += timedelta(days=1)
+    return rows
+
+
+def stored(date_from, date_to):
+    """The rollup rows currently stored for ``date_from``..``date_to``."""
+    rows = DailySales.objects.filter(day__gte=date_from, day__lte=date_to).values_list(
+        "day", "customer_id", "product_id", "orders", "units", "revenue",
+    )
+    return {tuple(row[:3]): list(row[3:]) for row in rows}
+
+
+def order_date_range():
+    """First and last day with orders, or ``(None, None)``."""
+    bounds = Order.objects.aggregate(first=Min("order_date"), last=Max("order_date"))
+    if bounds["first"] is None:
+        return None, None
+    return _day(bounds["first"]), _day(bounds["last"])
+
+
+def day_chunks(date_from, date_to, chunk_days=CHUNK_DAYS):
+    while date_from <= date_to:
+        end = min(date_from + timedelta(days=chunk_days - 1), date_to)
+        yield date_from, end
+        date_from = end + timedelta(days=1)
+
+
+def _bounds(date_from, date_to, include_rollup=False):
+    """Fills unset bounds with the first/last order day (and rollup day)."""
+    if date_from is not None and date_to is not None:
+        return date_from, date_to
+    days = [day for day in order_date_range() if day is not None]
+    if include_rollup:
+        bounds = DailySales.objects.aggregate(first=Min("day"), last=Max("day"))
+        days += [day for day in bounds.values() if day is not None]
+    if not days:
+        return date_from, date_to
+    return (
+        min(days) if date_from is None else date_from,
+        max(days) if date_to is None else date_to,
+    )
+
+
+def rebuild(date_from=None, date_to=None, chunk_days=CHUNK_DAYS, progress=None):
+    """
+    Recomputes the rollup of ``date_from``..``date_to`` (default: every
+    day with orders or rollup rows), ``chunk_days`` days per transaction.
+    Returns the number of rows written. ``progress(date_from, date_to,
+    rows)`` is called after each chunk.
+    """
+    date_from, date_to = _bounds(date_from, date_to, include_rollup=True)
+    if date_from is None or date_to is None:
+        return 0
+    written = deleted = 0
+    for start, end in day_chunks(date_from, date_to, chunk_days):
+        rows = [(*key, *values) for key, values in compute(start, end).items()]
+        with transaction.atomic(), connection.cursor() as cursor:
+            deleted += DailySales.objects.filter(day__gte=start, day__lte=end).delete()[0]
+            # Plain executemany: ~100k rows a week, no model instances needed.
+            cursor.executemany(INSERT, rows)
+        written += len(rows)
+        if progress is not None:
+            progress(start, end, len(rows))
+    if written or deleted:
+        # Raw SQL sends no signals: drop cached dailySales / crmStats answers.
+        cache.invalidate()
+    return written
+
+
+def check(date_from=None, date_to=None, chunk_days=CHUNK_DAYS):
+    """
+    Compares the rollup with the raw tables. Returns a list of
+    ``(key, expected, stored)`` for every differing row, where a missing
+    row is None. By default every day with orders or rollup rows is checked.
+    """
+    date_from, date_to = _bounds(date_from, date_to, include_rollup=True)
+    if date_from is None or date_to is None:
+        return []
+    mismatches = []
+    for start, end in day_chunks(date_from, date_to, chunk_days):
+        expected, actual = compute(start, end), stored(start, end)
+        for key in sorted(expected.keys() | actual.keys(), key=_sort_key):
+            if expected.get(key) != actual.get(key):
+                mismatches.append((key, expected.get(key), actual.get(key)))
+    return mismatches
+
+
+def series(date_from=None, date_to=None, customer_id=None, product_id=None):
+    """
+    Daily ``{day, orders, units, revenue}`` of the whole shop, one customer
+    or one product, by day. Days without orders are omitted.
+    """
+    if customer_id is not None and product_id is not None:
+        raise ValueError("Pick a customer or a product, not both.")
+    rows = DailySales.objects.filter(customer_id=customer_id, product_id=product_id)
+    if date_from is not None:
+        rows = rows.filter(day__gte=date_from)
+    if date_to is not None:
+        rows = rows.filter(day__lte=date_to)
+    return list(rows.order_by("day").values("day", "orders", "units", "revenue"))
+
+
+def totals():
+    """All-time orders and revenue, summed over the day rows."""
+    totals = DailySales.objects.filter(customer__isnull=True, product__isnull=True).aggregate(
+        orders=Sum("orders"), revenue=Sum("revenue", output_field=MONEY),
+    )
+    return {
+        "orders": totals["orders"] or 0,
+        "revenue": (totals["revenue"] or ZERO).quantize(CENTS),
+    }
@@ -1,18 +1,35 @@
-import re
 from decimal import Decimal
+from functools import partial
 
 import graphene
+from asgiref.sync import sync_to_async
 from graphene import relay
 from django.db import transaction
 from django.utils import timezone
 from graphene_django import DjangoObjectType
 from graphene_django.filter import DjangoFilterConnectionField
+from graphql import GraphQLError
 
-from .models import Customer, Product, Order
+from .models import Customer, Product, Order, OrderItem
 from .filters import CustomerFilter, ProductFilter, OrderFilter
+from .pagination import KeysetConnectionField, ListFilterConnectionField
+from .aio import evaluate, running_async
+from .loaders import get_loaders, prefetched
+from .optimizer import optimize
+from .reports import crm_stats, product_sales
+from . import rollups
+from .search import search
+from .bulk import (
+    bulk_create_customers, bulk_create_orders, order_items, order_lines, order_total,
+)
+from .idempotency import idempotent
+from .inventory import OutOfStock, reserve_stock, restock_low_stock
+from .validators import validate_phone
 
 from crm.models import Product
 
+MAX_SEARCH_RESULTS = 100
+MAX_PRODUCT_SALES = 100
 
 
 # =====================
@@ -20,11 +37,23 @@ from crm.models import Product
 # =====================
 
 class CustomerType(DjangoObjectType):
+    orders = ListFilterConnectionField(lambda: OrderType)
+
     class Meta:
         model = Customer
         interfaces = (relay.Node,)
         filterset_class = CustomerFilter
-        fields = ("id", "name", "email", "phone", "created_at")
+        fields = ("id", "name", "email", "phone", "created_at", "orders")
+
+    @classmethod
+    def prime_loaders(cls, info, customers):
+        return get_loaders(info).track_customers(customers)
+
+    def resolve_orders(self, info, **kwargs):
+        orders = prefetched(self, "orders")
+        if orders is None:
+            orders = get_loaders(info).customer_orders.load(self.pk)
+        return orders
 
 
 class ProductType(DjangoObjectType):
@@ -35,14 +64,91 @@ class ProductType(DjangoObjectType):
         fields = ("id", "name", "price", "stock")
 
 
+class OrderItemType(DjangoObjectType):
+    line_total = graphene.Decimal()
+
+    class Meta:
+        model = OrderItem
+        fields = ("product", "quantity", "unit_price")
+
+
 class OrderType(DjangoObjectType):
+    products = ListFilterConnectionField(ProductType)
+    items = graphene.List(graphene.NonNull(OrderItemType))
+
     class Meta:
         model = Order
         interfaces = (relay.Node,)
         filterset_class = OrderFilter
-        fields = ("id", "customer", "products", "total_amount", "order_date")
+        fields = ("id", "customer", "products", "items", "total_amount", "order_date")
+
+    @classmethod
+    def prime_loaders(cls, info, orders):
+        return get_loaders(info).track_orders(orders)
+
+    def resolve_customer(self, info):
+        if Order.customer.is_cached(self):
+            return self.customer
+        return get_loaders(info).customer.load(self.customer_id)
+
+    def resolve_products(self, info, **kwargs):
+        products = prefetched(self, "products")
+        if products is None:
+            products = get_loaders(info).order_products.load(self.pk)
+        return products
+
+    def resolve_items(self, info):
+        items = prefetched(self, "items")
+        if items is None:
+            items = get_loaders(info).order_items.load(self.pk)
+        return items
 
 
+class SearchResult(graphene.Union):
+    class Meta:
+        types = (CustomerType, ProductType)
+
+
+class SearchHitType(graphene.ObjectType):
+    score = graphene.Float()
+    node = graphene.Field(SearchResult)
+
+
+class CrmStatsGroupBy(graphene.Enum):
+    DAY = "day"
+    WEEK = "week"
+    CUSTOMER = "customer"
+
+
+class CrmStatsGroupType(graphene.ObjectType):
+    # period is set for DAY/WEEK grouping, customer_id for CUSTOMER grouping
+    period = graphene.Date()
+    customer_id = graphene.ID()
+    orders = graphene.Int()
+    revenue = graphene.Decimal()
+
+
+class ProductSalesType(graphene.ObjectType):
+    product = graphene.Field(ProductType)
+    orders = graphene.Int()
+    units_sold = graphene.Int()
+    revenue = graphene.Decimal()
+
+
+class DailySalesType(graphene.ObjectType):
+    day = graphene.Date()
+    orders = graphene.Int()
+    units = graphene.Int()
+    revenue = graphene.Decimal()
+
+
+class CrmStatsType(graphene.ObjectType):
+    total_customers = graphene.Int()
+    active_customers = graphene.Int()
+    total_orders = graphene.Int()
+    total_revenue = graphene.Decimal()
+    groups = graphene.List(CrmStatsGroupType)
+
 
 # =====================
 # Input Types
@@ -60,26 +166,20 @@ class ProductInput(graphene.InputObjectType):
     stock = graphene.Int(required=False)
 
 
+class OrderItemInput(graphene.InputObjectType):
+    product_id = graphene.ID(required=True)
+    quantity = graphene.Int(default_value=1)
+
+
 class OrderInput(graphene.InputObjectType):
     # Graphene will expose these as customerId and productIds in GraphQL
     customer_id = graphene.ID(required=True)
-    product_ids = graphene.List(graphene.ID, required=True)
+    # One unit of each product; use items for quantities.
+    product_ids = graphene.List(graphene.ID)
+    items = graphene.List(graphene.NonNull(OrderItemInput))
     order_date = graphene.DateTime(required=False)
 
 
-# =====================
-# Helper validation
-# =====================
-
-PHONE_REGEX = re.compile(r"^(\+?\d{7,15}|\d{3}-\d{3}-\d{4})$")
-
-
-def validate_phone(phone: str) -> bool:
-    if not phone:
-        return True
-    return bool(PHONE_REGEX.match(phone))
-
-
 # =====================
 # Mutations
 # =====================
@@ -87,12 +187,14 @@ def validate_phone(phone: str) -> bool:
 class CreateCustomer(graphene.Mutation):
     class Arguments:
         input = CustomerInput(required=True)
+        idempotency_key = graphene.String()
 
     customer = graphene.Field(CustomerType)
     message = graphene.String()
     errors = graphene.List(graphene.String)
 
     @staticmethod
+    @idempotent
     def mutate(root, info, input: CustomerInput):
         errors = []
 
@@ -116,13 +218,6 @@ class CreateCustomer(graphene.Mutation):
                 errors=errors,
             )
 
-        customer = Customer(
-            name=name,
-            email=email,
-            phone=phone,
-        )
-        customer.save()
-
         customer = Customer.objects.create(name=name, email=email, phone=phone)
         return CreateCustomer(
             customer=customer,
@@ -134,39 +229,23 @@ class CreateCustomer(graphene.Mutation):
 class BulkCreateCustomers(graphene.Mutation):
     class Arguments:
         input = graphene.List(CustomerInput, required=True)
+        idempotency_key = graphene.String()
 
     customers = graphene.List(CustomerType)
     errors = graphene.List(graphene.String)
 
     @staticmethod
-    @transaction.atomic
+    @idempotent
     def mutate(root, info, input):
-        created_customers = []
-        errors = []
-
-        for index, cust_input in enumerate(input):
-            row_prefix = f"Row {index + 1}: "
-
-            name = (cust_input.name or "").strip()
-            email = (cust_input.email or "").strip().lower()
-            phone = cust_input.phone.strip() if cust_input.phone else None
-
-            row_errors = []
-            if not name:
-                row_errors.append("Name is required.")
-            if not email:
-                row_errors.append("Email is required.")
-            elif Customer.objects.filter(email=email).exists():
-                row_errors.append("Email already exists.")
-            if phone and not validate_phone(phone):
-                row_errors.append("Invalid phone format.")
-
-            if row_errors:
-                errors.append(row_prefix + "; ".join(row_errors))
-                continue
+        # Validation, duplicate detection and inserts are done set-wise;
+        # see crm.bulk.bulk_create_customers.
+        created_customers, errors = bulk_create_customers(input)
 
-            customer = Customer.objects.create(name=name, email=email, phone=phone)
-            created_customers.append(customer)
+        # New customers have no orders yet; answer `orders` without a query.
+        loaders = get_loaders(info)
+        for customer in created_customers:
+            loaders.customer.prime(customer.pk, customer)
+            loaders.customer_orders.prime(customer.pk, [])
 
         # Partial success: we return what we could create plus errors
         return BulkCreateCustomers(customers=created_customers, errors=errors)
@@ -175,11 +254,13 @@ class BulkCreateCustomers(graphene.Mutation):
 class CreateProduct(graphene.Mutation):
     class Arguments:
         input = ProductInput(required=True)
+        idempotency_key = graphene.String()
 
     product = graphene.Field(ProductType)
     errors = graphene.List(graphene.String)
 
     @staticmethod
+    @idempotent
     def mutate(root, info, input: ProductInput):
         errors = []
 
@@ -208,17 +289,19 @@ class CreateProduct(graphene.Mutation):
 class CreateOrder(graphene.Mutation):
     class Arguments:
         input = OrderInput(required=True)
+        idempotency_key = graphene.String()
 
     order = graphene.Field(OrderType)
     errors = graphene.List(graphene.String)
 
     @staticmethod
+    @idempotent
     @transaction.atomic
     def mutate(root, info, input: OrderInput):
         errors = []
 
         customer_id = input.customer_id
-        product_ids = input.product_ids or []
+        lines = order_lines(input)
         order_date = input.order_date or timezone.now()
 
         # Validate customer
@@ -229,53 +312,116 @@ class CreateOrder(graphene.Mutation):
             return CreateOrder(order=None, errors=errors)
 
         # Validate products
-        if not product_ids:
+        if not lines:
             errors.append("At least one product must be selected.")
             return CreateOrder(order=None, errors=errors)
 
-        products = list(Product.objects.filter(pk__in=product_ids))
-        if len(products) != len(set(product_ids)):
+        products = Product.objects.in_bulk([pk for pk in lines if pk is not None])
+        if len(products) != len(lines):
             errors.append("One or more product IDs are invalid.")
             return CreateOrder(order=None, errors=errors)
+        if min(lines.values()) < 1:
+            errors.append("Quantity must be a positive value.")
+            return CreateOrder(order=None, errors=errors)
 
-        # Calculate total_amount
-        total_amount = sum((p.price for p in products), Decimal("0.00"))
-
-        # Create order and associate products
-        order = Order.objects.create(
-            customer=customer,
-            total_amount=total_amount,
-            order_date=order_date,
-        )
-        order.products.set(products)
+        # Take the stock first: a conditional decrement per product, undone
+        # by the savepoint if any of them falls short.
+        try:
+            with transaction.atomic():
+                remaining = reserve_stock(lines)
+        except OutOfStock as e:
+            names = ", ".join(products[pk].name for pk in e.products)
+            errors.append(f"Insufficient stock for: {names}.")
+            return CreateOrder(order=None, errors=errors)
+        for pk, quantity in lines.items():
+            product = products[pk]
+            product.stock = remaining[pk] if remaining is not None else product.stock - quantity
+
+        # Price the items at the current product prices and total them
+        order = Order(customer=customer, order_date=order_date)
+        items = order_items(order, lines, products)
+        order.total_amount = order_total(items)
+        order.save()
+        OrderItem.objects.bulk_create(items)
+        # Last: the day's rollup row is the most contended lock.
+        rollups.record_orders([(order, items)])
+
+        # Everything the payload can ask for is already in memory.
+        loaders = get_loaders(info)
+        loaders.customer.prime(customer.pk, customer)
+        loaders.order_products.prime(order.pk, [item.product for item in items])
+        loaders.order_items.prime(order.pk, items)
 
         return CreateOrder(order=order, errors=[])
 
 
+class BulkCreateOrders(graphene.Mutation):
+    class Arguments:
+        input = graphene.List(OrderInput, required=True)
+        idempotency_key = graphene.String()
+
+    orders = graphene.List(OrderType)
+    errors = graphene.List(graphene.String)
+
+    @staticmethod
+    @idempotent
+    def mutate(root, info, input):
+        # Customers/products are resolved with one IN query each and orders
+        # plus product links are inserted with bulk_create; see crm.bulk.
+        created, errors = bulk_create_orders(input)
+
+        loaders = get_loaders(info)
+        for order, products in created:
+            loaders.customer.prime(order.customer_id, order.customer)
+            loaders.order_products.prime(order.pk, products)
+
+        # Partial success: we return what we could create plus errors
+        return BulkCreateOrders(orders=[order for order, _ in created], errors=errors)
+
+
 class UpdateLowStockProducts(graphene.Mutation):
     """
-    Finds products with stock < 10, increments stock by 10 (restock simulation),
-    and returns updated products + a message.
+    Finds products with stock < threshold (default 10), increments their
+    stock by increment (default 10) in a single UPDATE (restock simulation),
+    and returns the number of updated products, the updated products
+    (capped by sampleSize; 0 returns only the count) + a message.
     """
 
+    class Arguments:
+        threshold = graphene.Int(default_value=10)
+        increment = graphene.Int(default_value=10)
+        sample_size = graphene.Int()
+        idempotency_key = graphene.String()
+
     updated_products = graphene.List(ProductType)
+    updated_count = graphene.Int()
     message = graphene.String()
     success = graphene.Boolean()
 
     @staticmethod
-    @transaction.atomic
-    def mutate(root, info):
-        low_stock_products = Product.objects.filter(stock__lt=10)
+    @idempotent
+    def mutate(root, info, threshold=10, increment=10, sample_size=None):
+        if increment <= 0:
+            return UpdateLowStockProducts(
+                updated_products=[],
+                updated_count=0,
+                message="Increment must be a positive value.",
+                success=False,
+            )
+        if sample_size is not None and sample_size < 0:
+            return UpdateLowStockProducts(
+                updated_products=[],
+                updated_count=0,
+                message="Sample size cannot be negative.",
+                success=False,
+            )
 
-        updated = []
-        for product in low_stock_products:
-            product.stock += 10
-            product.save(update_fields=["stock"])
-            updated.append(product)
+        count, updated = restock_low_stock(threshold, increment, sample_size)
 
         return UpdateLowStockProducts(
             updated_products=updated,
-            message=f"Updated {len(updated)} low-stock products.",
+            updated_count=count,
+            message=f"Updated {count} low-stock products.",
             success=True,
         )
 
@@ -292,17 +438,127 @@ class Query(graphene.ObjectType):
     all_products = graphene.List(ProductType)
     all_orders = graphene.List(OrderType)
 
+    # Relay connections with filter arguments and keyset (seek) cursors.
+    # Prefer these over the all* lists for anything that can grow.
+    customers = KeysetConnectionField(CustomerType, key=("created_at", "id"))
+    products = KeysetConnectionField(ProductType, key=("created_at", "id"))
+    orders = KeysetConnectionField(OrderType, key=("order_date", "id"))
+
+    # Aggregates computed in the database (no rows are shipped).
+    crm_stats = graphene.Field(
+        CrmStatsType,
+        order_date_gte=graphene.DateTime(),
+        order_date_lte=graphene.DateTime(),
+        group_by=CrmStatsGroupBy(),
+    )
+
+    # Units and revenue per product from the order item price snapshots,
+    # best sellers first.
+    product_sales = graphene.List(
+        ProductSalesType,
+        order_date_gte=graphene.DateTime(),
+        order_date_lte=graphene.DateTime(),
+        first=graphene.Int(default_value=20),
+    )
+
+    # Daily time series from the DailySales rollup (see crm.rollups): the
+    # whole shop, or one customer or one product.
+    daily_sales = graphene.List(
+        DailySalesType,
+        date_from=graphene.Date(),
+        date_to=graphene.Date(),
+        customer_id=graphene.ID(),
+        product_id=graphene.ID(),
+    )
+
+    # Ranked substring search over customers and products (see crm.search).
+    search = graphene.List(
+        SearchHitType,
+        text=graphene.String(required=True),
+        first=graphene.Int(default_value=20),
+    )
+
+    # Resolvers return awaitables under the async view (see crm.aio).
+
     @staticmethod
     def resolve_all_customers(root, info):
-        return Customer.objects.all()
+        customers = optimize(Customer.objects.all(), info)
+        return evaluate(customers, partial(CustomerType.prime_loaders, info))
 
     @staticmethod
     def resolve_all_products(root, info):
-        return Product.objects.all()
+        return evaluate(optimize(Product.objects.all(), info))
 
     @staticmethod
     def resolve_all_orders(root, info):
-        return Order.objects.select_related("customer").prefetch_related("products")
+        # Only the selected columns are read; customer/products are joined
+        # or prefetched when selected and otherwise never touched.
+        orders = optimize(Order.objects.all(), info)
+        return evaluate(orders, partial(OrderType.prime_loaders, info))
+
+    @staticmethod
+    def resolve_customers(root, info, **kwargs):
+        return optimize(Customer.objects.all(), info, extra_fields=("created_at",))
+
+    @staticmethod
+    def resolve_products(root, info, **kwargs):
+        return optimize(Product.objects.all(), info, extra_fields=("created_at",))
+
+    @staticmethod
+    def resolve_orders(root, info, **kwargs):
+        return optimize(Order.objects.all(), info, extra_fields=("order_date",))
+
+    @staticmethod
+    def resolve_crm_stats(root, info, order_date_gte=None, order_date_lte=None, group_by=None):
+        stats = sync_to_async(crm_stats) if running_async() else crm_stats
+        return stats(
+            date_from=order_date_gte,
+            date_to=order_date_lte,
+            group_by=group_by.value if group_by is not None else None,
+        )
+
+    @staticmethod
+    def resolve_product_sales(root, info, order_date_gte=None, order_date_lte=None, first=20):
+        if not 0 < first <= MAX_PRODUCT_SALES:
+            raise GraphQLError(f"first must be between 1 and {MAX_PRODUCT_SALES}.")
+
+        def rows():
+            sales = product_sales(date_from=order_date_gte, date_to=order_date_lte, limit=first)
+            products = Product.objects.in_bulk([row["product_id"] for row in sales])
+            return [
+                ProductSalesType(product=products.get(row.pop("product_id")), **row)
+                for row in sales
+            ]
+
+        return sync_to_async(rows)() if running_async() else rows()
+
+    @staticmethod
+    def resolve_daily_sales(root, info, date_from=None, date_to=None,
+                            customer_id=None, product_id=None):
+        if customer_id is not None and product_id is not None:
+            raise GraphQLError("Pass customerId or productId, not both.")
+        if date_from is not None and date_to is not None and date_from > date_to:
+            raise GraphQLError("dateFrom must not be after dateTo.")
+
+        def rows():
+            return [DailySalesType(**row) for row in rollups.series(
+                date_from, date_to, customer_id=customer_id, product_id=product_id,
+            )]
+
+        return sync_to_async(rows)() if running_async() else rows()
+
+    @staticmethod
+    def resolve_search(root, info, text, first=20):
+        text = text.strip()
+        if not text:
+            return []
+        if not 0 < first <= MAX_SEARCH_RESULTS:
+            raise GraphQLError(f"first must be between 1 and {MAX_SEARCH_RESULTS}.")
+
+        def hits():
+            return [SearchHitType(score=score, node=node) for score, node in search(text, first)]
+
+        return sync_to_async(hits)() if running_async() else hits()
 
 
 # =====================
@@ -314,4 +570,5 @@ class Mutation(graphene.ObjectType):
     bulk_create_customers = BulkCreateCustomers.Field()
     create_product = CreateProduct.Field()
     create_order = CreateOrder.Field()
+    bulk_create_orders = BulkCreateOrders.Field()
     update_low_stock_products = UpdateLowStockProducts.Field()
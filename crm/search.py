@@ -0,0 +1,168 @@
+"""
+Substring and ranked search over customers and products.
+
+The ``icontains`` filters (customer name/email, product name and the
+order filters on them) and the ``search`` query go through the backend of
+the default database:
+
+- PostgreSQL: ``icontains`` is left to the ORM. It compiles to
+  ``UPPER(col::text) LIKE UPPER(%s)``, which the pg_trgm GIN indexes from
+  migration 0002 serve. Ranking combines ``ts_rank`` over a ``tsvector``
+  (GIN index from migration 0003) with trigram ``similarity``.
+- SQLite: substring matches are answered by FTS5 tables with the trigram
+  tokenizer (migration 0003), kept in sync with the base tables by
+  triggers. Ranking uses ``bm25``. The trigram index needs at least
+  three characters, so shorter values fall back to ``LIKE``.
+- Anything else, or SQLite built without FTS5: plain ``icontains``.
+"""
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Customer, Product
+
+# Searchable text columns per model; the first is the display name.
+SEARCH_FIELDS = {
+    Customer: ("name", "email"),
+    Product: ("name",),
+}
+
+# FTS5 trigram tables mirroring SEARCH_FIELDS (see migration 0003).
+FTS_TABLES = {
+    Customer: "crm_customer_fts",
+    Product: "crm_product_fts",
+}
+
+MIN_TRIGRAM_LENGTH = 3
+
+
+def _fts_phrase(value):
+    """FTS5 string literal; with the trigram tokenizer a phrase is a substring."""
+    return '"{}"'.format(value.replace('"', '""'))
+
+
+class LikeBackend:
+    """Plain ``LIKE`` scans; correct everywhere, fast nowhere."""
+
+    name = "like"
+
+    def contains(self, queryset, path, value):
+        return queryset.filter(**{f"{path}__icontains": value})
+
+    def rank(self, model, text, limit):
+        """Returns up to ``limit`` ``(pk, score)`` pairs, best first."""
+        fields = SEARCH_FIELDS[model]
+        matches = Q()
+        for field in fields:
+            matches |= Q(**{f"{field}__icontains": text})
+        # Exact and prefix matches on the display name first.
+        score = Case(
+            When(**{f"{fields[0]}__iexact": text}, then=Value(3)),
+            When(**{f"{fields[0]}__istartswith": text}, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+        rows = (
+            model.objects.filter(matches)
+            .annotate(score=score)
+            .order_by("-score", "pk")
+            .values_list("pk", "score")[:limit]
+        )
+        return [(pk, float(score)) for pk, score in rows]
+
+
+class SqliteFtsBackend(LikeBackend):
+    name = "sqlite-fts5"
+
+    def contains(self, queryset, path, value):
+        prefix, _, field = path.rpartition("__")
+        model = queryset.model
+        for part in filter(None, prefix.split("__")):
+            model = model._meta.get_field(part).related_model
+        if (model not in FTS_TABLES or field not in SEARCH_FIELDS[model]
+                or len(value) < MIN_TRIGRAM_LENGTH):
+            return super().contains(queryset, path, value)
+
+        table = FTS_TABLES[model]
+        ids = RawSQL(
+            f"SELECT rowid FROM {table} WHERE {table} MATCH %s",
+            (f"{field} : {_fts_phrase(value)}",),
+        )
+        lookup = f"{prefix}__pk__in" if prefix else "pk__in"
+        return queryset.filter(**{lookup: ids})
+
+    def rank(self, model, text, limit):
+        if len(text) < MIN_TRIGRAM_LENGTH:
+            return super().rank(model, text, limit)
+        table = FTS_TABLES[model]
+        with connection.cursor() as cursor:
+            # bm25() is lower for better matches.
+            cursor.execute(
+                f"SELECT rowid, -bm25({table}) AS score FROM {table} "
+                f"WHERE {table} MATCH %s ORDER BY score DESC, rowid LIMIT %s",
+                (_fts_phrase(text), limit),
+            )
+            return cursor.fetchall()
+
+
+class PostgresBackend(LikeBackend):
+    name = "postgresql"
+
+    def rank(self, model, text, limit):
+        fields = SEARCH_FIELDS[model]
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        # Must match the expression of the GIN index in migration 0003.
+        document = "to_tsvector('simple', {})".format(" || ' ' || ".join(qn(f) for f in fields))
+        like = " OR ".join(f"UPPER({qn(f)}::text) LIKE UPPER(%s)" for f in fields)
+        pattern = f"%{connection.ops.prep_for_like_query(text)}%"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, ts_rank({document}, query) + similarity({qn(fields[0])}, %s) AS score "
+                f"FROM {table}, plainto_tsquery('simple', %s) query "
+                f"WHERE {document} @@ query OR {like} "
+                f"ORDER BY score DESC, id LIMIT %s",
+                (text, text, *[pattern] * len(fields), limit),
+            )
+            return cursor.fetchall()
+
+
+_fts_available = {}
+
+
+def _has_fts_tables():
+    # Keyed on the database name: the test runner swaps it under us.
+    key = connection.settings_dict["NAME"]
+    if key not in _fts_available:
+        tables = set(connection.introspection.table_names())
+        _fts_available[key] = all(table in tables for table in FTS_TABLES.values())
+    return _fts_available[key]
+
+
+def get_backend():
+    if connection.vendor == "postgresql":
+        return PostgresBackend()
+    if connection.vendor == "sqlite" and _has_fts_tables():
+        return SqliteFtsBackend()
+    return LikeBackend()
+
+
+def contains(queryset, path, value):
+    """``queryset.filter(<path>__icontains=value)``, through the search backend."""
+    return get_backend().contains(queryset, path, value)
+
+
+def search(text, limit=20, models=(Customer, Product)):
+    """
+    Ranked search over ``models``. Returns up to ``limit`` ``(score,
+    instance)`` pairs, best first. Scores come from the same backend, so
+    they are roughly comparable across models.
+    """
+    backend = get_backend()
+    hits = []
+    for model in models:
+        ranked = backend.rank(model, text, limit)
+        instances = model.objects.in_bulk([pk for pk, _ in ranked])
+        hits += [(score, instances[pk]) for pk, score in ranked if pk in instances]
+    hits.sort(key=lambda hit: -hit[0])
+    return hits[:limit]
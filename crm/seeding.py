@@ -0,0 +1,275 @@
+"""
+Bulk generation of synthetic CRM data.
+
+The generated values depend only on the DataSpec (including its ``seed``),
+never on the clock, on rows already in the database or on the number of
+worker processes: every chunk draws from its own RNG seeded with
+``(seed, kind, chunk index)``. Rows are written with chunked
+``bulk_create`` calls, one transaction per chunk, so memory stays flat
+and millions of orders can be generated.
+
+The data is skewed like real traffic:
+
+- product popularity follows a Zipf distribution (``product_skew``), so a
+  few products appear in most orders;
+- some customers order much more often than others (``customer_skew``);
+- order dates follow a weekly and daily rhythm plus a few multi-day bursts
+  (sales, campaigns) where volume jumps several times over.
+"""
+import multiprocessing
+import random
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import connection, connections, transaction
+
+from . import cache, rollups
+from .models import Customer, Order, OrderItem, Product
+
+BATCH_SIZE = 5000
+
+# Fixed origin for generated dates, so data sets are reproducible.
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# Relative order volume per weekday (Monday first) and per hour (UTC).
+WEEKDAY_WEIGHTS = (1.0, 0.95, 0.95, 1.0, 1.15, 1.4, 1.2)
+HOUR_WEIGHTS = (
+    0.2, 0.1, 0.1, 0.1, 0.1, 0.2, 0.4, 0.7, 1.0, 1.1, 1.2, 1.3,
+    1.4, 1.3, 1.2, 1.2, 1.3, 1.5, 1.8, 2.0, 2.0, 1.6, 1.0, 0.5,
+)
+HOUR_CUM_WEIGHTS = list(accumulate(HOUR_WEIGHTS))
+
+# Relative frequency of line quantities 1, 2, 3, ...
+QUANTITY_CUM_WEIGHTS = list(accumulate((0.8, 0.12, 0.05, 0.03)))
+
+_item = OrderItem._meta
+ITEM_INSERT = "INSERT INTO {} ({}) VALUES (%s, %s, %s, %s)".format(
+    connection.ops.quote_name(_item.db_table),
+    ", ".join(
+        connection.ops.quote_name(_item.get_field(name).column)
+        for name in ("order", "product", "quantity", "unit_price")
+    ),
+)
+
+
+class DataSpec:
+    """What to generate. Picklable, so it can be handed to worker processes."""
+
+    def __init__(self, customers=1000, products=100, orders=10_000, seed=0,
+                 max_products_per_order=5, days=365, start=EPOCH, bursts=6,
+                 product_skew=1.1, customer_skew=0.6, batch_size=BATCH_SIZE, tag="seed"):
+        self.customers = customers
+        self.products = products
+        self.orders = orders
+        self.seed = seed
+        self.max_products_per_order = max_products_per_order
+        self.days = days
+        self.start = start
+        self.bursts = bursts
+        self.product_skew = product_skew
+        self.customer_skew = customer_skew
+        self.batch_size = batch_size
+        # Namespaces the generated (unique) customer emails.
+        self.tag = tag
+
+    def rng(self, *scope):
+        return random.Random(":".join(str(part) for part in (self.seed, *scope)))
+
+    def chunks(self, count):
+        for index, start in enumerate(range(0, count, self.batch_size)):
+            yield index, range(start, min(start + self.batch_size, count))
+
+
+def zipf_cum_weights(n, s):
+    """Cumulative weights of ranks 1..n with P(rank) proportional to 1 / rank**s."""
+    return list(accumulate(1 / rank ** s for rank in range(1, n + 1)))
+
+
+def day_cum_weights(spec):
+    """Cumulative weights of the days in the date range, bursts included."""
+    rng = spec.rng("days")
+    weights = [
+        WEEKDAY_WEIGHTS[(spec.start + timedelta(days=day)).weekday()]
+        for day in range(spec.days)
+    ]
+    for _ in range(spec.bursts):
+        first = rng.randrange(spec.days)
+        boost = rng.uniform(3, 8)
+        for day in range(first, min(first + rng.randint(1, 4), spec.days)):
+            weights[day] *= boost
+    return list(accumulate(weights))
+
+
+def _pick(rng, cum_weights):
+    """Index drawn according to ``cum_weights`` (like random.choices, for one)."""
+    return bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+class OrderWriter:
+    """Generates and writes chunks of orders; one instance per process."""
+
+    def __init__(self, spec, customer_ids, prices):
+        self.spec = spec
+        self.prices = prices
+        # Popularity ranks are assigned in a seeded random order, so the
+        # most popular product isn't simply the first one created.
+        self.customer_ids = list(customer_ids)
+        spec.rng("customer-ranks").shuffle(self.customer_ids)
+        self.product_ids = list(prices)
+        spec.rng("product-ranks").shuffle(self.product_ids)
+
+        self.customer_weights = zipf_cum_weights(len(self.customer_ids), spec.customer_skew)
+        self.product_weights = zipf_cum_weights(len(self.product_ids), spec.product_skew)
+        self.day_weights = day_cum_weights(spec)
+        sizes = range(1, min(spec.max_products_per_order, len(self.product_ids)) + 1)
+        self.size_cum_weights = list(accumulate(1 / size for size in sizes))
+
+    def order_lines(self, rng):
+        """``[(product id, quantity), ...]`` of one order."""
+        size = _pick(rng, self.size_cum_weights) + 1
+        line = set()
+        for _ in range(size * 4):
+            line.add(self.product_ids[_pick(rng, self.product_weights)])
+            if len(line) == size:
+                break
+        return [(pk, _pick(rng, QUANTITY_CUM_WEIGHTS) + 1) for pk in sorted(line)]
+
+    def order_date(self, rng):
+        day = _pick(rng, self.day_weights)
+        hour = _pick(rng, HOUR_CUM_WEIGHTS)
+        return self.spec.start + timedelta(
+            days=day, hours=hour, seconds=rng.randrange(3600)
+        )
+
+    @transaction.atomic
+    def write(self, index, chunk):
+        rng = self.spec.rng("orders", index)
+        lines = [self.order_lines(rng) for _ in chunk]
+        created = Order.objects.bulk_create(
+            Order(
+                customer_id=self.customer_ids[_pick(rng, self.customer_weights)],
+                total_amount=sum(
+                    (self.prices[pk] * quantity for pk, quantity in line), Decimal("0.00")
+                ),
+                order_date=self.order_date(rng),
+            )
+            for line in lines
+        )
+        # Order items have no defaults or signals to honour; a plain
+        # executemany skips building a model instance per row.
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                ITEM_INSERT,
+                [
+                    (order.pk, pk, quantity, self.prices[pk])
+                    for order, line in zip(created, lines)
+                    for pk, quantity in line
+                ],
+            )
+        return len(created)
+
+
+@transaction.atomic
+def create_customers(spec, index, chunk):
+    rng = spec.rng("customers", index)
+    return [c.pk for c in Customer.objects.bulk_create(
+        Customer(
+            name=f"Customer {i}",
+            email=f"{spec.tag}-{spec.seed}-{i}@example.com",
+            phone=f"+1555{i:07d}" if rng.random() < 0.7 else None,
+        )
+        for i in chunk
+    )]
+
+
+@transaction.atomic
+def create_products(spec, index, chunk):
+    rng = spec.rng("products", index)
+    return {p.pk: p.price for p in Product.objects.bulk_create(
+        Product(
+            name=f"Product {i}",
+            # Mostly cheap items with a long tail of expensive ones.
+            price=Decimal(min(max(int(rng.lognormvariate(7.5, 1.0)), 1), 99_999_999)) / 100,
+            stock=rng.randint(0, 200),
+        )
+        for i in chunk
+    )}
+
+
+_worker = None
+
+
+def _init_worker(spec, customer_ids, prices):
+    global _worker
+    _worker = OrderWriter(spec, customer_ids, prices)
+
+
+def _write_orders(index, chunk):
+    return _worker.write(index, chunk)
+
+
+def generate(spec, workers=1, progress=None):
+    """
+    Writes the data described by ``spec`` and returns
+    ``{"customers": [ids], "products": [ids], "orders": count}``.
+
+    With ``workers > 1`` order chunks are written by that many forked
+    processes, each with its own database connection; the rows are the
+    same, only their ids may interleave differently. ``progress(kind,
+    done, total)`` is called after each chunk.
+    """
+    progress = progress or (lambda kind, done, total: None)
+
+    customer_ids = []
+    for index, chunk in spec.chunks(spec.customers):
+        customer_ids += create_customers(spec, index, chunk)
+        progress("customers", len(customer_ids), spec.customers)
+
+    prices = {}
+    for index, chunk in spec.chunks(spec.products):
+        prices.update(create_products(spec, index, chunk))
+        progress("products", len(prices), spec.products)
+
+    written = 0
+    if spec.orders and customer_ids and prices:
+        if workers > 1:
+            # Children must open their own connections, not share ours.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(spec, customer_ids, prices),
+            ) as pool:
+                futures = [
+                    pool.submit(_write_orders, index, chunk)
+                    for index, chunk in spec.chunks(spec.orders)
+                ]
+                for future in futures:
+                    written += future.result()
+                    progress("orders", written, spec.orders)
+        else:
+            writer = OrderWriter(spec, customer_ids, prices)
+            for index, chunk in spec.chunks(spec.orders):
+                written += writer.write(index, chunk)
+                progress("orders", written, spec.orders)
+
+    if written:
+        # The orders bypassed the API, so rebuild the rollup of their days
+        # (a day of margin either side for the local time zone).
+        rollups.rebuild(
+            (spec.start - timedelta(days=1)).date(),
+            (spec.start + timedelta(days=spec.days + 1)).date(),
+        )
+    cache.invalidate()
+    return {"customers": customer_ids, "products": list(prices), "orders": written}
+
+
+def seed_crm(customers, products, orders, seed=0, tag="seed", **options):
+    """Shortcut for ``generate(DataSpec(...))`` in the calling process."""
+    spec = DataSpec(customers=customers, products=products, orders=orders,
+                    seed=seed, tag=tag, **options)
+    return generate(spec)
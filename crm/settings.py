@@ -25,7 +25,6 @@ INSTALLED_APPS = [
 # django-crontab configuration (required by checker)
 CRONJOBS = [
     ("*/5 * * * *", "crm.cron.log_crm_heartbeat"),
-    ("0 */12 * * *", "crm.cron.update_low_stock"),
 ]
 
 
@@ -50,4 +49,25 @@ CELERY_BEAT_SCHEDULE = {
         "task": "crm.tasks.generate_crm_report",
         "schedule": crontab(day_of_week="mon", hour=6, minute=0),
     },
+    # Replaces the crm.cron.update_low_stock crontab entry.
+    "restock-products": {
+        "task": "crm.tasks.restock_products",
+        "schedule": crontab(minute=0, hour="*/12"),
+    },
+    # Replaces the send_order_reminders.py crontab entry; that script is
+    # only for setups without beat, never both (reminders would go twice).
+    "send-order-reminders": {
+        "task": "crm.tasks.send_order_reminders",
+        "schedule": crontab(minute=0, hour=8),
+    },
+    # The only schedule for the cleanup (the old crontab script is gone);
+    # run "manage.py clean_inactive_customers" for one-off runs.
+    "clean-inactive-customers": {
+        "task": "crm.tasks.clean_inactive_customers",
+        "schedule": crontab(day_of_week="sun", hour=2, minute=0),
+    },
+    "purge-idempotency-keys": {
+        "task": "crm.tasks.purge_idempotency_keys",
+        "schedule": crontab(minute=15),
+    },
 }
@@ -0,0 +1,18 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache
+from .models import Customer, Order, OrderItem, Product
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=OrderItem)
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_response_cache(sender, **kwargs):
+    cache.invalidate()
@@ -1,49 +1,81 @@
-from datetime import datetime
+from celery import chord, shared_task
 
-import requests
-from celery import shared_task
+from . import cleanup, idempotency, inventory, reminders, report_pipeline
 
 
 @shared_task
-def generate_crm_report():
-    """
-    Weekly CRM report:
-    - total customers
-    - total orders
-    - total revenue (sum of totalAmount from orders)
-    Logs to: /tmp/crm_report_log.txt
-    Format: YYYY-MM-DD HH:MM:SS - Report: X customers, Y orders, Z revenue
-    """
-    url = "http://localhost:8000/graphql"
-    query = """
-    query {
-      allCustomers { id }
-      allOrders { id totalAmount }
-    }
+def generate_crm_report(range_size=None):
+    """
+    Weekly CRM report: total customers, orders, units and revenue, stored
+    as a CrmReport row (see crm.report_pipeline).
+
+    The orders are split into pk ranges totalled in parallel by
+    aggregate_report_range tasks; a chord runs finish_crm_report once all
+    of them are done. An unfinished report is resumed, with only the
+    ranges that have no saved totals yet. Returns the report id.
     """
+    report = report_pipeline.start(range_size)
+    pending = report_pipeline.pending_ranges(report)
+    if not pending:
+        finish_crm_report.delay(report.pk)
+        return report.pk
+    chord(
+        aggregate_report_range.si(report.pk, first, last) for first, last in pending
+    )(finish_crm_report.si(report.pk))
+    return report.pk
 
-    try:
-        resp = requests.post(url, json={"query": query}, timeout=20)
-        resp.raise_for_status()
-        data = (resp.json() or {}).get("data") or {}
 
-        customers = data.get("allCustomers") or []
-        orders = data.get("allOrders") or []
+@shared_task
+def aggregate_report_range(report_id, first, last):
+    report_pipeline.aggregate_range(report_id, first, last)
+
 
-        customers_count = len(customers)
-        orders_count = len(orders)
+@shared_task
+def finish_crm_report(report_id):
+    report = report_pipeline.finish(report_id)
+    return {
+        "id": report.pk,
+        "status": report.status,
+        "customers": report.customers,
+        "orders": report.orders,
+        "units": report.units,
+        "revenue": str(report.revenue) if report.revenue is not None else None,
+    }
 
-        revenue = 0.0
-        for o in orders:
-            val = o.get("totalAmount") or 0
-            revenue += float(val)
 
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        line = f"{ts} - Report: {customers_count} customers, {orders_count} orders, {revenue} revenue\n"
+@shared_task
+def purge_idempotency_keys():
+    """
+    Hourly: deletes expired mutation idempotency keys in batches (see
+    crm.idempotency). Returns the number of keys deleted.
+    """
+    return idempotency.purge_expired()
 
-    except Exception as e:
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        line = f"{ts} - Report: ERROR generating report ({e})\n"
 
-    with open("/tmp/crm_report_log.txt", "a", encoding="utf-8") as f:
-        f.write(line)
+@shared_task
+def restock_products():
+    """
+    Twice a day: restocks products below their velocity-based reorder
+    threshold, in-process (see crm.inventory.restock_by_velocity), and logs
+    one JSON record per run to /tmp/low_stock_updates_log.txt. Returns the
+    record.
+    """
+    return inventory.restock_by_velocity()
+
+
+@shared_task
+def send_order_reminders():
+    """
+    Daily: one reminder per customer for the orders placed since the last
+    run (see crm.reminders). Returns a summary of the run.
+    """
+    return reminders.send_order_reminders()
+
+
+@shared_task
+def clean_inactive_customers():
+    """
+    Weekly: deletes customers without an order in the last year, in short
+    throttled batches (see crm.cleanup). Returns the run's summary.
+    """
+    return cleanup.clean_inactive_customers(SLEEP=0.05)
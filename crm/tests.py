@@ -1,3 +1,1221 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.db.models import Count
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from graphql_relay import from_global_id
+
+from alx_backend_graphql.schema import schema
+from . import (
+    cache, cleanup, idempotency, inventory, persisted_queries, reminders, report_pipeline,
+    rollups, tasks, tracing,
+)
+from .aio import alist
+from .filters import CustomerFilter
+from .inventory import OutOfStock, reserve_stock, supports_update_returning
+from .loaders import Loaders
+from .models import (
+    CrmReport, Customer, DailySales, IdempotencyKey, Order, OrderItem, Product,
+)
+from .reports import crm_stats, product_sales
+from .seeding import seed_crm
+
+
+def add_items(order, products, quantity=1):
+    """Adds ``products`` to ``order`` at their current prices."""
+    return OrderItem.objects.bulk_create(
+        OrderItem(order=order, product=product, quantity=quantity, unit_price=product.price)
+        for product in products
+    )
+
+
+class OrdersConnectionTests(TestCase):
+    QUERY = """
+    query ($first: Int, $last: Int, $after: String, $before: String) {
+      orders(first: $first, last: $last, after: $after, before: $before) {
+        edges { node { id } }
+        pageInfo { startCursor endCursor hasNextPage hasPreviousPage }
+      }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        now = timezone.now()
+        # Two orders share each timestamp so the id tie-breaker is exercised.
+        cls.orders = Order.objects.bulk_create(
+            Order(customer=customer, total_amount=Decimal("1.00"),
+                  order_date=now + timedelta(minutes=i // 2))
+            for i in range(7)
+        )
+        cls.expected = [
+            str(o.pk) for o in Order.objects.order_by("order_date", "id")
+        ]
+
+    def _pk(self, global_id):
+        return from_global_id(global_id)[1]
+
+    def test_forward_paging_visits_every_row_once(self):
+        seen, after = [], None
+        while True:
+            result = schema.execute(self.QUERY, variables={"first": 3, "after": after})
+            self.assertIsNone(result.errors)
+            conn = result.data["orders"]
+            seen += [self._pk(e["node"]["id"]) for e in conn["edges"]]
+            if not conn["pageInfo"]["hasNextPage"]:
+                break
+            after = conn["pageInfo"]["endCursor"]
+        self.assertEqual(seen, self.expected)
+
+    def test_backward_paging_with_last_and_before(self):
+        result = schema.execute(self.QUERY, variables={"last": 3})
+        conn = result.data["orders"]
+        self.assertEqual([self._pk(e["node"]["id"]) for e in conn["edges"]], self.expected[-3:])
+        self.assertTrue(conn["pageInfo"]["hasPreviousPage"])
+
+        result = schema.execute(
+            self.QUERY, variables={"last": 3, "before": conn["pageInfo"]["startCursor"]}
+        )
+        conn = result.data["orders"]
+        self.assertEqual([self._pk(e["node"]["id"]) for e in conn["edges"]], self.expected[-6:-3])
+
+    def test_invalid_cursor_is_reported(self):
+        result = schema.execute(self.QUERY, variables={"first": 1, "after": "garbage"})
+        self.assertIn("Invalid cursor", str(result.errors[0]))
+
+
+class OrderBatchingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create(
+            Product(name=f"P{i}", price=Decimal("2.50"), stock=5) for i in range(3)
+        )
+        for c in range(4):
+            customer = Customer.objects.create(name=f"C{c}", email=f"c{c}@example.com")
+            for _ in range(3):
+                order = Order.objects.create(customer=customer, total_amount=Decimal("5.00"))
+                add_items(order, products[:2])
+
+    def _post(self, query):
+        response = self.client.post("/graphql", {"query": query}, content_type="application/json")
+        body = response.json()
+        self.assertNotIn("errors", body)
+        return body["data"]
+
+    def test_all_orders_with_relations_is_constant(self):
+        # orders joined to customers + prefetched products
+        with self.assertNumQueries(2):
+            data = self._post(
+                "{ allOrders { id customer { name } products { edges { node { name } } } } }"
+            )
+        self.assertEqual(len(data["allOrders"]), 12)
+        self.assertEqual(len(data["allOrders"][0]["products"]["edges"]), 2)
+
+    def test_orders_connection_with_relations_is_constant(self):
+        with self.assertNumQueries(2):
+            self._post(
+                "{ orders(first: 10) { edges { node { customer { email } "
+                "products { edges { node { id } } } } } } }"
+            )
+
+    # Three unpaged list levels are over the default cost budget.
+    @override_settings(GRAPHQL_QUERY_COST={"ENABLED": False})
+    def test_nested_customer_orders_is_constant(self):
+        # customers + their orders + order/product links
+        with self.assertNumQueries(3):
+            data = self._post(
+                "{ allCustomers { orders { edges { node { totalAmount "
+                "customer { name } products { edges { node { name } } } } } } } }"
+            )
+        self.assertEqual(len(data["allCustomers"][0]["orders"]["edges"]), 3)
+
+    def test_loaders_batch_unjoined_orders(self):
+        orders = list(Order.objects.all())
+        loaders = Loaders()
+        loaders.track_orders(orders)
+        # customers + order/product links, however many orders there are
+        with self.assertNumQueries(2):
+            for order in orders:
+                self.assertEqual(loaders.customer.load(order.customer_id).pk, order.customer_id)
+                self.assertEqual(len(loaders.order_products.load(order.pk)), 2)
+
+    def test_report_selection_reads_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._post("{ allOrders { id totalAmount } }")
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertNotIn("crm_customer", sql)
+        self.assertNotIn("order_date", sql)
+
+
+class CrmStatsTests(TestCase):
+    def test_totals_and_grouping_are_exact(self):
+        alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        Customer.objects.create(name="Carol", email="carol@example.com")
+        for customer, amount in [(alice, "0.10"), (alice, "0.20"), (bob, "19.99")]:
+            Order.objects.create(customer=customer, total_amount=Decimal(amount))
+
+        stats = crm_stats(group_by="customer")
+
+        self.assertEqual(stats["total_customers"], 3)
+        self.assertEqual(stats["active_customers"], 2)
+        self.assertEqual(stats["total_orders"], 3)
+        self.assertEqual(stats["total_revenue"], Decimal("20.29"))
+        self.assertEqual(
+            [(g["customer_id"], g["orders"], g["revenue"]) for g in stats["groups"]],
+            [(alice.pk, 2, Decimal("0.30")), (bob.pk, 1, Decimal("19.99"))],
+        )
+
+
+class BulkCreateCustomersTests(TestCase):
+    MUTATION = """
+    mutation ($input: [CustomerInput]!) {
+      bulkCreateCustomers(input: $input) { customers { email } errors }
+    }
+    """
+
+    def test_rows_are_validated_and_deduplicated_set_wise(self):
+        Customer.objects.create(name="Existing", email="taken@example.com")
+        rows = [
+            {"name": "A", "email": "a@example.com"},
+            {"name": "Taken", "email": "TAKEN@example.com"},
+            {"name": "A again", "email": "a@example.com"},
+            {"name": "", "email": "b@example.com", "phone": "nope"},
+            {"name": "B", "email": "b@example.com", "phone": "+1234567890"},
+        ]
+        # one email__in lookup + one INSERT (plus the savepoint pair)
+        with self.assertNumQueries(4):
+            result = schema.execute(self.MUTATION, variables={"input": rows})
+
+        self.assertIsNone(result.errors)
+        payload = result.data["bulkCreateCustomers"]
+        self.assertEqual(
+            [c["email"] for c in payload["customers"]], ["a@example.com", "b@example.com"]
+        )
+        self.assertEqual(payload["errors"], [
+            "Row 2: Email already exists.",
+            "Row 3: Duplicate email in batch (row 1).",
+            "Row 4: Name is required.; Invalid phone format.",
+        ])
+
+
+class BulkCreateOrdersTests(TestCase):
+    MUTATION = """
+    mutation ($input: [OrderInput]!) {
+      bulkCreateOrders(input: $input) {
+        orders { totalAmount customer { email } products { edges { node { name } } } }
+        errors
+      }
+    }
+    """
+
+    def test_orders_are_priced_and_linked_in_bulk(self):
+        alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        laptop = Product.objects.create(name="Laptop", price=Decimal("999.99"), stock=5)
+        mouse = Product.objects.create(name="Mouse", price=Decimal("19.99"), stock=5)
+        rows = [
+            {"customerId": alice.pk, "productIds": [laptop.pk, mouse.pk]},
+            {"customerId": alice.pk, "productIds": [mouse.pk, mouse.pk]},
+            {"customerId": 999, "productIds": [mouse.pk]},
+            {"customerId": alice.pk, "productIds": [mouse.pk, 999]},
+            {"customerId": alice.pk, "productIds": []},
+        ]
+        # customers IN + products IN + orders INSERT + links INSERT
+        # + one rollup upsert per grain (+ savepoints)
+        # + per order a savepoint around one stock UPDATE per product
+        with self.assertNumQueries(16):
+            result = schema.execute(
+                self.MUTATION, variables={"input": rows}, context_value=SimpleNamespace()
+            )
+
+        self.assertIsNone(result.errors)
+        payload = result.data["bulkCreateOrders"]
+        self.assertEqual([o["totalAmount"] for o in payload["orders"]], ["1019.98", "19.99"])
+        self.assertEqual(payload["orders"][0]["customer"]["email"], "alice@example.com")
+        self.assertEqual(payload["errors"], [
+            "Row 3: Invalid customer ID.",
+            "Row 4: One or more product IDs are invalid.",
+            "Row 5: At least one product must be selected.",
+        ])
+        self.assertEqual(OrderItem.objects.count(), 3)
+        laptop.refresh_from_db()
+        mouse.refresh_from_db()
+        self.assertEqual((laptop.stock, mouse.stock), (4, 3))
+
+
+class UpdateLowStockProductsTests(TestCase):
+    MUTATION = """
+    mutation ($sample: Int) {
+      updateLowStockProducts(threshold: 5, increment: 3, sampleSize: $sample) {
+        success updatedCount updatedProducts { name stock }
+      }
+    }
+    """
+
+    def setUp(self):
+        Product.objects.bulk_create(
+            Product(name=f"P{stock}", price=Decimal("1.00"), stock=stock)
+            for stock in (0, 2, 4, 5, 9)
+        )
+
+    def test_restock_is_one_update(self):
+        with self.assertNumQueries(3 if supports_update_returning() else 5):
+            result = schema.execute(self.MUTATION, variables={"sample": 2})
+        payload = result.data["updateLowStockProducts"]
+        self.assertEqual(payload["updatedCount"], 3)
+        self.assertEqual(payload["updatedProducts"], [
+            {"name": "P0", "stock": 3}, {"name": "P2", "stock": 5},
+        ])
+        self.assertEqual(
+            list(Product.objects.order_by("pk").values_list("stock", flat=True)),
+            [3, 5, 7, 5, 9],
+        )
+
+    def test_returned_products_are_converted(self):
+        result = schema.execute("""
+        mutation {
+          updateLowStockProducts(threshold: 5, increment: 3) {
+            updatedProducts { name price stock }
+          }
+        }
+        """)
+        self.assertIsNone(result.errors)
+        products = result.data["updateLowStockProducts"]["updatedProducts"]
+        self.assertEqual([(p["name"], p["price"], p["stock"]) for p in products],
+                         [("P0", "1.00", 3), ("P2", "1.00", 5), ("P4", "1.00", 7)])
+
+    def test_count_only(self):
+        result = schema.execute(self.MUTATION, variables={"sample": 0})
+        payload = result.data["updateLowStockProducts"]
+        self.assertEqual((payload["updatedCount"], payload["updatedProducts"]), (3, []))
+
+
+LOCAL_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "graphql": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "graphql-responses"},
+}
+
+
+# The test run is one process, so a local-memory cache is safe here.
+@override_settings(
+    CACHES=LOCAL_CACHES,
+    GRAPHQL_RESPONSE_CACHE={"ENABLED": True, "CACHE": "graphql", "SINGLE_PROCESS": True},
+)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches["graphql"].clear()
+        Product.objects.create(name="Laptop", price=Decimal("999.99"), stock=3)
+
+    def _post(self, query, **variables):
+        response = self.client.post(
+            "/graphql", {"query": query, "variables": variables}, content_type="application/json"
+        )
+        return response.json()
+
+    def test_queries_are_cached_until_a_model_changes(self):
+        query = "{ allProducts { name stock } }"
+        self._post(query)
+        with self.assertNumQueries(0):
+            # whitespace differences normalize to the same entry
+            body = self._post("{allProducts {name   stock}}")
+        self.assertEqual(body["data"]["allProducts"], [{"name": "Laptop", "stock": 3}])
+
+        Product.objects.create(name="Mouse", price=Decimal("19.99"), stock=1)
+        body = self._post(query)
+        self.assertEqual(len(body["data"]["allProducts"]), 2)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_mutations_are_never_cached(self):
+        mutation = "mutation { updateLowStockProducts(sampleSize: 0) { updatedCount } }"
+        self.assertEqual(self._post(mutation)["data"]["updateLowStockProducts"]["updatedCount"], 1)
+        self.assertEqual(self._post(mutation)["data"]["updateLowStockProducts"]["updatedCount"], 0)
+
+    def test_rollup_rebuild_invalidates(self):
+        query = "{ dailySales { orders } }"
+        self.assertEqual(self._post(query)["data"]["dailySales"], [])
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        # Loaded behind the API's back: no signals, no rollup rows.
+        Order.objects.bulk_create([Order(customer=customer, total_amount=Decimal("1.00"))])
+        self.assertEqual(self._post(query)["data"]["dailySales"], [])
+        rollups.rebuild()
+        self.assertEqual(self._post(query)["data"]["dailySales"], [{"orders": 1}])
+
+    def test_local_memory_cache_needs_single_process(self):
+        with override_settings(GRAPHQL_RESPONSE_CACHE={"ENABLED": True, "CACHE": "graphql"}):
+            self.assertFalse(cache.is_enabled())
+            self.assertEqual([w.id for w in cache.check_shared_cache(None)], ["crm.W001"])
+            self._post("{ allProducts { name } }")
+            with self.assertNumQueries(1):
+                self._post("{ allProducts { name } }")
+        self.assertTrue(cache.is_enabled())
+        self.assertEqual(cache.check_shared_cache(None), [])
+
+
+class PersistedQueryTests(TestCase):
+    QUERY = "{ hello }"
+
+    def setUp(self):
+        persisted_queries.documents.clear()
+
+    def _post(self, **body):
+        return self.client.post("/graphql", body, content_type="application/json").json()
+
+    def test_apq_round_trip(self):
+        extensions = {
+            "persistedQuery": {"version": 1, "sha256Hash": persisted_queries.query_hash(self.QUERY)}
+        }
+        body = self._post(extensions=extensions)
+        self.assertEqual(body["errors"][0]["message"], "PersistedQueryNotFound")
+
+        body = self._post(query=self.QUERY, extensions=extensions)
+        self.assertEqual(body["data"], {"hello": "Hello, GraphQL!"})
+
+        with mock.patch("crm.persisted_queries.parse") as parse:
+            body = self._post(extensions=extensions)
+        parse.assert_not_called()
+        self.assertEqual(body["data"], {"hello": "Hello, GraphQL!"})
+
+    def test_hash_mismatch_is_rejected(self):
+        body = self._post(
+            query=self.QUERY,
+            extensions={"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}},
+        )
+        self.assertEqual(body["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_HASH_MISMATCH")
+
+    def test_invalid_documents_are_not_cached(self):
+        self._post(query="{ nope }")
+        self.assertEqual(len(persisted_queries.documents), 0)
+
+
+# No random trace sampling: only one of the two responses would carry it.
+@override_settings(GRAPHQL_TRACING={"ENABLED": True, "SAMPLE_RATE": 0})
+class AsyncViewTests(TestCase):
+    QUERY = """
+    {
+      allOrders { totalAmount customer { name } products { edges { node { name } } } }
+      orders(first: 2) { edges { node { customer { email } } } pageInfo { hasNextPage } }
+      allCustomers { name orders(totalAmount_Gte: 5) { edges { node { totalAmount } } } }
+      crmStats { totalOrders totalRevenue }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        mouse = Product.objects.create(name="Mouse", price=Decimal("19.99"), stock=5)
+        for c in range(2):
+            customer = Customer.objects.create(name=f"C{c}", email=f"c{c}@example.com")
+            for amount in ("4.00", "19.99"):
+                order = Order.objects.create(customer=customer, total_amount=Decimal(amount))
+                add_items(order, [mouse])
+
+    async def test_async_view_matches_sync_view(self):
+        body = {"query": self.QUERY}
+        sync_response = await sync_to_async(self.client.post)(
+            "/graphql", body, content_type="application/json"
+        )
+        async_response = await self.async_client.post(
+            "/graphql/async", body, content_type="application/json"
+        )
+        self.assertEqual(async_response.status_code, 200)
+        self.assertNotIn("errors", async_response.json())
+        self.assertEqual(async_response.json(), sync_response.json())
+
+    async def test_mutations_run_in_a_worker_thread(self):
+        response = await self.async_client.post(
+            "/graphql/async",
+            {"query": 'mutation { createProduct(input: {name: "Pad", price: 2.5}) { product { name } } }'},
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["data"]["createProduct"]["product"], {"name": "Pad"})
+
+    async def test_async_loaders_batch_within_a_tick(self):
+        orders = await alist(Order.objects.all())
+        loaders = Loaders(use_async=True)
+        loaders.track_orders(orders)
+        batch_calls = []
+        batch = loaders.order_products.batch_load_fn
+        loaders.order_products.batch_load_fn = lambda keys: batch_calls.append(keys) or batch(keys)
+
+        products = await asyncio.gather(*(loaders.order_products.load(o.pk) for o in orders))
+
+        self.assertEqual(len(batch_calls), 1)
+        self.assertEqual([len(p) for p in products], [1, 1, 1, 1])
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        cls.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        cls.pen = Product.objects.create(name="Pen", price=Decimal("1.50"), stock=5)
+        cls.ink = Product.objects.create(name="Ink", price=Decimal("2.00"), stock=5)
+        cls.order = Order.objects.create(customer=cls.alice, total_amount=Decimal("3.50"))
+        add_items(cls.order, [cls.pen, cls.ink])
+        Order.objects.create(customer=cls.bob, total_amount=Decimal("0.00"))
+
+    def lines(self, response):
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_ndjson_orders_include_products(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/export/orders")
+            lines = [json.loads(line) for line in self.lines(response)]
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([row["id"] for row in lines], [self.order.pk, self.order.pk + 1])
+        self.assertEqual(lines[0]["total_amount"], "3.50")
+        self.assertEqual([p["name"] for p in lines[0]["products"]], ["Pen", "Ink"])
+        self.assertEqual(lines[1]["products"], [])
+
+    def test_csv_honors_filters(self):
+        response = self.client.get("/export/orders", {"format": "csv", "product_name": "e"})
+        lines = self.lines(response)
+        self.assertEqual(lines[0], "id,customer_id,total_amount,order_date,products")
+        # The m2m join matches the order twice; it must be exported once.
+        self.assertEqual(len(lines), 2)
+        row = next(csv.reader(lines[1:]))
+        self.assertEqual(json.loads(row[-1]), [
+            {"id": self.pen.pk, "name": "Pen", "quantity": 1, "price": "1.50"},
+            {"id": self.ink.pk, "name": "Ink", "quantity": 1, "price": "2.00"},
+        ])
+
+        Product.objects.filter(pk=self.pen.pk).update(name='Pen; "red":fine')
+        response = self.client.get("/export/orders", {"format": "csv"})
+        row = next(csv.reader(self.lines(response)[1:]))
+        self.assertEqual(json.loads(row[-1])[0]["name"], 'Pen; "red":fine')
+
+        response = self.client.get("/export/customers", {"format": "csv", "name__icontains": "bo"})
+        self.assertEqual(len(self.lines(response)), 2)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get("/export/nope").status_code, 404)
+        self.assertEqual(self.client.get("/export/orders", {"format": "xml"}).status_code, 400)
+        response = self.client.get("/export/products", {"price__gte": "cheap"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("price__gte", response.json()["errors"])
+
+
+class QueryCostTests(TestCase):
+    QUERY = """
+    query ($first: Int) {
+      orders(first: $first) { edges { node { ...Line } } pageInfo { hasNextPage } }
+    }
+    fragment Line on OrderType { totalAmount customer { name } products(first: 5) { edges { node { name } } } }
+    """
+
+    def post(self, query, variables=None):
+        return self.client.post(
+            "/graphql", {"query": query, "variables": variables or {}},
+            content_type="application/json",
+        )
+
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post(self.QUERY, {"first": 20})
+        self.assertEqual(response.status_code, 200)
+        # 20 orders * (order 1 + customer 1 + 5 products * 1)
+        self.assertEqual(
+            response.json()["extensions"]["cost"],
+            {"requested": 140, "maximum": 25000, "depth": 3, "maxDepth": 10},
+        )
+
+    @override_settings(GRAPHQL_QUERY_COST={"MAX_COST": 100})
+    def test_queries_over_budget_are_rejected(self):
+        response = self.post(self.QUERY, {"first": 20})
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertNotIn("data", body)
+        self.assertEqual(body["errors"][0]["extensions"]["code"], "QUERY_TOO_COMPLEX")
+
+        # The same document fits the budget with a smaller page.
+        self.assertEqual(self.post(self.QUERY, {"first": 10}).status_code, 200)
+
+    @override_settings(GRAPHQL_QUERY_COST={"MAX_DEPTH": 3})
+    def test_queries_over_max_depth_are_rejected(self):
+        query = "{ allCustomers { orders(first: 1) { edges { node { customer { name } } } } } }"
+        body = self.post(query).json()
+        self.assertEqual(body["errors"][0]["extensions"]["code"], "QUERY_TOO_DEEP")
+        self.assertEqual(body["extensions"]["cost"]["depth"], 4)
+
+    @override_settings(GRAPHQL_QUERY_COST={"WEIGHTS": {"Query.crmStats": 50}})
+    def test_field_weights(self):
+        body = self.post("{ crmStats { totalOrders } __typename }").json()
+        self.assertEqual(body["extensions"]["cost"]["requested"], 50)
+
+
+@override_settings(GRAPHQL_TRACING={"ENABLED": True, "SAMPLE_RATE": 0,
+                                    "FORCE_HEADER": "X-GraphQL-Trace", "FORCE_TOKEN": "s3cret"})
+class TracingTests(TestCase):
+    QUERY = "{ allOrders { id customer { name } } }"
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        for _ in range(3):
+            Order.objects.create(customer=customer, total_amount=Decimal("1.00"))
+
+    def setUp(self):
+        tracing.metrics.reset()
+
+    def post(self, **headers):
+        return self.client.post(
+            "/graphql", {"query": self.QUERY}, content_type="application/json", headers=headers
+        ).json()
+
+    def test_unsampled_requests_are_not_traced(self):
+        body = self.post()
+        self.assertNotIn("tracing", body.get("extensions", {}))
+        self.assertEqual(tracing.metrics.requests, 0)
+
+    def test_force_header_needs_the_token(self):
+        body = self.post(**{"X-GraphQL-Trace": "1"})
+        self.assertNotIn("tracing", body.get("extensions", {}))
+        with override_settings(GRAPHQL_TRACING={"ENABLED": True, "SAMPLE_RATE": 0}):
+            body = self.post(**{"X-GraphQL-Trace": "s3cret"})
+        self.assertNotIn("tracing", body.get("extensions", {}))
+
+    def test_trace_aggregates_resolvers_by_path(self):
+        trace = self.post(**{"X-GraphQL-Trace": "s3cret"})["extensions"]["tracing"]
+        self.assertEqual(trace["sqlQueries"], 1)
+        resolvers = {".".join(r["path"]): r for r in trace["execution"]["resolvers"]}
+        self.assertEqual(resolvers["allOrders"]["sqlQueries"], 1)
+        self.assertEqual(resolvers["allOrders.customer.name"]["calls"], 3)
+        self.assertEqual(resolvers["allOrders.customer"]["parentType"], "OrderType")
+
+    @override_settings(GRAPHQL_TRACING={"ENABLED": True, "SAMPLE_RATE": 1, "EXTENSIONS": False})
+    def test_metrics_are_exported_for_prometheus(self):
+        body = self.post()
+        self.assertNotIn("tracing", body.get("extensions", {}))
+
+        text = self.client.get("/graphql/metrics").content.decode()
+        self.assertIn("graphql_traced_requests_total 1", text)
+        self.assertIn('graphql_resolver_calls_total{field="OrderType.customer"} 3', text)
+        self.assertIn('graphql_resolver_sql_queries_total{field="Query.allOrders"} 1', text)
+        self.assertIn('graphql_resolver_duration_seconds_count{field="Query.allOrders"} 1', text)
+        self.assertIn('graphql_resolver_duration_seconds_bucket{field="Query.allOrders",le="+Inf"} 1', text)
+
+
+class BenchGraphQLCommandTests(TestCase):
+    def test_report_is_json_and_data_is_rolled_back(self):
+        out = StringIO()
+        call_command(
+            "bench_graphql", orders=40, customers=5, products=10,
+            requests=30, warmup=2, stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["data"]["orders"], 40)
+        self.assertEqual(report["overall"]["count"], 30)
+        self.assertEqual(sum(op["count"] for op in report["operations"].values()), 30)
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "sql_queries_per_request"):
+            self.assertIn(key, report["overall"])
+        self.assertFalse(Order.objects.exists())
+
+    def test_seeding_is_deterministic(self):
+        first = seed_crm(3, 5, 20, seed=7, tag="a")
+        totals = list(Order.objects.order_by("pk").values_list("total_amount", "order_date"))
+        Order.objects.all().delete()
+        seed_crm(3, 5, 20, seed=7, tag="b")
+        self.assertEqual(
+            list(Order.objects.order_by("pk").values_list("total_amount", "order_date")), totals
+        )
+        self.assertEqual(len(first["customers"]), 3)
+
+
+class GenerateDataCommandTests(TestCase):
+    def test_generates_skewed_linked_rows(self):
+        out = StringIO()
+        call_command(
+            "generate_data", customers=20, products=30, orders=600, batch_size=250,
+            workers=4, stdout=out, stderr=StringIO(),
+        )
+        self.assertIn("600 orders", out.getvalue())
+        self.assertEqual(Order.objects.count(), 600)
+
+        links = OrderItem.objects
+        self.assertFalse(Order.objects.filter(products__isnull=True).exists())
+        self.assertTrue(links.filter(quantity__gt=1).exists())
+        # Order totals are the sum of their items.
+        order = Order.objects.order_by("?").first()
+        self.assertEqual(order.total_amount, sum(i.line_total for i in order.items.all()))
+
+        # Zipf popularity: the top product is in far more orders than the median one.
+        counts = sorted(
+            links.values("product_id").annotate(n=Count("id")).values_list("n", flat=True),
+            reverse=True,
+        )
+        self.assertGreater(counts[0], 4 * counts[len(counts) // 2])
+        # The rollup is rebuilt for the generated days.
+        self.assertEqual(rollups.check(), [])
+
+
+class IndexUsageTests(TestCase):
+    """The filter / pagination / cron access paths are served by indexes."""
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # Tiny test tables are cheaper to scan; ask for the index plan.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, f"{index} not used:\n{plan}")
+
+    def test_order_access_paths(self):
+        since = timezone.now() - timedelta(days=7)
+        self.assertUsesIndex(
+            Order.objects.filter(order_date__gte=since).order_by("order_date", "id")[:50],
+            "crm_order_date_id_idx",
+        )
+        self.assertUsesIndex(
+            Order.objects.filter(customer_id=1).order_by("order_date", "id"),
+            "crm_order_customer_date_idx",
+        )
+        self.assertUsesIndex(
+            Order.objects.filter(total_amount__gte=10).order_by("total_amount", "id"),
+            "crm_order_total_id_idx",
+        )
+
+    def test_product_access_paths(self):
+        self.assertUsesIndex(Product.objects.filter(stock__lt=10), "crm_product_low_stock_idx")
+        self.assertUsesIndex(Product.objects.filter(price__gte=5), "crm_product_price_idx")
+
+    def test_customer_access_paths(self):
+        customers = CustomerFilter({"phone_pattern": "+1"}, queryset=Customer.objects.all()).qs
+        # LIKE for the pattern_ops index on PostgreSQL, a range on SQLite.
+        self.assertIn("LIKE" if connection.vendor == "postgresql" else ">=", str(customers.query))
+        self.assertUsesIndex(customers, "crm_customer_phone_idx")
+        self.assertUsesIndex(
+            Customer.objects.order_by("created_at", "id")[:20], "crm_customer_created_id_idx"
+        )
+
+    def test_phone_pattern_matches_prefix(self):
+        Customer.objects.create(name="A", email="a@example.com", phone="+15550001")
+        Customer.objects.create(name="B", email="b@example.com", phone="+2555")
+        Customer.objects.create(name="C", email="c@example.com", phone="+1")
+        customers = CustomerFilter({"phone_pattern": "+1"}, queryset=Customer.objects.all()).qs
+        self.assertEqual(sorted(c.name for c in customers), ["A", "C"])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.ada = Customer.objects.create(name="Ada Lovelace", email="ada@example.com")
+        self.bob = Customer.objects.create(name="Bob Smith", email="bob@lovelace.org")
+        self.lamp = Product.objects.create(name="Lovelace Lamp", price=Decimal("20.00"))
+        self.desk = Product.objects.create(name="Desk", price=Decimal("80.00"))
+        order = Order.objects.create(customer=self.bob, total_amount=Decimal("20.00"))
+        add_items(order, [self.lamp])
+
+    def test_icontains_filters(self):
+        def names(**data):
+            return sorted(c.name for c in CustomerFilter(data, queryset=Customer.objects.all()).qs)
+
+        self.assertEqual(names(name__icontains="LOVEL"), ["Ada Lovelace"])
+        self.assertEqual(names(email__icontains="lovelace"), ["Bob Smith"])
+        # Shorter than a trigram: served by LIKE.
+        self.assertEqual(names(name__icontains="bo"), ["Bob Smith"])
+        if connection.vendor == "sqlite":
+            sql = str(CustomerFilter({"name__icontains": "lov"}, queryset=Customer.objects.all()).qs.query)
+            self.assertIn("crm_customer_fts", sql)
+
+        data = schema.execute(
+            '{ orders(first: 5, productName: "lamp", customerName: "smith") '
+            "{ edges { node { customer { name } } } } }"
+        ).data
+        self.assertEqual(data["orders"]["edges"], [{"node": {"customer": {"name": "Bob Smith"}}}])
+
+    def test_index_follows_writes(self):
+        self.ada.name = "Ada King"
+        self.ada.save()
+        Customer.objects.filter(pk=self.bob.pk).delete()
+        found = CustomerFilter({"name__icontains": "love"}, queryset=Customer.objects.all()).qs
+        self.assertEqual(list(found), [])
+        found = CustomerFilter({"name__icontains": "king"}, queryset=Customer.objects.all()).qs
+        self.assertEqual(list(found), [self.ada])
+
+    def test_search_query(self):
+        result = schema.execute("""
+        { search(text: "lovelace", first: 10) {
+            score
+            node { __typename ... on CustomerType { name } ... on ProductType { name } }
+        } }
+        """)
+        self.assertIsNone(result.errors)
+        hits = result.data["search"]
+        self.assertEqual(
+            sorted((h["node"]["__typename"], h["node"]["name"]) for h in hits),
+            [("CustomerType", "Ada Lovelace"), ("CustomerType", "Bob Smith"),
+             ("ProductType", "Lovelace Lamp")],
+        )
+        scores = [h["score"] for h in hits]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+        result = schema.execute('{ search(text: "x", first: 500) { score } }')
+        self.assertIn("first must be between", result.errors[0].message)
+
+
+class OrderItemTests(TestCase):
+    MUTATION = """
+    mutation ($input: OrderInput!) {
+      createOrder(input: $input) {
+        order { totalAmount items { product { name } quantity unitPrice } }
+        errors
+      }
+    }
+    """
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.pen = Product.objects.create(name="Pen", price=Decimal("1.50"), stock=10)
+        self.ink = Product.objects.create(name="Ink", price=Decimal("2.00"), stock=10)
+
+    def create_order(self, **input):
+        result = schema.execute(
+            self.MUTATION, variable_values={"input": {"customerId": self.customer.pk, **input}}
+        )
+        self.assertIsNone(result.errors)
+        return result.data["createOrder"]
+
+    def test_create_order_snapshots_prices(self):
+        payload = self.create_order(
+            productIds=[self.ink.pk],
+            items=[{"productId": self.pen.pk, "quantity": 3}],
+        )
+        self.assertEqual(payload["errors"], [])
+        self.assertEqual(payload["order"]["totalAmount"], "6.50")
+        self.assertEqual(payload["order"]["items"], [
+            {"product": {"name": "Pen"}, "quantity": 3, "unitPrice": "1.50"},
+            {"product": {"name": "Ink"}, "quantity": 1, "unitPrice": "2.00"},
+        ])
+
+        # Later price changes don't rewrite what was sold.
+        Product.objects.filter(pk=self.pen.pk).update(price=Decimal("9.99"))
+        sales = {row["product_id"]: row for row in product_sales()}
+        self.assertEqual(sales[self.pen.pk]["units_sold"], 3)
+        self.assertEqual(sales[self.pen.pk]["revenue"], Decimal("4.50"))
+        self.assertEqual(sales[self.ink.pk]["orders"], 1)
+
+    def test_invalid_quantity(self):
+        payload = self.create_order(items=[{"productId": self.pen.pk, "quantity": 0}])
+        self.assertEqual(payload["errors"], ["Quantity must be a positive value."])
+        self.assertFalse(Order.objects.exists())
+
+    def test_product_sales_query(self):
+        self.create_order(items=[{"productId": self.pen.pk, "quantity": 2}])
+        self.create_order(productIds=[self.pen.pk, self.ink.pk])
+        with self.assertNumQueries(2):
+            result = schema.execute(
+                "{ productSales(first: 5) { product { name } orders unitsSold revenue } }"
+            )
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["productSales"], [
+            {"product": {"name": "Pen"}, "orders": 2, "unitsSold": 3, "revenue": "4.50"},
+            {"product": {"name": "Ink"}, "orders": 1, "unitsSold": 1, "revenue": "2.00"},
+        ])
+
+
+class DailySalesTests(TestCase):
+    CREATE = """
+    mutation ($input: OrderInput!) { createOrder(input: $input) { errors } }
+    """
+
+    def setUp(self):
+        self.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        self.pen = Product.objects.create(name="Pen", price=Decimal("1.50"), stock=10)
+        self.ink = Product.objects.create(name="Ink", price=Decimal("2.00"), stock=10)
+
+    def create_order(self, customer, items, when):
+        result = schema.execute(self.CREATE, variable_values={"input": {
+            "customerId": customer.pk,
+            "items": [{"productId": p.pk, "quantity": q} for p, q in items],
+            "orderDate": when.isoformat(),
+        }})
+        self.assertEqual(result.data["createOrder"]["errors"], [])
+
+    def test_rollup_follows_created_orders(self):
+        day1 = timezone.now() - timedelta(days=1)
+        self.create_order(self.alice, [(self.pen, 2), (self.ink, 1)], day1)
+        self.create_order(self.bob, [(self.pen, 1)], day1)
+        self.create_order(self.alice, [(self.ink, 3)], timezone.now())
+
+        self.assertEqual(rollups.check(), [])
+        self.assertEqual(rollups.totals(), {"orders": 3, "revenue": Decimal("12.50")})
+        result = schema.execute(
+            "query ($p: ID) { dailySales(productId: $p) { day orders units revenue } }",
+            variable_values={"p": self.pen.pk},
+        )
+        self.assertEqual(result.data["dailySales"], [
+            {"day": day1.date().isoformat(), "orders": 2, "units": 3, "revenue": "4.50"},
+        ])
+        with self.assertNumQueries(1):
+            series = rollups.series(customer_id=self.alice.pk)
+        self.assertEqual([(row["orders"], row["revenue"]) for row in series],
+                         [(1, Decimal("5.00")), (1, Decimal("6.00"))])
+
+    def test_check_and_rebuild(self):
+        self.create_order(self.alice, [(self.pen, 1)], timezone.now())
+        # Written behind the API's back: the rollup doesn't know about it.
+        order = Order.objects.create(customer=self.bob, total_amount=Decimal("2.00"))
+        add_items(order, [self.ink])
+
+        mismatches = rollups.check()
+        self.assertEqual(len(mismatches), 3)  # the day, Bob's day and the ink's day
+        with self.assertRaises(CommandError):
+            call_command("check_daily_sales", stdout=StringIO())
+
+        call_command("check_daily_sales", repair=True, stdout=StringIO())
+        self.assertEqual(rollups.check(), [])
+        self.assertEqual(rollups.totals()["orders"], 2)
+
+        DailySales.objects.all().delete()
+        call_command("rebuild_daily_sales", chunk_days=1, stdout=StringIO())
+        self.assertEqual(rollups.check(), [])
+
+
+class StockReservationTests(TestCase):
+    CREATE = """
+    mutation ($input: OrderInput!) { createOrder(input: $input) { order { id } errors } }
+    """
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.pen = Product.objects.create(name="Pen", price=Decimal("1.50"), stock=5)
+        self.ink = Product.objects.create(name="Ink", price=Decimal("2.00"), stock=1)
+
+    def stock(self):
+        return list(Product.objects.order_by("pk").values_list("stock", flat=True))
+
+    def test_reserve_stock(self):
+        remaining = reserve_stock({self.pen.pk: 2, self.ink.pk: 1})
+        if supports_update_returning():
+            self.assertEqual(remaining, {self.pen.pk: 3, self.ink.pk: 0})
+        self.assertEqual(self.stock(), [3, 0])
+
+        with self.assertRaises(OutOfStock) as caught:
+            with transaction.atomic():
+                reserve_stock({self.pen.pk: 3, self.ink.pk: 1})
+        self.assertEqual(caught.exception.products, [self.ink.pk])
+        # The pen's decrement was rolled back with the ink's shortfall.
+        self.assertEqual(self.stock(), [3, 0])
+
+    def test_create_order_out_of_stock(self):
+        result = schema.execute(self.CREATE, variable_values={"input": {
+            "customerId": self.customer.pk,
+            "items": [{"productId": self.pen.pk, "quantity": 2},
+                      {"productId": self.ink.pk, "quantity": 2}],
+        }})
+        self.assertEqual(result.data["createOrder"],
+                         {"order": None, "errors": ["Insufficient stock for: Ink."]})
+        self.assertEqual(self.stock(), [5, 1])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(DailySales.objects.exists())
+
+
+class StressStockCommandTests(TransactionTestCase):
+    def test_no_overselling(self):
+        out = StringIO()
+        call_command(
+            "stress_stock", threads=4, orders=10, products=2, stock=15, max_quantity=2,
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["oversold"], [])
+        self.assertEqual(report["attempts"], 40)
+        self.assertEqual(report["failed"], 0)
+        for row in report["products"].values():
+            self.assertEqual(row["final_stock"], row["initial_stock"] - row["sold"])
+        # The stress rows are cleaned up again.
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(DailySales.objects.exists())
+
+
+class IdempotencyTests(TestCase):
+    CREATE_CUSTOMER = """
+    mutation ($input: CustomerInput!, $key: String) {
+      createCustomer(input: $input, idempotencyKey: $key) { customer { id email } message errors }
+    }
+    """
+    CREATE_ORDER = """
+    mutation ($input: OrderInput!, $key: String) {
+      createOrder(input: $input, idempotencyKey: $key) { order { id totalAmount } errors }
+    }
+    """
+
+    def create_customer(self, key, email="alice@example.com"):
+        return schema.execute(self.CREATE_CUSTOMER, variable_values={
+            "input": {"name": "Alice", "email": email}, "key": key,
+        })
+
+    def test_create_customer_saves_once(self):
+        result = self.create_customer(None)
+        self.assertEqual(result.data["createCustomer"]["errors"], [])
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_replay_returns_stored_payload(self):
+        first = self.create_customer("key-1")
+        self.assertIsNone(first.errors)
+        self.assertEqual(first.data["createCustomer"]["errors"], [])
+
+        with self.assertNumQueries(2):  # the key, the customer
+            replay = self.create_customer("key-1")
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_key_reused_with_other_arguments(self):
+        self.create_customer("key-1")
+        result = self.create_customer("key-1", email="bob@example.com")
+        self.assertEqual(result.errors[0].extensions["code"], "IDEMPOTENCY_KEY_REUSED")
+        self.assertFalse(Customer.objects.filter(email="bob@example.com").exists())
+
+    def test_order_replay_takes_stock_once(self):
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        pen = Product.objects.create(name="Pen", price=Decimal("1.50"), stock=5)
+        variables = {
+            "input": {"customerId": customer.pk, "items": [{"productId": pen.pk, "quantity": 2}]},
+            "key": "order-1",
+        }
+        first = schema.execute(self.CREATE_ORDER, variable_values=variables)
+        replay = schema.execute(self.CREATE_ORDER, variable_values=variables)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+        pen.refresh_from_db()
+        self.assertEqual(pen.stock, 3)
+        self.assertEqual(rollups.totals()["orders"], 1)
+
+    def test_expired_keys_run_again_and_are_purged(self):
+        self.create_customer("key-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        result = self.create_customer("key-1")
+        self.assertEqual(result.data["createCustomer"]["errors"], ["Email already exists."])
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.create_customer("key-2", email="bob@example.com")
+        self.assertEqual(idempotency.purge_expired(batch_size=1), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["key-2"])
+
+
+class RestockByVelocityTests(TestCase):
+    def test_thresholds_follow_sales(self):
+        today = timezone.localdate()
+        hot = Product.objects.create(name="Hot", price=Decimal("1.00"), stock=12)
+        slow = Product.objects.create(name="Slow", price=Decimal("1.00"), stock=12)
+        empty = Product.objects.create(name="Empty", price=Decimal("1.00"), stock=3)
+        # 2 units a day over the 28-day window; older sales don't count.
+        DailySales.objects.create(day=today - timedelta(days=3), product=hot, orders=50,
+                                  units=56, revenue=Decimal("56.00"))
+        DailySales.objects.create(day=today - timedelta(days=40), product=slow, orders=900,
+                                  units=900, revenue=Decimal("900.00"))
+
+        with mock.patch("builtins.open", mock.mock_open()) as log:
+            record = inventory.restock_by_velocity(today=today, CHUNK_SIZE=2)
+
+        stock = dict(Product.objects.values_list("name", "stock"))
+        # Hot: reorder below 2 * 7 = 14, add 2 * 14 = 28. Others: the floors.
+        self.assertEqual(stock, {"Hot": 40, "Slow": 12, "Empty": 13})
+        self.assertEqual(record["chunks"], 2)
+        self.assertEqual(record["products_scanned"], 3)
+        self.assertEqual(record["products_restocked"], 2)
+        self.assertEqual(record["units_added"], 38)
+        self.assertEqual(
+            [(row["id"], row["stock"]) for row in record["restocked"]], [(hot.pk, 40), (empty.pk, 13)]
+        )
+        # One JSON line per run.
+        log().write.assert_called_once()
+        self.assertEqual(json.loads(log().write.call_args[0][0])["status"], "ok")
+
+    def test_counts_only_rows_the_update_changed(self):
+        low = Product.objects.create(name="Low", price=Decimal("1.00"), stock=3)
+        refilled = Product.objects.create(name="Refilled", price=Decimal("1.00"), stock=3)
+        units_sold = inventory.units_sold
+
+        def refill_first(*args):
+            # Restocked by someone else after the chunk was read.
+            Product.objects.filter(pk=refilled.pk).update(stock=50)
+            return units_sold(*args)
+
+        for returning in (True, False):
+            with self.subTest(returning=returning):
+                Product.objects.filter(pk__in=[low.pk, refilled.pk]).update(stock=3)
+                with mock.patch.object(inventory, "units_sold", refill_first), \
+                        mock.patch.object(inventory, "supports_update_returning", return_value=returning):
+                    record = inventory.restock_by_velocity(LOG_FILE=None)
+                self.assertEqual(record["products_restocked"], 1)
+                self.assertEqual(record["units_added"], 10)
+                self.assertEqual(record["restocked"][0]["id"], low.pk)
+                self.assertEqual(record["restocked"][0]["stock"], 13)
+                self.assertEqual(Product.objects.get(pk=refilled.pk).stock, 50)
+
+
+class OrderReminderTests(TestCase):
+    def setUp(self):
+        self.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        self.now = timezone.now()
+
+    def order(self, customer, days_ago):
+        return Order.objects.create(customer=customer, order_date=self.now - timedelta(days=days_ago))
+
+    def run_reminders(self):
+        sent = []
+        summary = reminders.send_order_reminders(
+            now=self.now, send=sent.extend, CHUNK_SIZE=1, MAX_WORKERS=2,
+        )
+        return summary, sorted(sent)
+
+    def test_one_reminder_per_customer_and_checkpoint(self):
+        self.order(self.alice, 30)  # outside the window
+        a1, b1, a2 = self.order(self.alice, 3), self.order(self.bob, 2), self.order(self.alice, 1)
+
+        with self.assertNumQueries(1):
+            rows = reminders.pending_orders(self.now - timedelta(days=7))
+        self.assertEqual([row[0] for row in rows], [a1.pk, b1.pk, a2.pk])
+
+        summary, sent = self.run_reminders()
+        self.assertEqual(summary, {"orders": 3, "customers": 2, "chunks": 2})
+        self.assertEqual(sent, [("alice@example.com", [a1.pk, a2.pk]), ("bob@example.com", [b1.pk])])
+
+        # The next run only sees orders placed since.
+        self.assertEqual(self.run_reminders(), ({"orders": 0, "customers": 0, "chunks": 0}, []))
+        b2 = self.order(self.bob, 0)
+        self.assertEqual(self.run_reminders()[1], [("bob@example.com", [b2.pk])])
+
+    def test_backdated_order_is_still_reminded(self):
+        self.order(self.alice, 1)
+        self.run_reminders()
+        late = self.order(self.bob, 3)  # dated before the order already reminded
+        self.assertEqual(self.run_reminders()[1], [("bob@example.com", [late.pk])])
+        self.assertEqual(reminders.load_checkpoint(), late.pk)
+
+    def test_failed_send_keeps_checkpoint(self):
+        self.order(self.alice, 1)
+
+        def fail(chunk):
+            raise OSError("mail server down")
+
+        with self.assertRaises(OSError):
+            reminders.send_order_reminders(now=self.now, send=fail)
+        self.assertIsNone(reminders.load_checkpoint())
+        self.assertEqual(self.run_reminders()[0]["orders"], 1)
+
+
+class InactiveCustomerCleanupTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        pen = Product.objects.create(name="Pen", price=Decimal("1.50"), stock=10)
+        self.customers = {}
+        for name, last_order in [("old", 400), ("recent", 10), ("never", None), ("new", None)]:
+            customer = Customer.objects.create(name=name, email=f"{name}@example.com")
+            self.customers[name] = customer
+            if last_order is not None:
+                for days in (last_order, last_order + 1):
+                    order = Order.objects.create(customer=customer, total_amount=Decimal("3.00"),
+                                                 order_date=now - timedelta(days=days))
+                    add_items(order, [pen], quantity=2)
+        Customer.objects.exclude(name="new").update(created_at=now - timedelta(days=800))
+        rollups.rebuild()
+
+    def names(self):
+        return sorted(Customer.objects.values_list("name", flat=True))
+
+    def test_dry_run_only_counts(self):
+        summary = cleanup.clean_inactive_customers(dry_run=True, LOG_FILE=None)
+        self.assertEqual((summary["customers"], summary["orders"], summary["order_items"]), (2, 2, 2))
+        self.assertEqual(self.names(), ["never", "new", "old", "recent"])
+
+    def test_deletes_in_batches_and_keeps_rollup(self):
+        with CaptureQueriesContext(connection) as queries:
+            summary = cleanup.clean_inactive_customers(BATCH_SIZE=1, LOG_FILE=None)
+        self.assertEqual(summary["batches"], 2)
+        self.assertEqual((summary["customers"], summary["orders"], summary["order_items"]), (2, 2, 2))
+        self.assertIsNotNone(summary["rows_per_second"])
+        self.assertEqual(self.names(), ["new", "recent"])
+        self.assertEqual(OrderItem.objects.count(), 2)
+        # Anti-join, not an aggregate over every order.
+        self.assertIn("NOT EXISTS", queries[0]["sql"])
+        self.assertEqual(rollups.check(), [])
+        self.assertEqual(rollups.totals()["orders"], 2)
+
+    def test_command(self):
+        out = StringIO()
+        with override_settings(CRM_CUSTOMER_CLEANUP={"LOG_FILE": None}):
+            call_command("clean_inactive_customers", dry_run=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["customers"], 2)
+
+
+class CrmReportPipelineTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        pen = Product.objects.create(name="Pen", price=Decimal("1.50"), stock=10)
+        for _ in range(5):
+            order = Order.objects.create(customer=customer, total_amount=Decimal("3.00"))
+            add_items(order, [pen], quantity=2)
+
+    def test_resumes_pending_ranges(self):
+        report = report_pipeline.start(range_size=2)
+        pk = Order.objects.order_by("pk").first().pk
+        self.assertEqual(report_pipeline.ranges(report), [(pk, pk + 1), (pk + 2, pk + 3), (pk + 4, pk + 4)])
+        first, last = report_pipeline.pending_ranges(report)[0]
+        report_pipeline.aggregate_range(report.pk, first, last)
+        # A retried range is saved once.
+        report_pipeline.aggregate_range(report.pk, first, last)
+        self.assertEqual(report_pipeline.finish(report.pk).status, CrmReport.RUNNING)
+
+        # The next run picks up the same report and only the missing ranges.
+        resumed = report_pipeline.start()
+        self.assertEqual(resumed.pk, report.pk)
+        self.assertEqual(report_pipeline.pending_ranges(resumed), [(pk + 2, pk + 3), (pk + 4, pk + 4)])
+        report = report_pipeline.run()
+        self.assertEqual((report.status, report.customers, report.orders, report.units, report.revenue),
+                         (CrmReport.DONE, 1, 5, 10, Decimal("15.00")))
+        self.assertEqual(report.ranges.count(), 3)
+
+    def test_stale_report_is_failed_and_replaced(self):
+        stale = report_pipeline.start(range_size=2)
+        CrmReport.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(days=2))
+
+        report = report_pipeline.start()
+        self.assertNotEqual(report.pk, stale.pk)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, CrmReport.FAILED)
+        # A late range of the failed report doesn't finish it.
+        for first, last in report_pipeline.pending_ranges(stale):
+            report_pipeline.aggregate_range(stale.pk, first, last)
+        self.assertEqual(report_pipeline.finish(stale.pk).status, CrmReport.FAILED)
+
+    def test_concurrent_start_resumes_the_first_report(self):
+        aggregate = Order.objects.aggregate
+
+        def started_meanwhile(**kwargs):
+            CrmReport.objects.create(range_size=2, max_order_id=1)
+            return aggregate(**kwargs)
+
+        with mock.patch.object(Order.objects, "aggregate", started_meanwhile):
+            report = report_pipeline.start()
+        self.assertEqual(report.max_order_id, 1)
+        self.assertEqual(CrmReport.objects.count(), 1)
+
+    def test_chord(self):
+        conf = tasks.generate_crm_report.app.conf
+        conf.task_always_eager = True
+        try:
+            report_id = tasks.generate_crm_report.delay(range_size=3).get()
+        finally:
+            conf.task_always_eager = False
+        report = CrmReport.objects.get(pk=report_id)
+        self.assertEqual((report.status, report.orders, report.revenue),
+                         (CrmReport.DONE, 5, Decimal("15.00")))
@@ -0,0 +1,250 @@
+"""
+Sampled per-resolver timing and SQL counts for the GraphQL API.
+
+For a sampled request the view attaches a Tracer to the Django request
+(``info.context``) and TracingMiddleware records, per resolver path, the
+number of calls, wall time and SQL queries issued while the resolver ran.
+List indices are dropped from paths, so ``orders.edges.0.node.customer``
+and ``orders.edges.1.node.customer`` are one entry. Unsampled requests
+only pay for a getattr per resolver.
+
+The trace is returned in ``extensions.tracing`` (Apollo tracing layout,
+with aggregated resolver entries) and folded into per-process counters and
+histograms, served in Prometheus text format at ``/graphql/metrics``.
+
+SQL is counted on the connection of the thread running the executor.
+Queries of the async view (/graphql/async) go through the async ORM on
+other threads, so its traces have timings but no SQL counts: every
+``sqlQueries`` is 0.
+
+A trace exposes timings and query counts, so clients can only force one
+by sending ``FORCE_HEADER`` with the shared ``FORCE_TOKEN`` as its value;
+both are unset by default.
+
+Configured with ``GRAPHQL_TRACING`` in settings:
+
+    GRAPHQL_TRACING = {
+        "ENABLED": True,
+        "SAMPLE_RATE": 0.01,       # fraction of requests traced
+        "EXTENSIONS": True,        # include the trace in the response
+        "FORCE_HEADER": "X-GraphQL-Trace",  # traces requests sending FORCE_TOKEN in it
+        "FORCE_TOKEN": None,
+    }
+"""
+import contextlib
+import hmac
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from inspect import isawaitable
+
+from django.conf import settings
+from django.db import connection
+
+DEFAULTS = {
+    "ENABLED": False,
+    "SAMPLE_RATE": 0.01,
+    "EXTENSIONS": True,
+    "FORCE_HEADER": None,
+    "FORCE_TOKEN": None,
+}
+
+# Upper bounds (seconds) of the resolver duration histogram buckets.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GRAPHQL_TRACING", {})}
+
+
+class Tracer:
+    """Trace of one GraphQL request."""
+
+    def __init__(self):
+        self.start_time = datetime.now(timezone.utc)
+        self.start = time.perf_counter_ns()
+        self.queries = 0
+        self.resolvers = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def record(self, info, start, queries):
+        duration = time.perf_counter_ns() - start
+        path = tuple(key for key in info.path.as_list() if not isinstance(key, int))
+        entry = self.resolvers.get(path)
+        if entry is None:
+            entry = self.resolvers[path] = {
+                "path": list(path),
+                "parentType": info.parent_type.name,
+                "fieldName": info.field_name,
+                "returnType": str(info.return_type),
+                "startOffset": start - self.start,
+                "calls": 0,
+                "duration": 0,
+                "sqlQueries": 0,
+            }
+        entry["calls"] += 1
+        entry["duration"] += duration
+        entry["sqlQueries"] += queries
+
+    async def record_async(self, result, info, start, queries):
+        try:
+            return await result
+        finally:
+            self.record(info, start, self.queries - queries)
+
+    @contextlib.contextmanager
+    def count_queries(self):
+        with connection.execute_wrapper(self):
+            yield
+
+    def finish(self):
+        """Records the trace in the metrics and returns the extension dict."""
+        end = time.perf_counter_ns()
+        metrics.observe(self)
+        return {
+            "version": 1,
+            "startTime": self.start_time.isoformat(),
+            "endTime": datetime.now(timezone.utc).isoformat(),
+            "duration": end - self.start,
+            "sqlQueries": self.queries,
+            "execution": {"resolvers": list(self.resolvers.values())},
+        }
+
+
+def _forced(request, config):
+    """True if ``request`` sends the configured force header and token."""
+    if not config["FORCE_HEADER"] or not config["FORCE_TOKEN"]:
+        return False
+    value = request.headers.get(config["FORCE_HEADER"])
+    return value is not None and hmac.compare_digest(
+        value.encode("utf-8"), config["FORCE_TOKEN"].encode("utf-8")
+    )
+
+
+def start(request):
+    """Attaches and returns a Tracer if ``request`` is sampled, else None."""
+    config = get_config()
+    if not config["ENABLED"]:
+        return None
+    if not _forced(request, config) and random.random() >= config["SAMPLE_RATE"]:
+        return None
+    request.graphql_tracer = tracer = Tracer()
+    return tracer
+
+
+def counting(request):
+    """Context manager counting SQL queries for the request's tracer, if any."""
+    tracer = getattr(request, "graphql_tracer", None)
+    return tracer.count_queries() if tracer is not None else contextlib.nullcontext()
+
+
+def finish(request, result):
+    """Adds the trace of a sampled request to ``result.extensions``."""
+    tracer = getattr(request, "graphql_tracer", None)
+    if tracer is None or result is None:
+        return result
+    del request.graphql_tracer
+    trace = tracer.finish()
+    if get_config()["EXTENSIONS"]:
+        result.extensions = {**(result.extensions or {}), "tracing": trace}
+    return result
+
+
+class TracingMiddleware:
+    """Graphene middleware recording resolvers of sampled requests."""
+
+    def resolve(self, next, root, info, **args):
+        tracer = getattr(info.context, "graphql_tracer", None)
+        if tracer is None:
+            return next(root, info, **args)
+
+        start = time.perf_counter_ns()
+        queries = tracer.queries
+        try:
+            result = next(root, info, **args)
+        except Exception:
+            tracer.record(info, start, tracer.queries - queries)
+            raise
+        if isawaitable(result):
+            return tracer.record_async(result, info, start, queries)
+        tracer.record(info, start, tracer.queries - queries)
+        return result
+
+
+class Metrics:
+    """Per-process resolver counters and histograms, keyed by Type.field."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.calls = {}
+            self.queries = {}
+            self.buckets = {}
+            self.seconds = {}
+
+    def observe(self, tracer):
+        with self._lock:
+            self.requests += 1
+            for entry in tracer.resolvers.values():
+                field = f"{entry['parentType']}.{entry['fieldName']}"
+                self.calls[field] = self.calls.get(field, 0) + entry["calls"]
+                self.queries[field] = self.queries.get(field, 0) + entry["sqlQueries"]
+                # Observed once per request: total time spent in the field.
+                seconds = entry["duration"] / 1e9
+                self.seconds[field] = self.seconds.get(field, 0.0) + seconds
+                counts = self.buckets.setdefault(field, [0] * (len(BUCKETS) + 1))
+                for i, bound in enumerate(BUCKETS):
+                    if seconds <= bound:
+                        counts[i] += 1
+                        break
+                else:
+                    counts[-1] += 1
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                "# HELP graphql_traced_requests_total Sampled GraphQL requests.",
+                "# TYPE graphql_traced_requests_total counter",
+                f"graphql_traced_requests_total {self.requests}",
+                "# HELP graphql_resolver_calls_total Resolver calls in sampled requests.",
+                "# TYPE graphql_resolver_calls_total counter",
+            ]
+            lines += [
+                f'graphql_resolver_calls_total{{field="{field}"}} {count}'
+                for field, count in sorted(self.calls.items())
+            ]
+            lines += [
+                "# HELP graphql_resolver_sql_queries_total SQL queries issued by resolvers.",
+                "# TYPE graphql_resolver_sql_queries_total counter",
+            ]
+            lines += [
+                f'graphql_resolver_sql_queries_total{{field="{field}"}} {count}'
+                for field, count in sorted(self.queries.items())
+            ]
+            lines += [
+                "# HELP graphql_resolver_duration_seconds Time spent in a field per request.",
+                "# TYPE graphql_resolver_duration_seconds histogram",
+            ]
+            for field, counts in sorted(self.buckets.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                    cumulative += count
+                    lines.append(
+                        f'graphql_resolver_duration_seconds_bucket{{field="{field}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'graphql_resolver_duration_seconds_sum{{field="{field}"}} {self.seconds[field]}')
+                lines.append(f'graphql_resolver_duration_seconds_count{{field="{field}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,9 @@
+import re
+
+PHONE_REGEX = re.compile(r"^(\+?\d{7,15}|\d{3}-\d{3}-\d{4})$")
+
+
+def validate_phone(phone: str) -> bool:
+    if not phone:
+        return True
+    return bool(PHONE_REGEX.match(phone))
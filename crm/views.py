@@ -1,3 +1,333 @@
-from django.shortcuts import render
+from inspect import isawaitable
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET
+from django.views.generic import View
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError, set_rollback
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, validate_schema
+
+from . import cache, complexity, tracing
+from .exports import EXPORTS, to_csv, to_ndjson
+from .persisted_queries import PersistedQueryError, get_persisted_query, resolve_document
+
+
+class CRMGraphQLView(GraphQLView):
+    """
+    GraphQLView for the CRM API.
+
+    - Supports Automatic Persisted Queries and reuses parsed/validated
+      documents from an LRU (see crm.persisted_queries).
+    - Serves repeated read-only queries from the response cache when
+      ``GRAPHQL_RESPONSE_CACHE["ENABLED"]`` is set (see crm.cache).
+    - Rejects operations over the cost/depth budget before executing them
+      and reports the estimated cost in ``extensions.cost`` (see
+      crm.complexity).
+    - Traces a sample of executed operations (see crm.tracing).
+    """
+
+    def prepare_document(self, request, data, query, operation_name, show_graphiql=False):
+        """
+        Resolves the request to a validated document. Returns
+        ``(document, operation_ast, None)``, or ``(None, None, result)`` when
+        the request ends here (errors, or None to render GraphiQL).
+        """
+        persisted = get_persisted_query(request, data)
+        if not query and persisted is None:
+            if show_graphiql:
+                return None, None, None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return None, None, ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, errors = resolve_document(
+                schema,
+                query,
+                persisted,
+                self.validation_rules,
+                graphene_settings.MAX_VALIDATION_ERRORS,
+            )
+        except PersistedQueryError as e:
+            return None, None, ExecutionResult(errors=[e.as_graphql_error()])
+        if errors:
+            return None, None, ExecutionResult(data=None, errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None, None, None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        return document, operation_ast, None
+
+    def build_response(self, request, execution_result):
+        """Returns the response dict and status code for an ExecutionResult."""
+        status_code = 200
+        response = {}
+        if execution_result.errors:
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+        if execution_result.errors and any(
+            not getattr(e, "path", None) for e in execution_result.errors
+        ):
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+        if execution_result.extensions:
+            response["extensions"] = execution_result.extensions
+        return response, status_code
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+        if not execution_result:
+            return None, 200
+
+        if execution_result.errors:
+            set_rollback()
+        response, status_code = self.build_response(request, execution_result)
+        if self.batch:
+            response["id"] = id
+            response["status"] = status_code
+        return self.json_encode(request, response, pretty=show_graphiql), status_code
+
+    def check_cost(self, document, variables, operation_name):
+        """
+        Returns ``(cost, result)``: the cost reported in the response
+        extensions, and an ExecutionResult when the operation is rejected.
+        """
+        if not complexity.is_enabled():
+            return None, None
+        cost, errors = complexity.analyze(
+            self.schema.graphql_schema, document, variables, operation_name
+        )
+        if errors:
+            return cost, ExecutionResult(errors=errors, extensions={"cost": cost})
+        return cost, None
+
+    @staticmethod
+    def with_cost(result, cost):
+        if cost is not None:
+            result.extensions = {**(result.extensions or {}), "cost": cost}
+        return result
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        document, operation_ast, result = self.prepare_document(
+            request, data, query, operation_name, show_graphiql
+        )
+        if document is None:
+            return result
+
+        cost, rejected = self.check_cost(document, variables, operation_name)
+        if rejected is not None:
+            return rejected
+
+        key = None
+        if cache.is_enabled():
+            key = cache.cache_key(None, variables, operation_name, document=document)
+            if key is not None:
+                cached = cache.get(key)
+                if cached is not None:
+                    return self.with_cost(ExecutionResult(data=cached), cost)
+
+        tracing.start(request)
+        result = self.execute_document(request, document, operation_ast, variables, operation_name)
+        tracing.finish(request, result)
+
+        if key is not None and not result.errors:
+            cache.set(key, result.data)
+        return self.with_cost(result, cost)
+
+    def execute_document(self, request, document, operation_ast, variables, operation_name):
+        schema = self.schema.graphql_schema
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic(), tracing.counting(request):
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            with tracing.counting(request):
+                return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """
+    Async variant of CRMGraphQLView for ASGI deployments.
+
+    Queries run on graphql-core's async executor in the event loop: the CRM
+    resolvers switch to Django's async ORM and awaitable loaders there
+    (see crm.aio), so a slow client doesn't hold a thread. Mutations run
+    in a worker thread with the sync executor, since they write through
+    the sync ORM inside transactions. GraphiQL and batching are only
+    offered by the sync view.
+    """
+
+    graphiql = False
+    dispatch = View.dispatch
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            data = self.parse_body(request)
+            result, status_code = await self.aget_response(request, data)
+            return HttpResponse(status=status_code, content=result, content_type="application/json")
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+    get = post
+
+    async def aget_response(self, request, data):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = await self.aexecute_graphql_request(
+            request, data, query, variables, operation_name
+        )
+        response, status_code = self.build_response(request, execution_result)
+        return self.json_encode(request, response), status_code
+
+    async def aexecute_graphql_request(self, request, data, query, variables, operation_name):
+        document, operation_ast, result = self.prepare_document(
+            request, data, query, operation_name
+        )
+        if document is None:
+            return result
+
+        cost, rejected = self.check_cost(document, variables, operation_name)
+        if rejected is not None:
+            return rejected
+
+        if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+            tracing.start(request)
+            result = await sync_to_async(self.execute_document)(
+                request, document, operation_ast, variables, operation_name
+            )
+            return self.with_cost(tracing.finish(request, result), cost)
+
+        key = None
+        if cache.is_enabled():
+            key = await sync_to_async(cache.cache_key)(
+                None, variables, operation_name, document=document
+            )
+            if key is not None:
+                cached = await sync_to_async(cache.get)(key)
+                if cached is not None:
+                    return self.with_cost(ExecutionResult(data=cached), cost)
+
+        tracing.start(request)
+        try:
+            result = execute(
+                self.schema.graphql_schema,
+                document,
+                root_value=self.get_root_value(request),
+                context_value=self.get_context(request),
+                variable_values=variables,
+                operation_name=operation_name,
+                middleware=self.get_middleware(request),
+                execution_context_class=self.execution_context_class,
+            )
+            if isawaitable(result):
+                result = await result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+        tracing.finish(request, result)
+
+        if key is not None and not result.errors:
+            await sync_to_async(cache.set)(key, result.data)
+        return self.with_cost(result, cost)
+
+
+def response_cache_stats(request):
+    return JsonResponse(cache.stats())
+
+
+def graphql_metrics(request):
+    """Resolver metrics of this process in the Prometheus text format."""
+    return HttpResponse(tracing.metrics.render(), content_type="text/plain; version=0.0.4")
+
+
+@require_GET
+def export(request, resource):
+    """
+    Streams a CRM table as NDJSON (default) or CSV (``?format=csv``).
+    Accepts the same filter parameters as the resource's FilterSet, e.g.
+    ``/export/orders?format=csv&order_date__gte=2026-01-01``.
+    """
+    exporter = EXPORTS.get(resource)
+    if exporter is None:
+        raise Http404(f"Unknown export {resource!r}.")
+
+    params = request.GET.copy()
+    fmt = params.pop("format", ["ndjson"])[-1]
+    if fmt not in ("ndjson", "csv"):
+        return JsonResponse({"errors": ["format must be ndjson or csv."]}, status=400)
+
+    try:
+        queryset = exporter.filter(params)
+    except ValueError as e:
+        return JsonResponse({"errors": e.args[0]}, status=400)
+
+    rows = exporter.rows(queryset)
+    if fmt == "csv":
+        columns = exporter.columns + (["products"] if resource == "orders" else [])
+        response = StreamingHttpResponse(to_csv(rows, columns), content_type="text/csv")
+    else:
+        response = StreamingHttpResponse(to_ndjson(rows), content_type="application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="{resource}.{fmt}"'
+    return response